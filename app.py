@@ -1,75 +1,579 @@
-from fastapi import FastAPI, HTTPException
-import joblib
+from fastapi import FastAPI, HTTPException, Request, Response
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import os
+import time
 import numpy as np
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional
+from drift import create_drift_monitor
+from instrumentation import (PREDICTED_ROWS, PROMETHEUS_CONTENT_TYPE, REGISTRY, ASGIMetricsMiddleware,
+                             stage, timed)
+from preprocessing import FEATURE_COLUMNS
+from micro_batching import MicroBatcher
+from model_registry import ModelRegistry, model_key, within_directory
+from prediction_cache import create_cache
+from retraining import RetrainManager
+from serving import load_serving_model, warm_up
+from wire_format import (ARROW_MEDIA_TYPE, BINARY_MEDIA_TYPES, FEATURE_ORDER_HEADER, NPY_MEDIA_TYPE, decode_features,
+                         encode_predictions, media_type, response_media_type)
+
+@asynccontextmanager
+async def lifespan(app):
+    global main_loop
+    main_loop = asyncio.get_running_loop()
+    loader = None
+    if FAST_START and not model_loaded:
+        # Le serveur répond déjà (liveness) pendant le chargement et le préchauffage (readiness).
+        loader = asyncio.get_running_loop().run_in_executor(None, _load_model)
+    yield
+    if loader is not None:
+        await loader
+    # Arrêt propre : les lots en cours du micro-batcher et les réentraînements sont terminés.
+    global batcher
+    if batcher is not None:
+        await batcher.stop()
+        batcher = None
+    await retrain_manager.wait()
+    retrain_manager.shutdown()
+    await asyncio.to_thread(model_registry.flush, 5.0)
 
 # Définition de l’API FastAPI
-app = FastAPI(title="API de Prédiction du Churn", version="1.1")
+app = FastAPI(title="API de Prédiction du Churn", version="1.1", lifespan=lifespan)
+app.add_middleware(ASGIMetricsMiddleware, app_name="fastapi", paths=("/predict", "/predict/batch"))
 
-# Chargement sécurisé du modèle
-MODEL_PATH = "churn_model.pkl"
-try:
-    model = joblib.load(MODEL_PATH)
-    model_loaded = True
-except Exception as e:
-    model = None
-    model_loaded = False
+# Chargement sécurisé du modèle (à l'import, ou au démarrage du serveur avec FAST_START=1)
+MODEL_PATH = os.getenv("MODEL_PATH", "churn_model.pkl")
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "sklearn")
+TRAIN_PATH = os.getenv("TRAIN_PATH", "churn-bigml-80.csv")
+TEST_PATH = os.getenv("TEST_PATH", "churn-bigml-20.csv")
+FAST_START = os.getenv("FAST_START", "0") == "1"
+model = None
+model_loaded = False
+startup_error = None
+
+# Taille maximale d'un lot accepté par /predict/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+# Micro-batching (optionnel) des appels concurrents à /predict
+MICRO_BATCHING = os.getenv("MICRO_BATCHING", "0") == "1"
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2"))
+batcher = None
+
+# Cache des prédictions unitaires (PREDICTION_CACHE_SIZE=0 le désactive)
+prediction_cache = create_cache(
+    int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PREDICTION_CACHE_TTL")) if os.getenv("PREDICTION_CACHE_TTL") else None,
+    backend_url=os.getenv("PREDICTION_CACHE_URL"),
+)
+
+# Suivi de la dérive des features servies (DRIFT_MONITOR=0 le désactive)
+DRIFT_MONITOR = os.getenv("DRIFT_MONITOR", "1") == "1"
+DRIFT_OPTIONS = {
+    "psi_threshold": float(os.getenv("DRIFT_PSI_THRESHOLD", "0.2")),
+    "ks_threshold": float(os.getenv("DRIFT_KS_THRESHOLD", "0.15")),
+    "min_rows": int(os.getenv("DRIFT_MIN_ROWS", "1000")),
+    "half_life_rows": int(os.getenv("DRIFT_HALF_LIFE_ROWS", "50000")),
+    "max_pending_rows": int(os.getenv("DRIFT_MAX_PENDING_ROWS", "20000")),
+}
+# Réentraînement lancé à la première dérive détectée : "full", "incremental" ou vide (signal seul)
+DRIFT_RETRAIN_MODE = os.getenv("DRIFT_RETRAIN_MODE", "")
+drift_monitor = None
+main_loop = None
+
+# Versions chargées : la principale sert les réponses, les autres sont scorées en ombre
+SHADOW_FRACTION = float(os.getenv("SHADOW_FRACTION", "0.1"))
+SHADOW_WORKERS = int(os.getenv("SHADOW_WORKERS", "1"))
+SHADOW_MODEL_PATHS = [path for path in os.getenv("SHADOW_MODEL_PATHS", "").split(",") if path]
+MAX_MODEL_VERSIONS = int(os.getenv("MAX_MODEL_VERSIONS", "4"))
+# Seuls les modèles de ce répertoire peuvent être chargés par POST /models
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR") or os.path.dirname(os.path.abspath(MODEL_PATH))
 
 # Définition du format d’entrée pour les prédictions
 class PredictionInput(BaseModel):
     features: List[float]
 
+class BatchPredictionInput(BaseModel):
+    """
+    Lot de prédictions, soit par lignes (`rows`), soit par colonnes (`columns`,
+    indexées par le nom des features dans l'ordre de FEATURE_COLUMNS).
+
+    Ce schéma sert uniquement à la documentation OpenAPI : le corps est
+    validé d'un seul bloc sous forme de tableau NumPy par `_batch_to_array`.
+    """
+    rows: Optional[List[List[float]]] = None
+    columns: Optional[Dict[str, List[float]]] = None
+
+class BatchTooLargeError(ValueError):
+    """Lot de plus de MAX_BATCH_SIZE lignes (HTTP 413)."""
+
+    def __init__(self, n_rows):
+        super().__init__(f"Le lot contient {n_rows} lignes, le maximum est {MAX_BATCH_SIZE}.")
+
+def _batch_to_array(payload):
+    """
+    Convertit le corps JSON d'un lot en un tableau NumPy (n_lignes, n_features).
+
+    La taille est vérifiée sur les listes reçues, avant toute conversion.
+    Lève BatchTooLargeError si le lot dépasse MAX_BATCH_SIZE, ValueError s'il
+    est mal formé (y compris une valeur non numérique).
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Le corps doit être un objet JSON avec `rows` ou `columns`.")
+
+    rows = payload.get("rows")
+    columns = payload.get("columns")
+    if (rows is None) == (columns is None):
+        raise ValueError("Fournir exactement un des champs `rows` ou `columns`.")
+
+    if rows is not None:
+        if not isinstance(rows, list):
+            raise ValueError("`rows` doit être une liste de lignes.")
+        if len(rows) > MAX_BATCH_SIZE:
+            raise BatchTooLargeError(len(rows))
+    else:
+        if not isinstance(columns, dict):
+            raise ValueError("`columns` doit associer chaque feature à une liste de valeurs.")
+        missing = [name for name in FEATURE_COLUMNS if name not in columns]
+        if missing:
+            raise ValueError(f"Colonnes manquantes : {missing}")
+        for name in FEATURE_COLUMNS:
+            if not isinstance(columns[name], list):
+                raise ValueError(f"La colonne {name!r} doit être une liste de valeurs.")
+            if len(columns[name]) > MAX_BATCH_SIZE:
+                raise BatchTooLargeError(len(columns[name]))
+
+    try:
+        if rows is not None:
+            X = np.asarray(rows, dtype=np.float64)
+        else:
+            X = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in FEATURE_COLUMNS])
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Valeurs non numériques ou lignes de longueurs différentes ({e}).") from e
+
+    if X.ndim != 2 or X.shape[0] == 0:
+        raise ValueError("Le lot doit être une matrice non vide (n_lignes, n_features).")
+    if not np.isfinite(X).all():
+        raise ValueError("Le lot contient des valeurs non finies.")
+    return X
+
+def _predict_proba(X):
+    """
+    Score un micro-lot. Le modèle global est lu une seule fois par lot (un
+    modèle rechargé est pris en compte au lot suivant) et rendu avec chaque
+    ligne de probabilités : classes et scores viennent de la même version.
+    """
+    current = model
+    start = time.perf_counter()
+    proba = current.predict_proba(X)
+    model_registry.record(_model_version(current), time.perf_counter() - start, X.shape[0])
+    return [(current, row) for row in proba]
+
+def _get_batcher():
+    """Crée (au premier appel) le micro-batcher lié à la boucle asyncio courante."""
+    global batcher
+    if batcher is None or (batcher.loop is not None and batcher.loop is not asyncio.get_running_loop()):
+        batcher = MicroBatcher(
+            _predict_proba,
+            max_batch_size=MICRO_BATCH_MAX_SIZE,
+            max_wait_ms=MICRO_BATCH_MAX_WAIT_MS,
+        )
+    return batcher
+
+def _model_version(current):
+    """Version du modèle servi, utilisée dans la clé du cache de prédictions (partagée entre workers)."""
+    return model_key(current)
+
+async def _cache_call(method, *args):
+    """
+    Appelle le cache de prédictions : directement s'il est en mémoire seule,
+    dans un thread s'il consulte un backend partagé (E/S bloquantes SQLite/Redis).
+    """
+    if prediction_cache.backend is None:
+        return method(*args)
+    return await asyncio.to_thread(method, *args)
+
+def _churn_column(estimator):
+    """Indice de la classe « churn » (1) dans la sortie de predict_proba."""
+    classes = list(getattr(estimator, "classes_", [0, 1]))
+    return classes.index(1) if 1 in classes else len(classes) - 1
+
+def _require_model():
+    """Refuse la requête tant que le modèle n'est pas chargé et préchauffé."""
+    if model_loaded:
+        return
+    if FAST_START and startup_error is None:
+        raise HTTPException(status_code=503, detail="Modèle en cours de chargement, réessayez dans un instant.")
+    raise HTTPException(status_code=500, detail="Modèle non chargé. Veuillez l'entraîner et le sauvegarder.")
+
 @app.post("/predict")
 async def predict(data: PredictionInput):
     """
     Effectue une prédiction à partir des features envoyées par l’utilisateur.
     """
-    if not model_loaded:
-        raise HTTPException(status_code=500, detail="Modèle non chargé. Veuillez l'entraîner et le sauvegarder.")
+    _require_model()
 
     # Vérification de l’entrée utilisateur
     if not isinstance(data.features, list) or len(data.features) == 0:
         raise HTTPException(status_code=400, detail="Les features doivent être une liste de valeurs numériques.")
 
     try:
-        features_array = np.array(data.features).reshape(1, -1)
-        prediction = model.predict(features_array)
-        return {"prediction": int(prediction[0])}
+        # Modèle lu une seule fois : la version mise en cache est celle qui a prédit.
+        current = model
+        with stage("fastapi", "/predict", "build_array"):
+            features_array = np.array(data.features).reshape(1, -1)
+        if drift_monitor is not None:
+            drift_monitor.observe(features_array)
+        if prediction_cache is not None:
+            with stage("fastapi", "/predict", "cache_lookup"):
+                cached = await _cache_call(prediction_cache.get, features_array, _model_version(current))
+            if cached is not None:
+                PREDICTED_ROWS.inc(app="fastapi", endpoint="/predict")
+                return {"prediction": cached["prediction"]}
+        if MICRO_BATCHING:
+            # La ligne rejoint un lot : une ligne mal dimensionnée ferait échouer tout le lot.
+            n_features = getattr(current, "n_features_in_", features_array.shape[1])
+            if features_array.shape[1] != n_features:
+                raise ValueError(f"{n_features} features attendues, reçu {features_array.shape[1]}.")
+            with stage("fastapi", "/predict", "micro_batch"):
+                current, proba = await _get_batcher().submit(features_array[0])
+        else:
+            with stage("fastapi", "/predict", "predict"):
+                start = time.perf_counter()
+                proba = current.predict_proba(features_array)[0]
+                model_registry.record(_model_version(current), time.perf_counter() - start, 1)
+        prediction = int(current.classes_[np.argmax(proba)])
+        churn_probability = float(proba[_churn_column(current)])
+        model_registry.shadow(features_array, [prediction], [churn_probability])
+        if prediction_cache is not None:
+            # Même forme de valeur que l'app Flask : le backend partagé sert les deux.
+            with stage("fastapi", "/predict", "cache_store"):
+                await _cache_call(prediction_cache.put, features_array, _model_version(current),
+                                  {"prediction": prediction, "probability": churn_probability})
+        PREDICTED_ROWS.inc(app="fastapi", endpoint="/predict")
+        return {"prediction": prediction}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erreur lors de la prédiction : {str(e)}")
 
+@app.get("/predict/batching/stats")
+async def batching_stats():
+    """
+    Distributions des tailles de lot et des temps d'attente du micro-batcher.
+    """
+    if batcher is None:
+        return {"enabled": MICRO_BATCHING, "batches": 0}
+    return {"enabled": MICRO_BATCHING, **batcher.stats()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Compteurs du cache de prédictions (succès, échecs, évictions, invalidations).
+    """
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+@app.post(
+    "/predict/batch",
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {"schema": BatchPredictionInput.model_json_schema()},
+                NPY_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+                ARROW_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+            "required": True,
+        }
+    },
+)
+async def predict_batch(request: Request):
+    """
+    Effectue les prédictions d'un lot de lignes en un seul appel vectorisé.
+
+    Retourne les prédictions et les probabilités de churn dans l'ordre des lignes reçues.
+    Le corps peut aussi être un tableau .npy ou un flux Arrow IPC (voir wire_format.py),
+    lu sans copie ; la réponse est alors dans le même format, sauf `Accept` contraire.
+    """
+    _require_model()
+
+    content_type = media_type(request.headers.get("content-type"))
+    try:
+        body = await request.body()
+        with stage("fastapi", "/predict/batch", "parse"):
+            if content_type in BINARY_MEDIA_TYPES:
+                X = decode_features(body, content_type, request.headers.get(FEATURE_ORDER_HEADER))
+            else:
+                X = _batch_to_array(json.loads(body))
+    except ImportError as e:
+        raise HTTPException(status_code=415, detail=f"Format {content_type} indisponible : {str(e)}")
+    except BatchTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Lot invalide : {str(e)}")
+
+    current = model
+    if X.shape[0] > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=str(BatchTooLargeError(X.shape[0])))
+
+    n_features = getattr(current, "n_features_in_", X.shape[1])
+    if X.shape[1] != n_features:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Chaque ligne doit contenir {n_features} features, reçu {X.shape[1]}.",
+        )
+    if drift_monitor is not None:
+        drift_monitor.observe(X)
+
+    try:
+        # Un seul predict_proba : la prédiction est la classe de probabilité maximale,
+        # exactement comme le fait RandomForestClassifier.predict.
+        with stage("fastapi", "/predict/batch", "predict"):
+            start = time.perf_counter()
+            proba = current.predict_proba(X)
+            model_registry.record(_model_version(current), time.perf_counter() - start, X.shape[0])
+            predictions = current.classes_.take(np.argmax(proba, axis=1))
+        churn = proba[:, _churn_column(current)]
+        model_registry.shadow(X, predictions, churn)
+        response_type = response_media_type(content_type, request.headers.get("accept"))
+        with stage("fastapi", "/predict/batch", "serialize"):
+            if response_type in BINARY_MEDIA_TYPES:
+                response = Response(encode_predictions(predictions, churn, response_type), media_type=response_type)
+            else:
+                response = {
+                    "predictions": predictions.astype(int).tolist(),
+                    "probabilities": churn.tolist(),
+                }
+        PREDICTED_ROWS.inc(X.shape[0], app="fastapi", endpoint="/predict/batch")
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Erreur lors de la prédiction : {str(e)}")
+
+_GAUGES = {
+    "micro_batch_queue": REGISTRY.gauge("churn_micro_batch_queue_depth", "Lignes en attente dans le micro-batcher."),
+    "cache_size": REGISTRY.gauge("churn_prediction_cache_entries", "Entrées du cache de prédictions."),
+}
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Métriques au format texte Prometheus (latences par étape, compteurs, jauges).
+    """
+    _GAUGES["micro_batch_queue"].set(batcher.stats()["queue_depth"] if batcher is not None else 0)
+    _GAUGES["cache_size"].set(prediction_cache.stats()["size"] if prediction_cache is not None else 0)
+    if drift_monitor is not None:
+        drift_monitor.export_metrics()
+    return Response(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/drift")
+async def drift():
+    """
+    Dérive des features numériques servies par rapport à l'entraînement (PSI, KS).
+    """
+    if drift_monitor is None:
+        return {"enabled": False}
+    return {"enabled": True, **drift_monitor.report()}
+
+def _on_drift(report):
+    """Signal de dérive (thread du moniteur) : lance le réentraînement configuré sur la boucle de l'API."""
+    drifted = [col for col, values in report["features"].items() if values["drifted"]]
+    print(f"⚠️ Dérive détectée sur {drifted}")
+    if DRIFT_RETRAIN_MODE and main_loop is not None:
+        main_loop.call_soon_threadsafe(_retrain_on_drift)
+
+def _retrain_on_drift():
+    if retrain_manager.running_job() is not None:
+        return
+    try:
+        retrain_manager.submit(TRAIN_PATH, TEST_PATH, DRIFT_RETRAIN_MODE)
+    except ValueError as e:
+        print(f"⚠️ Réentraînement sur dérive impossible : {e}")
+
+def _startup_state():
+    if model_loaded:
+        return "ready"
+    if startup_error is None and FAST_START:
+        return "loading"
+    return "error"
+
 @app.get("/healthcheck")
 async def healthcheck():
     """
     Vérifie l'état de l'API et du modèle.
     """
-    if model_loaded:
-        return {"status": "ok", "message": "API fonctionnelle et modèle chargé."}
+    state = _startup_state()
+    if state == "ready":
+        return {"status": "ok", "live": True, "ready": True, "message": "API fonctionnelle et modèle chargé."}
+    if state == "loading":
+        return {"status": "loading", "live": True, "ready": False, "message": "Modèle en cours de chargement."}
+    return {"status": "error", "live": True, "ready": False,
+            "message": "Modèle non chargé. Vérifiez son chemin ou réentraînez-le."}
+
+@app.get("/healthcheck/live")
+async def liveness():
+    """
+    Liveness : le processus répond, même pendant le chargement du modèle.
+    """
+    return {"status": "alive"}
+
+@app.get("/healthcheck/ready")
+async def readiness(response: Response):
+    """
+    Readiness : 200 une fois le modèle chargé et préchauffé, 503 sinon.
+    """
+    state = _startup_state()
+    if state != "ready":
+        response.status_code = 503
+        return {"status": state, "error": startup_error}
+    return {"status": state, "model_version": _model_version(model)}
+
+def _install_model(new_model):
+    """Installe une nouvelle version principale ; la précédente reste chargée (rollback en mémoire)."""
+    model_registry.add(new_model, primary=True)
+
+def _serve_model(new_model):
+    """Remplace le modèle servi ; les requêtes en cours terminent avec l'ancien."""
+    global model, model_loaded
+    model = new_model
+    model_loaded = True
+    if prediction_cache is not None:
+        prediction_cache.invalidate()
+    _reset_drift_monitor(new_model)
+
+def _reset_drift_monitor(new_model):
+    """Compare désormais le trafic à la référence du nouveau modèle (sans référence : suivi suspendu)."""
+    global drift_monitor
+    if not DRIFT_MONITOR:
+        return
+    reference = getattr(getattr(new_model, "preprocessing", None), "drift_reference", None)
+    if reference is None:
+        drift_monitor = None
+    elif drift_monitor is None:
+        drift_monitor = create_drift_monitor(new_model, on_drift=_on_drift, **DRIFT_OPTIONS)
     else:
-        return {"status": "error", "message": "Modèle non chargé. Vérifiez son chemin ou réentraînez-le."}
+        drift_monitor.reset(reference)
+
+model_registry = ModelRegistry(SHADOW_FRACTION, n_workers=SHADOW_WORKERS, max_versions=MAX_MODEL_VERSIONS,
+                               on_promote=_serve_model)
+
+def _load_model():
+    """Charge puis préchauffe le modèle ; il n'est servi (readiness) qu'ensuite."""
+    global startup_error
+    try:
+        with timed("model_load"):
+            loaded = load_serving_model(MODEL_PATH, backend=MODEL_BACKEND)
+        with timed("model_warm_up"):
+            warm_up(loaded)
+    except Exception as e:
+        startup_error = str(e)
+        return
+    _install_model(loaded)
+    for path in SHADOW_MODEL_PATHS:
+        try:
+            model_registry.load(path, backend=MODEL_BACKEND)
+        except Exception as e:
+            print(f"⚠️ Version en ombre {path} non chargée : {e}")
+
+if not FAST_START:
+    _load_model()
+
+# Réentraînement incrémental : prédictions étiquetées lues dans la base de l'API Flask
+INCREMENTAL_OPTIONS = {
+    "n_new_trees": int(os.getenv("INCREMENTAL_NEW_TREES", "20")),
+    "max_estimators": int(os.getenv("INCREMENTAL_MAX_TREES")) if os.getenv("INCREMENTAL_MAX_TREES") else None,
+    "min_rows": int(os.getenv("INCREMENTAL_MIN_ROWS", "100")),
+}
 
-@app.post("/retrain")
-async def retrain():
+retrain_manager = RetrainManager(MODEL_PATH, _install_model, backend=MODEL_BACKEND,
+                                 database_url=os.getenv("DATABASE_URL"), incremental_options=INCREMENTAL_OPTIONS)
+
+@app.post("/retrain", status_code=202)
+async def retrain(mode: str = "full"):
+    """
+    Lance le réentraînement du modèle en arrière-plan et retourne l'identifiant du job.
+
+    `mode=full` réentraîne sur les CSV ; `mode=incremental` n'apprend que les
+    prédictions étiquetées depuis le dernier entraînement incrémental.
+
+    Les prédictions continuent d'être servies par le modèle actuel jusqu'à ce que
+    le nouveau modèle ait été sauvegardé et validé.
+    """
+    running = retrain_manager.running_job()
+    if running is not None:
+        raise HTTPException(status_code=409, detail=f"Un réentraînement est déjà en cours : {running.id}")
+
+    try:
+        job = retrain_manager.submit(TRAIN_PATH, TEST_PATH, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "accepted", "job_id": job.id, "mode": job.mode}
+
+@app.get("/retrain/{job_id}")
+async def retrain_status(job_id: str):
+    """
+    Retourne l'avancement et les métriques d'un réentraînement.
+    """
+    job = retrain_manager.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job de réentraînement inconnu : {job_id}")
+    return job.as_dict()
+
+@app.get("/models")
+async def models():
+    """
+    Versions chargées : version principale, versions précédentes (rollback),
+    latence par version et accord des versions en ombre avec la principale.
+    """
+    return model_registry.report()
+
+@app.post("/models", status_code=201)
+async def load_model_version(path: str, promote: bool = False):
     """
-    Réentraîne le modèle avec les données d'entraînement et le met à jour.
+    Charge un modèle (fichier ou artefact de MODEL_REGISTRY_DIR) comme version
+    en ombre, ou comme version principale avec `promote=true`.
     """
-    global model  # Permet de mettre à jour le modèle en mémoire
-    
+    if not within_directory(path, MODEL_REGISTRY_DIR):
+        raise HTTPException(status_code=403, detail=f"Seuls les modèles de {MODEL_REGISTRY_DIR} peuvent être chargés.")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Modèle introuvable : {path}")
     try:
-        # Charger et préparer les données
-        X_train, X_test, y_train, y_test = prepare_data("churn-bigml-80.csv", "churn-bigml-20.csv")
-        
-        # Réentraîner le modèle
-        new_model = train_model(X_train, y_train)
-        
-        # Sauvegarder le modèle
-        save_model(new_model, MODEL_PATH)
-        
-        # Charger le nouveau modèle en mémoire
-        model = joblib.load(MODEL_PATH)
-        
-        return {"status": "ok", "message": "Modèle réentraîné et mis à jour avec succès."}
-    
+        version = await asyncio.to_thread(model_registry.load, path, MODEL_BACKEND, promote)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors du réentraînement : {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Modèle non chargé : {str(e)}")
+    return {"version": version, "primary": model_registry.primary_version}
+
+@app.post("/models/rollback")
+async def rollback_model():
+    """
+    Revient à la version principale précédente, toujours en mémoire (sans rechargement).
+    """
+    try:
+        version = model_registry.rollback()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"primary": version}
+
+@app.post("/models/{version}/promote")
+async def promote_model(version: str):
+    """
+    Fait d'une version chargée la version principale (échange en mémoire, sans rechargement).
+    """
+    try:
+        model_registry.promote(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Version non chargée : {version}")
+    return {"primary": version, "history": model_registry.history}
+
+@app.delete("/models/{version}")
+async def unload_model(version: str):
+    """
+    Décharge une version en ombre.
+    """
+    try:
+        model_registry.remove(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Version non chargée : {version}")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"versions": model_registry.versions()}
@@ -1,32 +1,214 @@
-import psycopg2
-from flask import Flask, request, jsonify, render_template
-import joblib
+from flask import Flask, Response, g, request, jsonify, render_template
+import atexit
 import numpy as np
 import os
+import threading
+import time
+import urllib.request
+from drift import create_drift_monitor
+from instrumentation import (IN_FLIGHT, PREDICTED_ROWS, PROMETHEUS_CONTENT_TYPE, REGISTRY, REQUESTS,
+                             STAGE_SECONDS, stage, timed)
+from model_registry import ModelRegistry, model_key, within_directory
+from prediction_cache import create_cache
+from prediction_log import PredictionLogWriter, create_pool, ensure_schema
+from preprocessing import FEATURE_COLUMNS
+from serving import load_serving_model, warm_up
 
 app = Flask(__name__)
 
-# Load Model
-MODEL_PATH = "churn_model.pkl"
-model = joblib.load(MODEL_PATH)
+# Load Model (at import, or in a background thread with FAST_START=1)
+MODEL_PATH = os.getenv("MODEL_PATH", "churn_model.pkl")
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "sklearn")
+FAST_START = os.getenv("FAST_START", "0") == "1"
+model = None
+MODEL_VERSION = None
+startup_error = None
 
-# Connect to Database
+# Champs du formulaire associés à chaque feature, dans l'ordre attendu par le modèle
+FORM_FIELDS = {
+    "Account length": "account_length",
+    "International plan": "international_plan",
+    "Voice mail plan": "voice_mail_plan",
+    "Number vmail messages": "num_vmail_messages",
+    "Total day calls": "total_day_calls",
+    "Total day charge": "total_day_charge",
+    "Total eve calls": "total_eve_calls",
+    "Total eve charge": "total_eve_charge",
+    "Total night calls": "total_night_calls",
+    "Total night charge": "total_night_charge",
+    "Total intl calls": "total_intl_calls",
+    "Total intl charge": "total_intl_charge",
+    "Customer service calls": "customer_service_calls",
+}
+
+# Database (connection pool shared by request threads), connected on the first prediction
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://admin:admin@db:5432/predictions_db")
-conn = psycopg2.connect(DATABASE_URL)
-cursor = conn.cursor()
-
-# ✅ Ensure the table is created at startup
-def create_table():
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS predictions (
-            id SERIAL PRIMARY KEY,
-            features TEXT,
-            prediction INT
-        )
-    """)
-    conn.commit()
-
-create_table()  # Call this function at app startup
+pool = None
+prediction_log = None
+_prediction_log_lock = threading.Lock()
+# While the database is unreachable, connection is retried with exponential backoff
+# and the predictions meant for the log are dropped (counted), never failed.
+LOG_RETRY_INITIAL = float(os.getenv("PREDICTION_LOG_RETRY_INITIAL", "1.0"))
+LOG_RETRY_MAX = float(os.getenv("PREDICTION_LOG_RETRY_MAX", "60.0"))
+log_retry_at = 0.0
+log_retry_delay = LOG_RETRY_INITIAL
+log_init_error = None
+log_unavailable_dropped = 0
+_log_dropped_lock = threading.Lock()
+
+def get_prediction_log():
+    """
+    Connect, create the table and start the bulk writer on first use.
+    Returns None while the database is unreachable (next attempt after the backoff).
+    """
+    global pool, prediction_log, log_retry_at, log_retry_delay, log_init_error
+    if prediction_log is None:
+        with _prediction_log_lock:
+            if prediction_log is None and time.monotonic() >= log_retry_at:
+                new_pool = None
+                try:
+                    new_pool = create_pool(DATABASE_URL, maxconn=int(os.getenv("DB_POOL_SIZE", "8")))
+                    ensure_schema(new_pool)
+                except Exception as e:
+                    if new_pool is not None:
+                        new_pool.closeall()
+                    log_init_error = str(e)
+                    log_retry_at = time.monotonic() + log_retry_delay
+                    print(f"⚠️ Prediction log unavailable, retrying in {log_retry_delay:.0f}s: {e}")
+                    log_retry_delay = min(log_retry_delay * 2, LOG_RETRY_MAX)
+                    return None
+                # ✅ Predictions are written behind the request, in bulk
+                writer = PredictionLogWriter(
+                    new_pool,
+                    max_buffer=int(os.getenv("PREDICTION_LOG_BUFFER", "10000")),
+                    batch_size=int(os.getenv("PREDICTION_LOG_BATCH_SIZE", "500")),
+                    flush_interval=float(os.getenv("PREDICTION_LOG_FLUSH_INTERVAL", "1.0")),
+                )
+                atexit.register(writer.close)
+                pool, prediction_log = new_pool, writer
+                log_init_error, log_retry_delay = None, LOG_RETRY_INITIAL
+    return prediction_log
+
+def log_prediction(features, prediction, churn_probability):
+    """Hand a prediction to the bulk writer; logging never fails the prediction."""
+    global log_unavailable_dropped
+    writer = get_prediction_log()
+    if writer is None:
+        with _log_dropped_lock:
+            log_unavailable_dropped += 1
+        return
+    writer.log(features, prediction, churn_probability)
+
+# ✅ Cache of single predictions, keyed by features and model version (0 disables it)
+prediction_cache = create_cache(
+    int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PREDICTION_CACHE_TTL")) if os.getenv("PREDICTION_CACHE_TTL") else None,
+    backend_url=os.getenv("PREDICTION_CACHE_URL"),
+)
+
+# ✅ Drift of the served numerical features against the training snapshot (DRIFT_MONITOR=0 disables it)
+DRIFT_MONITOR = os.getenv("DRIFT_MONITOR", "1") == "1"
+DRIFT_OPTIONS = {
+    "psi_threshold": float(os.getenv("DRIFT_PSI_THRESHOLD", "0.2")),
+    "ks_threshold": float(os.getenv("DRIFT_KS_THRESHOLD", "0.15")),
+    "min_rows": int(os.getenv("DRIFT_MIN_ROWS", "1000")),
+    "half_life_rows": int(os.getenv("DRIFT_HALF_LIFE_ROWS", "50000")),
+    "max_pending_rows": int(os.getenv("DRIFT_MAX_PENDING_ROWS", "20000")),
+}
+# Retrain signal: POSTed once per model when drift is detected (e.g. http://api:8000/retrain?mode=incremental)
+DRIFT_RETRAIN_URL = os.getenv("DRIFT_RETRAIN_URL", "")
+drift_monitor = None
+
+def on_drift(report):
+    """Called from the monitor thread the first time drift is detected."""
+    drifted = [column for column, values in report["features"].items() if values["drifted"]]
+    print(f"⚠️ Feature drift detected on {drifted}")
+    if DRIFT_RETRAIN_URL:
+        try:
+            urllib.request.urlopen(urllib.request.Request(DRIFT_RETRAIN_URL, data=b"", method="POST"), timeout=5)
+        except OSError as e:
+            print(f"⚠️ Retrain signal failed: {e}")
+
+def reset_drift_monitor(new_model):
+    """Compare traffic with the new model's training snapshot (paused if it has none)."""
+    global drift_monitor
+    if not DRIFT_MONITOR:
+        return
+    reference = getattr(getattr(new_model, "preprocessing", None), "drift_reference", None)
+    if reference is None:
+        drift_monitor = None
+    elif drift_monitor is None:
+        drift_monitor = create_drift_monitor(new_model, on_drift=on_drift, **DRIFT_OPTIONS)
+    else:
+        drift_monitor.reset(reference)
+
+def install_model(new_model):
+    """Serve a new primary version; the previous one stays loaded for in-memory rollback."""
+    model_registry.add(new_model, primary=True)
+
+def serve_model(new_model):
+    """Swap the served model; cached predictions of the previous one are dropped."""
+    global model, MODEL_VERSION
+    model = new_model
+    MODEL_VERSION = model_key(new_model)
+    if prediction_cache is not None:
+        prediction_cache.invalidate()
+    reset_drift_monitor(new_model)
+
+# ✅ Loaded model versions: the primary answers, the others are scored in shadow off the request path
+SHADOW_FRACTION = float(os.getenv("SHADOW_FRACTION", "0.1"))
+SHADOW_MODEL_PATHS = [path for path in os.getenv("SHADOW_MODEL_PATHS", "").split(",") if path]
+# Only models from this directory can be loaded through POST /models
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR") or os.path.dirname(os.path.abspath(MODEL_PATH))
+model_registry = ModelRegistry(
+    SHADOW_FRACTION,
+    n_workers=int(os.getenv("SHADOW_WORKERS", "1")),
+    max_versions=int(os.getenv("MAX_MODEL_VERSIONS", "4")),
+    on_promote=serve_model,
+)
+atexit.register(model_registry.close)
+
+def load_model():
+    """Load then warm up the model; readiness only reports ready afterwards."""
+    global startup_error
+    try:
+        with timed("model_load"):
+            loaded = load_serving_model(MODEL_PATH, backend=MODEL_BACKEND)
+        with timed("model_warm_up"):
+            warm_up(loaded)
+    except Exception as e:
+        startup_error = str(e)
+        if not FAST_START:
+            raise
+        return
+    install_model(loaded)
+    for path in SHADOW_MODEL_PATHS:
+        try:
+            model_registry.load(path, backend=MODEL_BACKEND)
+        except Exception as e:
+            print(f"⚠️ Shadow version {path} not loaded: {e}")
+
+if FAST_START:
+    # The server answers liveness probes while the model loads.
+    threading.Thread(target=load_model, name="model-loader", daemon=True).start()
+else:
+    load_model()
+
+# ✅ Request duration, status and in-flight gauge for /predict
+@app.before_request
+def start_timer():
+    if request.path == "/predict" and request.method == "POST":
+        g.request_start = time.perf_counter()
+        IN_FLIGHT.inc(app="flask", endpoint="/predict")
+
+@app.after_request
+def record_request(response):
+    start = g.pop("request_start", None)
+    if start is not None:
+        IN_FLIGHT.dec(app="flask", endpoint="/predict")
+        STAGE_SECONDS.observe(time.perf_counter() - start, app="flask", endpoint="/predict", stage="request")
+        REQUESTS.inc(app="flask", endpoint="/predict", status=response.status_code)
+    return response
 
 # ✅ Serve the Home Page UI
 @app.route("/")
@@ -38,35 +220,140 @@ def home():
 def predict():
     if request.method == "GET":
         return jsonify({"message": "Send a POST request with data to get predictions."})
+    if model is None:
+        return jsonify({"error": "Model is still loading." if startup_error is None else startup_error}), 503
 
     try:
-        features = [
-            float(request.form["account_length"]),
-            float(request.form["num_vmail_messages"]),
-            float(request.form["total_day_calls"]),
-            float(request.form["total_day_charge"]),
-            float(request.form["total_eve_calls"]),
-            float(request.form["total_eve_charge"]),
-            float(request.form["total_night_calls"]),
-            float(request.form["total_night_charge"]),
-            float(request.form["total_intl_calls"]),
-            float(request.form["total_intl_charge"]),
-            float(request.form["customer_service_calls"]),
-            int(request.form["international_plan"]),
-            int(request.form["voice_mail_plan"])
-        ]
-
-        features_array = np.array(features).reshape(1, -1)
-        prediction = model.predict(features_array)[0]
-
-        # Store prediction in database
-        cursor.execute("INSERT INTO predictions (features, prediction) VALUES (%s, %s)", (str(features), int(prediction)))
-        conn.commit()
+        with stage("flask", "/predict", "parse_form"):
+            features = [float(request.form[FORM_FIELDS[column]]) for column in FEATURE_COLUMNS]
+            features_array = np.array(features).reshape(1, -1)
+        if drift_monitor is not None:
+            drift_monitor.observe(features_array)
+
+        # Model read once: the version is derived from the model that actually predicts.
+        current = model
+        version = model_key(current)
+        with stage("flask", "/predict", "cache_lookup"):
+            cached = prediction_cache.get(features_array, version) if prediction_cache is not None else None
+        if cached is not None:
+            prediction, churn_probability = cached["prediction"], cached["probability"]
+        else:
+            with stage("flask", "/predict", "predict"):
+                start = time.perf_counter()
+                proba = current.predict_proba(features_array)[0]
+                model_registry.record(version, time.perf_counter() - start, 1)
+                prediction = int(current.classes_[np.argmax(proba)])
+                churn_probability = float(proba[list(current.classes_).index(1)])
+            if prediction_cache is not None:
+                prediction_cache.put(features_array, version,
+                                     {"prediction": prediction, "probability": churn_probability})
+        model_registry.shadow(features_array, [prediction], [churn_probability])
+        PREDICTED_ROWS.inc(app="flask", endpoint="/predict")
+
+        # Store prediction in database (asynchronously, in bulk)
+        with stage("flask", "/predict", "log_enqueue"):
+            log_prediction(features, prediction, churn_probability)
 
         return render_template("index.html", prediction_text=f"Prediction: {int(prediction)}")
     
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+# ✅ Prediction cache counters
+@app.route("/cache/stats")
+def cache_stats():
+    if prediction_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **prediction_cache.stats()})
+
+# ✅ Prometheus metrics (per-stage latencies, counters, gauges)
+LOG_PENDING = REGISTRY.gauge("churn_prediction_log_pending", "Predictions waiting to be written to the database.")
+LOG_ROWS = REGISTRY.gauge("churn_prediction_log_rows", "Prediction log rows by outcome.", ("outcome",))
+
+@app.route("/metrics")
+def metrics():
+    stats = prediction_log.stats() if prediction_log is not None else {"pending": 0, "written": 0, "dropped": 0,
+                                                                        "failed": 0}
+    # Rows dropped while the database was unreachable count as dropped too.
+    stats["dropped"] += log_unavailable_dropped
+    LOG_PENDING.set(stats["pending"])
+    for outcome in ("written", "dropped", "failed"):
+        LOG_ROWS.set(stats[outcome], outcome=outcome)
+    if drift_monitor is not None:
+        drift_monitor.export_metrics()
+    return Response(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+# ✅ Drift report (PSI/KS per numerical feature)
+@app.route("/drift")
+def drift():
+    if drift_monitor is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **drift_monitor.report()})
+
+# ✅ Model versions: primary, rollback history, per-version latency and shadow agreement
+@app.route("/models", methods=["GET", "POST"])
+def models():
+    if request.method == "GET":
+        return jsonify(model_registry.report())
+    path = request.args.get("path", "")
+    if not path or not within_directory(path, MODEL_REGISTRY_DIR):
+        return jsonify({"error": f"Only models from {MODEL_REGISTRY_DIR} can be loaded."}), 403
+    if not os.path.exists(path):
+        return jsonify({"error": f"Model not found: {path}"}), 404
+    try:
+        version = model_registry.load(path, backend=MODEL_BACKEND,
+                                      primary=request.args.get("promote", "false").lower() in ("1", "true"))
+    except Exception as e:
+        return jsonify({"error": f"Model not loaded: {e}"}), 400
+    return jsonify({"version": version, "primary": model_registry.primary_version}), 201
+
+@app.route("/models/rollback", methods=["POST"])
+def rollback_model():
+    try:
+        version = model_registry.rollback()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"primary": version})
+
+@app.route("/models/<version>/promote", methods=["POST"])
+def promote_model(version):
+    try:
+        model_registry.promote(version)
+    except KeyError:
+        return jsonify({"error": f"Version not loaded: {version}"}), 404
+    return jsonify({"primary": version, "history": model_registry.history})
+
+@app.route("/models/<version>", methods=["DELETE"])
+def unload_model(version):
+    try:
+        model_registry.remove(version)
+    except KeyError:
+        return jsonify({"error": f"Version not loaded: {version}"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"versions": model_registry.versions()})
+
+# ✅ Liveness (the process answers) vs readiness (model loaded and warmed up)
+def startup_state():
+    if model is not None:
+        return "ready"
+    return "loading" if startup_error is None else "error"
+
+@app.route("/healthcheck")
+def healthcheck():
+    state = startup_state()
+    return jsonify({"status": "ok" if state == "ready" else state, "live": True, "ready": state == "ready"})
+
+@app.route("/healthcheck/live")
+def liveness():
+    return jsonify({"status": "alive"})
+
+@app.route("/healthcheck/ready")
+def readiness():
+    state = startup_state()
+    if state != "ready":
+        return jsonify({"status": state, "error": startup_error}), 503
+    return jsonify({"status": state, "model_version": MODEL_VERSION})
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8082, debug=True)
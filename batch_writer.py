@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+
+
+class BackgroundBatchWriter:
+    """
+    Tampon borné vidé par lots par un thread de fond.
+
+    Les éléments déposés dans `_queue` sont regroupés et passés à `_write`
+    dès que `batch_size` éléments sont en attente ou que `flush_interval`
+    secondes se sont écoulées. Les sous-classes implémentent `_write(batch)`,
+    qui ne doit pas lever : un lot qui échoue est à comptabiliser ou à mettre
+    de côté par la sous-classe.
+
+    Parameters:
+    batch_size (int): Nombre d'éléments par lot.
+    flush_interval (float): Délai maximal (s) avant l'écriture d'un lot incomplet.
+    max_buffer (int): Nombre maximal d'éléments en attente.
+    thread_name (str): Nom du thread de fond.
+    """
+
+    def __init__(self, batch_size, flush_interval, max_buffer, thread_name):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_buffer)
+        self._flush_requested = threading.Event()
+        self._flushed = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._thread_name = thread_name
+        self._thread_lock = threading.Lock()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self._thread_name, daemon=True)
+                    self._thread.start()
+
+    def flush(self, timeout=None):
+        """
+        Écrit immédiatement les éléments en attente et attend leur écriture.
+
+        Returns:
+        bool: False si `timeout` a expiré avant.
+        """
+        if self._thread is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._flushed:
+            self._flush_requested.set()
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """
+        Vide le tampon puis arrête le thread de fond.
+
+        Returns:
+        bool: False si le thread n'a pas fini dans `timeout` secondes ; les
+              éléments encore en attente se récupèrent alors avec `_drain`.
+        """
+        if self._stopping:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.flush(timeout)
+        self._stopping = True
+        if self._thread is None:
+            return True
+        self._flush_requested.set()
+        self._thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return not self._thread.is_alive()
+
+    def _drain(self):
+        """Retire et retourne les éléments encore en attente."""
+        entries = []
+        while True:
+            try:
+                entries.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            self._queue.task_done()
+        return entries
+
+    def _write(self, batch):
+        raise NotImplementedError
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=min(timeout, 0.05)))
+            except queue.Empty:
+                pass
+
+            flush_now = self._flush_requested.is_set()
+            if batch and (len(batch) >= self.batch_size or flush_now or time.monotonic() >= deadline):
+                # Compléter le lot avec ce qui est déjà en attente.
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    self._write(batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                    with self._flushed:
+                        self._flushed.notify_all()
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+            elif not batch and time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+            if flush_now and not batch and self._queue.empty():
+                self._flush_requested.clear()
+                with self._flushed:
+                    self._flushed.notify_all()
+                if self._stopping:
+                    return
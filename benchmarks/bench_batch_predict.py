@@ -0,0 +1,49 @@
+"""
+Compare le débit (lignes/s) de /predict appelé en boucle avec celui de /predict/batch.
+
+Usage : python -m benchmarks.bench_batch_predict --rows 2000 --batch-size 500
+"""
+import argparse
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from model_pipeline1 import FEATURE_COLUMNS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /predict vs /predict/batch")
+    parser.add_argument("--rows", type=int, default=2000, help="Nombre de lignes à scorer")
+    parser.add_argument("--batch-size", type=int, default=500, help="Taille des lots envoyés à /predict/batch")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X_train = rng.random((5000, len(FEATURE_COLUMNS)))
+    y_train = (X_train[:, 0] + X_train[:, 5] > 1.0).astype(int)
+    app_module.model = RandomForestClassifier(random_state=0).fit(X_train, y_train)
+    app_module.model_loaded = True
+    app_module.MAX_BATCH_SIZE = max(app_module.MAX_BATCH_SIZE, args.batch_size)
+
+    X = rng.random((args.rows, len(FEATURE_COLUMNS)))
+    client = TestClient(app_module.app)
+
+    start = time.perf_counter()
+    for row in X:
+        client.post("/predict", json={"features": row.tolist()}).raise_for_status()
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, args.rows, args.batch_size):
+        client.post("/predict/batch", json={"rows": X[i:i + args.batch_size].tolist()}).raise_for_status()
+    batch = time.perf_counter() - start
+
+    print(f"/predict en boucle       : {args.rows / single:12.0f} lignes/s ({single:.2f} s)")
+    print(f"/predict/batch ({args.batch_size:>5})  : {args.rows / batch:12.0f} lignes/s ({batch:.2f} s)")
+    print(f"Accélération             : x{single / batch:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Débit du scoring hors ligne (main1.py --score) selon le nombre de processus.
+
+Usage : python -m benchmarks.bench_bulk_scoring --rows 1000000 --workers 1 2 4
+"""
+import argparse
+import os
+import resource
+import tempfile
+
+from bulk_scoring import score_file
+from model_pipeline1 import prepare_data, save_model, train_model
+from synthetic_data import write_churn_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du scoring hors ligne")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        train = write_churn_csv(os.path.join(tmpdir, "train.csv"), 20_000, seed=0)
+        X_train, _, y_train, _, preprocessing = prepare_data(train, train, return_preprocessing=True)
+        model_path = os.path.join(tmpdir, "churn_model.pkl")
+        save_model(train_model(X_train, y_train, random_state=0), model_path, preprocessing)
+        extract = write_churn_csv(os.path.join(tmpdir, "extract.csv"), args.rows, seed=1)
+
+        for n_workers in args.workers:
+            stats = score_file(model_path, extract, os.path.join(tmpdir, "scores.csv"),
+                               chunksize=args.chunksize, n_workers=n_workers)
+            print(f"{n_workers:3d} processus : {stats['seconds']:7.2f} s  {stats['rows_per_second']:10.0f} lignes/s")
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"Pic mémoire du processus principal : {peak_mb:.0f} Mo ({args.rows} lignes, blocs de {args.chunksize})")
+
+
+if __name__ == "__main__":
+    main()
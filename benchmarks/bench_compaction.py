@@ -0,0 +1,56 @@
+"""
+Compaction de la forêt : pour chaque candidat (nombre d'arbres × profondeur,
+types réduits), taille de l'artefact, durée de chargement, latence unitaire
+et par lot, écarts de F1 et de rappel, comparés au pickle et à l'artefact
+complet.
+
+Usage : python -m benchmarks.bench_compaction --rows 20000
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from compaction import compact_model
+from model_pipeline1 import prepare_data, train_model
+from synthetic_data import write_churn_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la compaction de la forêt")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--f1-tolerance", type=float, default=0.01)
+    parser.add_argument("--recall-tolerance", type=float, default=0.01)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        train_path = write_churn_csv(os.path.join(tmpdir, "train.csv"), args.rows, seed=0)
+        test_path = write_churn_csv(os.path.join(tmpdir, "test.csv"), max(args.rows // 4, 1000), seed=1)
+        X_train, X_test, y_train, y_test, preprocessing = prepare_data(train_path, test_path,
+                                                                       return_preprocessing=True)
+    model = train_model(X_train, y_train)
+    result = compact_model(model, X_test.to_numpy(dtype=np.float64), y_test, preprocessing,
+                           f1_tolerance=args.f1_tolerance, recall_tolerance=args.recall_tolerance)
+
+    baseline = result.baseline
+    print(f"pickle scikit-learn : {baseline['pickle_bytes'] / 1e6:7.2f} Mo")
+    print(f"artefact complet    : {baseline['artifact_bytes'] / 1e6:7.2f} Mo, chargement {baseline['load_ms']:.1f} ms, "
+          f"{baseline['latency_us']:.0f} µs/ligne seule, F1 {baseline['f1_score']:.4f}, rappel {baseline['recall']:.4f}")
+    print(f"{'arbres':>6} {'prof.':>5} {'nœuds':>8} {'Mo':>7} {'charg. ms':>9} {'µs/ligne':>8} {'µs/lot':>7} "
+          f"{'ΔF1':>8} {'Δrappel':>8}")
+    for candidate in result.candidates:
+        marker = "*" if candidate is result.best else (" " if candidate["within_tolerance"] else "x")
+        depth = candidate["max_depth_limit"] or "-"
+        print(f"{candidate['n_estimators']:>6} {depth:>5} {candidate['nodes']:>8} "
+              f"{candidate['artifact_bytes'] / 1e6:>7.2f} {candidate['load_ms']:>9.1f} {candidate['latency_us']:>8.0f} "
+              f"{candidate['batch_latency_us']:>7.1f} {candidate['delta_f1']:>+8.4f} {candidate['delta_recall']:>+8.4f} "
+              f"{marker}")
+    best = result.best
+    print(f"retenu (*) : {best['n_estimators']} arbres, profondeur {best['max_depth']}, "
+          f"{baseline['artifact_bytes'] / best['artifact_bytes']:.1f}x plus petit que l'artefact complet, "
+          f"{baseline['latency_us'] / best['latency_us']:.1f}x plus rapide par ligne (x : hors tolérance)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Temps de prepare_data à froid (CSV relus et prétraités) et à chaud (jeu de
+données rechargé depuis le cache, mappé en mémoire).
+
+Usage : python -m benchmarks.bench_dataset_cache --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from dataset_cache import DatasetCache, cached_prepare_data
+from model_pipeline1 import PREPARE_DATA_CONFIG, prepare_data
+from synthetic_data import write_churn_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du cache des jeux de données")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        train, test = os.path.join(tmpdir, "train.csv"), os.path.join(tmpdir, "test.csv")
+        write_churn_csv(train, args.rows, seed=0)
+        write_churn_csv(test, args.rows // 4, seed=1)
+
+        start = time.perf_counter()
+        prepare_data(train, test)
+        uncached = time.perf_counter() - start
+
+        cache = DatasetCache(os.path.join(tmpdir, "cache"))
+        start = time.perf_counter()
+        *_, status = cached_prepare_data(prepare_data, train, test, PREPARE_DATA_CONFIG, cache)
+        cold = time.perf_counter() - start
+        assert status == "miss"
+
+        warm = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            X_train, *_, status = cached_prepare_data(prepare_data, train, test, PREPARE_DATA_CONFIG, cache)
+            X_train.to_numpy().sum()  # force la lecture des pages mappées
+            warm.append(time.perf_counter() - start)
+            assert status == "hit"
+
+        print(f"{args.rows} lignes d'entraînement, {args.rows // 4} de test")
+        print(f"sans cache        : {uncached:7.3f} s")
+        print(f"à froid (écriture): {cold:7.3f} s")
+        print(f"à chaud           : {min(warm):7.3f} s  (x{uncached / min(warm):.1f}, dont hachage des CSV)")
+
+
+if __name__ == "__main__":
+    main()
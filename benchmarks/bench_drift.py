@@ -0,0 +1,65 @@
+"""
+Coût du suivi de dérive : durée de `observe` sur le chemin de requête (une
+ligne et un lot), débit de bout en bout, mémoire des histogrammes après
+beaucoup de trafic (inchangée), comparés à une prédiction unitaire.
+
+Usage : python -m benchmarks.bench_drift --requests 100000
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from drift import DriftMonitor
+from preprocessing import FEATURE_COLUMNS, FittedPreprocessing
+from synthetic_data import make_churn_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du suivi de dérive")
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    frame = make_churn_frame(20_000, seed=0)
+    preprocessing = FittedPreprocessing.fit(frame)
+    rows = preprocessing.encode_frame(make_churn_frame(args.requests, seed=1))[FEATURE_COLUMNS].to_numpy(
+        dtype=np.float64)
+    singles = [row.reshape(1, -1) for row in rows]
+
+    monitor = DriftMonitor(preprocessing.drift_reference)
+    size_before = monitor._counts.nbytes
+    start = time.perf_counter()
+    for row in singles:
+        monitor.observe(row)
+    observe_single = (time.perf_counter() - start) / len(singles)
+    monitor.flush()
+    drained = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, len(rows), args.batch_size):
+        monitor.observe(rows[i:i + args.batch_size])
+    observe_batch = (time.perf_counter() - start) / -(-len(rows) // args.batch_size)
+    monitor.flush()
+    report = monitor.report()
+    monitor.close()
+
+    X, y = preprocessing.transform_frame(frame)
+    model = RandomForestClassifier(random_state=0).fit(X.to_numpy(), y)
+    start = time.perf_counter()
+    for row in singles[:200]:
+        model.predict_proba(row)
+    predict = (time.perf_counter() - start) / 200
+
+    print(f"{report['rows']} lignes observées, {report['dropped']} ignorées")
+    print(f"observe (1 ligne)             : {observe_single * 1e6:7.2f} µs "
+          f"({observe_single / predict:.2%} d'une prédiction unitaire à {predict * 1e6:.0f} µs)")
+    print(f"observe (lot de {args.batch_size:5d})       : {observe_batch * 1e6:7.2f} µs")
+    print(f"débit de bout en bout         : {len(singles) / drained:9.0f} lignes/s (requêtes unitaires)")
+    print(f"histogrammes                  : {size_before} octets avant, {monitor._counts.nbytes} après "
+          f"({monitor._counts.shape[0]} colonnes × {monitor._counts.shape[1]} classes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Coût de l'envoi des métriques vers Elasticsearch pour le programme
+d'entraînement : un `es.index` synchrone par document (ancien
+log_to_elasticsearch) contre `ElasticsearchShipper.ship` (tampon + bulk en
+tâche de fond), avec un cluster local simulé lent puis injoignable.
+
+Usage : python -m benchmarks.bench_es_shipper --documents 500 --latency 0.005
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from es_shipper import ElasticsearchShipper
+
+
+def _stub_server(latency):
+    """Cluster simulé : chaque requête attend `latency` secondes puis réussit."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+            time.sleep(latency)
+            n_docs = max(1, sum(1 for line in body.splitlines() if line.strip()) // 2)
+            payload = json.dumps({
+                "took": 1, "errors": False, "result": "created",
+                "items": [{"index": {"status": 201}}] * n_docs,
+            }).encode()
+            self.send_response(200)
+            self.send_header("X-Elastic-Product", "Elasticsearch")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = do_PUT = _reply
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _synchronous(url, documents):
+    from elasticsearch import Elasticsearch
+
+    client = Elasticsearch(url, request_timeout=5)
+    start = time.perf_counter()
+    for document in documents:
+        client.index(index="mlflow-metrics", document=document)
+    return time.perf_counter() - start
+
+
+def _buffered(url, documents, spool_path):
+    shipper = ElasticsearchShipper(url, spool_path=spool_path, request_timeout=5)
+    start = time.perf_counter()
+    for document in documents:
+        shipper.ship(document)
+    blocked = time.perf_counter() - start
+    shipper.close()
+    return blocked, time.perf_counter() - start, shipper.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'envoi des métriques vers Elasticsearch")
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.005, help="Latence simulée d'une requête (s)")
+    args = parser.parse_args()
+
+    documents = [{"kind": "fold", "fold": i % 5, "f1_score": 0.5 + i / 1e4} for i in range(args.documents)]
+    server = _stub_server(args.latency)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    with tempfile.TemporaryDirectory() as tmpdir:
+        spool_path = os.path.join(tmpdir, "spool.jsonl")
+        sync_seconds = _synchronous(url, documents)
+        blocked, total, stats = _buffered(url, documents, spool_path)
+        print(f"{args.documents} documents, latence simulée {args.latency * 1e3:.1f} ms par requête")
+        print(f"  es.index synchrone : {sync_seconds * 1e3:8.1f} ms bloquants")
+        print(f"  shipper            : {blocked * 1e3:8.1f} ms bloquants, {total * 1e3:8.1f} ms jusqu'au flush "
+              f"({stats['sent']} envoyés)")
+
+        server.shutdown()
+        server.server_close()
+        blocked, total, stats = _buffered(url, documents, spool_path)
+        print("Cluster injoignable")
+        print(f"  shipper            : {blocked * 1e3:8.1f} ms bloquants, {total * 1e3:8.1f} ms jusqu'au flush "
+              f"({stats['spooled']} en spool)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Évaluation sur des millions de lignes : ancienne version (predict puis
+quatre métriques scikit-learn, courbes ROC/PR et bootstrap par
+ré-échantillonnage des lignes) contre `evaluation_report` (un passage,
+balayage des seuils et bootstrap sur l'histogramme des scores).
+
+Les probabilités sont précalculées : on ne mesure que l'évaluation, pas la
+prédiction du modèle.
+
+Usage : python -m benchmarks.bench_evaluation --rows 2000000
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn import metrics
+
+from evaluation import evaluation_report
+
+
+class _Precomputed:
+    """Modèle factice qui rend des probabilités déjà calculées."""
+
+    classes_ = np.array([0, 1])
+
+    def __init__(self, scores):
+        self.proba = np.column_stack([1 - scores, scores])
+
+    def predict_proba(self, X):
+        return self.proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.proba, axis=1))
+
+
+def _sklearn_metrics(model, y, rng=None):
+    rows = slice(None) if rng is None else rng.integers(0, len(y), len(y))
+    y_pred, y_true = model.predict(None)[rows], y[rows]
+    return (metrics.accuracy_score(y_true, y_pred), metrics.precision_score(y_true, y_pred),
+            metrics.recall_score(y_true, y_pred), metrics.f1_score(y_true, y_pred))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'évaluation")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--bootstrap", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--naive-replicates", type=int, default=5,
+                        help="Tirages mesurés pour extrapoler le bootstrap par lignes")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    y = (rng.random(args.rows) < 0.15).astype(np.int64)
+    # Scores au pas de 1/100 (forêt de 100 arbres), plus élevés pour les churners.
+    scores = np.clip(np.round(rng.beta(2, 5, args.rows) + 0.3 * y, 2), 0, 1)
+    model = _Precomputed(scores)
+
+    start = time.perf_counter()
+    _sklearn_metrics(model, y)
+    metrics.roc_auc_score(y, scores)
+    metrics.precision_recall_curve(y, scores)
+    baseline = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.naive_replicates):
+        _sklearn_metrics(model, y, rng)
+    naive_bootstrap = (time.perf_counter() - start) / args.naive_replicates * args.bootstrap
+
+    start = time.perf_counter()
+    report = evaluation_report(model, None, y, n_bootstrap=0)
+    single_pass = time.perf_counter() - start
+    start = time.perf_counter()
+    report = evaluation_report(model, None, y, n_bootstrap=args.bootstrap, n_workers=args.workers)
+    full = time.perf_counter() - start
+
+    print(f"{args.rows} lignes, {args.bootstrap} tirages bootstrap")
+    for label, seconds, note in (
+        ("scikit-learn (4 métriques + ROC + PR)", baseline, ""),
+        ("  + bootstrap par lignes (extrapolé)", naive_bootstrap, ""),
+        ("evaluation_report sans bootstrap", single_pass, f" ({baseline / single_pass:.0f}x)"),
+        ("evaluation_report avec bootstrap", full, f" ({(baseline + naive_bootstrap) / full:.0f}x)"),
+    ):
+        print(f"{label:<40}: {seconds:9.2f} s{note}")
+    print(f"F1 {report['metrics']['f1_score']:.4f} IC {report['intervals']['f1_score']}, "
+          f"meilleur seuil {report['best_f1']['threshold']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
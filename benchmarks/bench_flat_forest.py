@@ -0,0 +1,51 @@
+"""
+Latence par ligne de FlatForest comparée à RandomForestClassifier.predict_proba,
+pour une ligne et pour de petits lots.
+
+Usage : python -m benchmarks.bench_flat_forest --repeat 200
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from fast_forest import FlatForest
+from preprocessing import FittedPreprocessing
+from synthetic_data import make_churn_frame
+
+
+def _latency_us(predict, X, repeat):
+    predict(X)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        predict(X)
+    return (time.perf_counter() - start) / repeat / len(X) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la forêt aplatie")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--train-rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    train = make_churn_frame(args.train_rows, seed=0)
+    preprocessing = FittedPreprocessing.fit(train)
+    X_train, y_train = preprocessing.transform_frame(train)
+    model = RandomForestClassifier(random_state=0).fit(X_train.to_numpy(), y_train)
+    flat = FlatForest.from_sklearn(model)
+    X_test, _ = preprocessing.transform_frame(make_churn_frame(1000, seed=1))
+    X_test = X_test.to_numpy()
+
+    assert np.array_equal(flat.predict_proba(X_test), model.predict_proba(X_test))
+    print(f"{model.n_estimators} arbres, {len(flat.feature)} nœuds, profondeur max {flat.max_depth}")
+    for batch_size in (1, 10, 100, 1000):
+        X = X_test[:batch_size]
+        repeat = max(1, args.repeat // batch_size)
+        sk = _latency_us(model.predict_proba, X, repeat)
+        fast = _latency_us(flat.predict_proba, X, repeat)
+        print(f"lot de {batch_size:5d} : sklearn {sk:9.1f} µs/ligne  FlatForest {fast:9.1f} µs/ligne  (x{sk / fast:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Réentraînement complet (CSV historique + delta relus, forêt refaite) contre
+réentraînement incrémental (delta lu en base après le filigrane, arbres
+ajoutés par warm_start), pour plusieurs tailles de delta.
+
+Usage : python -m benchmarks.bench_incremental --history 100000 --deltas 1000 10000 50000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from model_pipeline1 import prepare_data, save_model, train_model
+from prediction_log import INSERT_COLUMNS, PREDICTIONS_TABLE, SQLitePool, ensure_schema, record_labels
+from preprocessing import FEATURE_COLUMNS, TARGET_COLUMN
+from retraining import run_incremental_training, run_training
+from synthetic_data import make_churn_frame, write_churn_csv
+
+
+def _log_labelled(pool, preprocessing, frame):
+    data = preprocessing.encode_frame(frame)
+    X = data[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    with pool.connection() as conn:
+        pool.insert_many(conn, PREDICTIONS_TABLE, INSERT_COLUMNS, [tuple(x) + (0, 0.5, time.time()) for x in X])
+        ids = [row[0] for row in conn.execute(f"SELECT id FROM {PREDICTIONS_TABLE} WHERE label IS NULL ORDER BY id")]
+    record_labels(pool, zip(ids, data[TARGET_COLUMN].tolist()))
+
+
+def _cleanup(*paths):
+    for path in paths:
+        os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du réentraînement incrémental")
+    parser.add_argument("--history", type=int, default=100_000)
+    parser.add_argument("--deltas", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--new-trees", type=int, default=20)
+    args = parser.parse_args()
+    os.environ["DATASET_CACHE_DIR"] = ""
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        history = make_churn_frame(args.history, seed=0)
+        history_path = os.path.join(tmpdir, "history.csv")
+        test_path = os.path.join(tmpdir, "test.csv")
+        history.to_csv(history_path, index=False)
+        write_churn_csv(test_path, max(args.history // 4, 1000), seed=1)
+
+        X_train, _, y_train, _, preprocessing = prepare_data(history_path, test_path, return_preprocessing=True)
+        model_path = os.path.join(tmpdir, "churn_model.pkl")
+        save_model(train_model(X_train, y_train), model_path, preprocessing)
+
+        print(f"Historique : {args.history} lignes, forêt de départ : 100 arbres")
+        print(f"{'delta':>8s} {'complet (s)':>12s} {'incrémental (s)':>16s} {'gain':>7s}")
+        for i, delta in enumerate(args.deltas):
+            frame = make_churn_frame(delta, seed=10 + i)
+            train_path = os.path.join(tmpdir, f"train_{delta}.csv")
+            pd.concat([history, frame]).to_csv(train_path, index=False)
+            db_path = os.path.join(tmpdir, f"predictions_{delta}.db")
+            pool = SQLitePool(db_path)
+            ensure_schema(pool)
+            _log_labelled(pool, preprocessing, frame)
+            pool.closeall()
+
+            start = time.perf_counter()
+            tmp_model, tmp_preprocessing, _ = run_training(train_path, test_path, model_path)
+            full = time.perf_counter() - start
+            _cleanup(tmp_model, tmp_preprocessing)
+
+            start = time.perf_counter()
+            tmp_model, tmp_preprocessing, metrics, tmp_state = run_incremental_training(
+                model_path, f"sqlite:///{db_path}", n_new_trees=args.new_trees, min_rows=1)
+            incremental = time.perf_counter() - start
+            _cleanup(tmp_model, tmp_preprocessing, tmp_state)
+            assert metrics["rows"] == delta
+
+            print(f"{delta:8d} {full:12.2f} {incremental:16.2f} {full / incremental:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
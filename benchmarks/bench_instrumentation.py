@@ -0,0 +1,53 @@
+"""
+Coût de l'instrumentation sur le chemin de prédiction : durée d'une mesure
+d'étape et d'un incrément de compteur, comparée à une prédiction unitaire.
+
+Usage : python -m benchmarks.bench_instrumentation --iterations 200000
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from instrumentation import Registry
+
+
+def _per_call_ns(function, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'instrumentation")
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    registry = Registry()
+    histogram = registry.histogram("stage_seconds", "Durée.", labelnames=("app", "endpoint", "stage"))
+    counter = registry.counter("requests", "Requêtes.", ("app", "endpoint", "status"))
+
+    def timed_stage():
+        with histogram.time(app="fastapi", endpoint="/predict", stage="predict"):
+            pass
+
+    stage_ns = _per_call_ns(timed_stage, args.iterations)
+    counter_ns = _per_call_ns(lambda: counter.inc(app="fastapi", endpoint="/predict", status=200), args.iterations)
+
+    rng = np.random.default_rng(0)
+    X = rng.random((1000, 13))
+    model = RandomForestClassifier(random_state=0).fit(X, X[:, 0] > 0.5)
+    predict_ns = _per_call_ns(lambda: model.predict_proba(X[:1]), 200)
+
+    # /predict : 4 étapes chronométrées + la requête + 2 compteurs.
+    per_request_ns = 5 * stage_ns + 2 * counter_ns
+    print(f"étape chronométrée : {stage_ns:8.0f} ns")
+    print(f"incrément compteur : {counter_ns:8.0f} ns")
+    print(f"prédiction unitaire sklearn : {predict_ns / 1e3:8.0f} µs")
+    print(f"surcoût par requête /predict : {per_request_ns / 1e3:.1f} µs ({per_request_ns / predict_ns:.2%} d'une prédiction)")
+
+
+if __name__ == "__main__":
+    main()
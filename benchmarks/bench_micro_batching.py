@@ -0,0 +1,79 @@
+"""
+Test de charge de /predict avec et sans micro-batching.
+
+Envoie des requêtes unitaires concurrentes à l'application (client ASGI en
+mémoire) et rapporte le débit ainsi que les latences p50/p99.
+
+Usage : python -m benchmarks.bench_micro_batching --requests 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from model_pipeline1 import FEATURE_COLUMNS
+
+
+async def _load(n_requests, concurrency, X):
+    latencies = []
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = asyncio.Queue()
+        for row in X[:n_requests]:
+            queue.put_nowait(row.tolist())
+
+        async def worker():
+            while not queue.empty():
+                features = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post("/predict", json={"features": features})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    if app_module.batcher is not None:
+        await app_module.batcher.stop()
+    return np.array(latencies) * 1000.0, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test du micro-batching de /predict")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X_train = rng.random((5000, len(FEATURE_COLUMNS)))
+    y_train = (X_train[:, 0] + X_train[:, 5] > 1.0).astype(int)
+    app_module.model = RandomForestClassifier(random_state=0).fit(X_train, y_train)
+    app_module.model_loaded = True
+    app_module.MICRO_BATCH_MAX_SIZE = args.max_batch_size
+    app_module.MICRO_BATCH_MAX_WAIT_MS = args.max_wait_ms
+    X = rng.random((args.requests, len(FEATURE_COLUMNS)))
+
+    for enabled in (False, True):
+        app_module.MICRO_BATCHING = enabled
+        app_module.batcher = None
+        latencies, elapsed = asyncio.run(_load(args.requests, args.concurrency, X))
+        label = "avec micro-batching" if enabled else "sans micro-batching"
+        print(
+            f"{label:22s}: {args.requests / elapsed:8.0f} req/s  "
+            f"p50={np.percentile(latencies, 50):7.2f} ms  p99={np.percentile(latencies, 99):7.2f} ms"
+        )
+        if enabled:
+            stats = app_module.batcher.stats()
+            print(f"  taille moyenne des lots : {stats['batch_size']['mean']:.1f}, "
+                  f"attente moyenne en file : {stats['queue_wait_ms']['mean']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
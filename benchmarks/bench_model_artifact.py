@@ -0,0 +1,101 @@
+"""
+Mémoire résidente par worker et temps de chargement du modèle : pickle joblib
+(copie privée par processus) contre artefact mappé en mémoire (une copie
+partagée en cache disque), pour 1, 4 et 16 workers chargés simultanément.
+
+RSS compte les pages partagées dans chaque processus ; la mémoire privée
+(Private_Clean + Private_Dirty) est celle qu'aucun autre worker ne partage.
+
+Usage : python -m benchmarks.bench_model_artifact --train-rows 50000 --workers 1 4 16
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from model_artifact import save_artifact
+from preprocessing import FittedPreprocessing
+from synthetic_data import make_churn_frame
+
+
+def _memory_kb():
+    """RSS et mémoire privée du processus courant (Linux, /proc/self/smaps_rollup)."""
+    values = {"Rss": 0, "Private": 0}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] == "Rss:":
+                values["Rss"] = int(parts[1])
+            elif parts[0] in ("Private_Clean:", "Private_Dirty:"):
+                values["Private"] += int(parts[1])
+    return values["Rss"], values["Private"]
+
+
+def _worker(kind, path, X, barrier, results):
+    # Mêmes modules importés avant la mesure dans les deux cas (sklearn compris).
+    from serving import load_serving_model
+
+    rss_before, private_before = _memory_kb()
+    start = time.perf_counter()
+    model = joblib.load(path) if kind == "pickle" else load_serving_model(path)
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    model.predict_proba(X)  # parcourt les arbres : les pages utiles sont chargées
+    predict_time = time.perf_counter() - start
+    barrier.wait()  # tous les workers ont chargé le modèle : mesure simultanée
+    rss, private = _memory_kb()
+    results.put((load_time, predict_time, rss - rss_before, private - private_before))
+    barrier.wait()
+
+
+def _run(kind, path, X, n_workers):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(n_workers)
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(kind, path, X, barrier, results)) for _ in range(n_workers)]
+    for process in processes:
+        process.start()
+    measures = np.array([results.get() for _ in processes])
+    for process in processes:
+        process.join()
+    return measures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des artefacts de modèle mappés en mémoire")
+    parser.add_argument("--train-rows", type=int, default=50000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    train = make_churn_frame(args.train_rows, seed=0)
+    preprocessing = FittedPreprocessing.fit(train)
+    X_train, y_train = preprocessing.transform_frame(train)
+    model = RandomForestClassifier(random_state=0).fit(X_train.to_numpy(), y_train)
+    X = X_train.to_numpy()[:1000]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pickle_path = os.path.join(tmpdir, "churn_model.pkl")
+        artifact_path = os.path.join(tmpdir, "churn_model.artifact")
+        joblib.dump(model, pickle_path)
+        save_artifact(model, artifact_path, preprocessing)
+        artifact_mb = sum(entry.stat().st_size for entry in os.scandir(artifact_path)) / 2**20
+        print(f"pickle {os.path.getsize(pickle_path) / 2**20:.1f} Mo, artefact {artifact_mb:.1f} Mo")
+
+        # L'artefact prend des features brutes ; le pickle des features prétraitées.
+        raw = preprocessing.encode_frame(train.iloc[:1000])[preprocessing.feature_columns].to_numpy(dtype=np.float64)
+        for n_workers in args.workers:
+            for kind, path, inputs in (("pickle", pickle_path, X), ("artefact", artifact_path, raw)):
+                measures = _run("pickle" if kind == "pickle" else "artifact", path, inputs, n_workers)
+                load_time, predict_time, rss, private = measures.mean(axis=0)
+                print(f"{n_workers:3d} workers, {kind:8s} : chargement {load_time * 1e3:7.1f} ms  "
+                      f"1re prédiction {predict_time * 1e3:7.1f} ms  RSS/worker {rss / 1024:6.1f} Mo  "
+                      f"privée/worker {private / 1024:6.1f} Mo  privée totale {measures[:, 3].sum() / 1024:7.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Coût du scoring en ombre pour la version principale : latence de
+/predict/batch (TestClient) sans version en ombre, puis avec une candidate
+scorée en ombre sur chaque lot (SHADOW_FRACTION=1). Affiche ensuite le débit
+du pool d'ombre et le rapport d'accord de la candidate.
+
+Usage : python -m benchmarks.bench_model_registry --rows 1000 --requests 200
+"""
+import argparse
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from model_registry import ModelRegistry
+from preprocessing import FEATURE_COLUMNS
+from serving import ServingModel
+
+
+def _latencies(client, body, n_requests):
+    latencies = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        client.post("/predict/batch", json=body).raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du scoring en ombre")
+    parser.add_argument("--rows", type=int, default=1000, help="Lignes par lot")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=1, help="Threads du pool d'ombre")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X_train = rng.random((5000, len(FEATURE_COLUMNS)))
+    y_train = (X_train[:, 0] + X_train[:, 5] > 1.0).astype(int)
+    primary = ServingModel(RandomForestClassifier(random_state=0).fit(X_train, y_train), version="primary")
+    candidate = ServingModel(RandomForestClassifier(n_estimators=50, max_depth=8, random_state=1)
+                             .fit(X_train, y_train), version="candidate")
+    app_module.prediction_cache = None
+    app_module.MAX_BATCH_SIZE = max(app_module.MAX_BATCH_SIZE, args.rows)
+    client = TestClient(app_module.app)
+    body = {"rows": rng.random((args.rows, len(FEATURE_COLUMNS))).tolist()}
+
+    print(f"{args.requests} requêtes de {args.rows} lignes")
+    print(f"{'ombre':<22} {'p50 ms':>8} {'p99 ms':>8} {'moyenne ms':>11}")
+    for label, shadow_fraction in (("aucune", 0.0), ("1 candidate, 100 %", 1.0)):
+        registry = ModelRegistry(shadow_fraction, n_workers=args.workers, on_promote=app_module._serve_model, seed=0)
+        app_module.model_registry = registry
+        registry.add(primary, primary=True)
+        if shadow_fraction:
+            registry.add(candidate)
+        _latencies(client, body, 5)
+        latencies = _latencies(client, body, args.requests)
+        start = time.perf_counter()
+        registry.flush()
+        drain = time.perf_counter() - start
+        print(f"{label:<22} {np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f} "
+              f"{latencies.mean():>11.2f}")
+        registry.close()
+
+    report = registry.report()
+    shadow = report["versions"]["candidate"]["shadow"]
+    seconds = shadow["row_latency_us"] * shadow["rows"] / 1e6
+    print(f"Pool d'ombre : {shadow['rows']} lignes en {seconds:.2f} s "
+          f"({shadow['rows'] / seconds:,.0f} lignes/s), vidé {drain * 1e3:.0f} ms après la dernière requête, "
+          f"{report['dropped']} lots ignorés")
+    print(f"Accord candidate/principale : {shadow['agreement']:.4f}, "
+          f"écart moyen de probabilité {shadow['mean_abs_probability_diff']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Latence de /predict avec et sans cache de prédictions, pour un trafic où une
+fraction des requêtes répète des vecteurs déjà vus.
+
+Usage : python -m benchmarks.bench_prediction_cache --requests 2000 --repeat-ratio 0.8
+"""
+import argparse
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from prediction_cache import PredictionCache
+from preprocessing import FittedPreprocessing
+from serving import ServingModel
+from synthetic_data import make_churn_frame
+
+
+def _run(client, payloads):
+    latencies = []
+    for payload in payloads:
+        start = time.perf_counter()
+        client.post("/predict", json=payload)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du cache de prédictions")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeat-ratio", type=float, default=0.8)
+    args = parser.parse_args()
+
+    train = make_churn_frame(5000, seed=0)
+    preprocessing = FittedPreprocessing.fit(train)
+    X_train, y_train = preprocessing.transform_frame(train)
+    estimator = RandomForestClassifier(random_state=0).fit(X_train.to_numpy(), y_train)
+    app_module.model = ServingModel(estimator, preprocessing, version="bench")
+    app_module.model_loaded = True
+
+    # Trafic : `repeat_ratio` des requêtes tirées parmi 50 vecteurs fréquents.
+    raw = preprocessing.encode_frame(make_churn_frame(args.requests, seed=1))[preprocessing.feature_columns]
+    raw = raw.to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(0)
+    repeated = rng.random(args.requests) < args.repeat_ratio
+    rows = np.where(repeated[:, np.newaxis], raw[rng.integers(0, 50, args.requests)], raw)
+    payloads = [{"features": row.tolist()} for row in rows]
+
+    client = TestClient(app_module.app)
+    for label, cache in (("sans cache", None), ("avec cache", PredictionCache(max_size=10000))):
+        app_module.prediction_cache = cache
+        latencies = _run(client, payloads)
+        print(f"{label:10s} : p50 {np.percentile(latencies, 50):6.2f} ms  p99 {np.percentile(latencies, 99):6.2f} ms"
+              f"  moyenne {latencies.mean():6.2f} ms")
+        if cache is not None:
+            stats = cache.stats()
+            print(f"            succès {stats['hits']}  échecs {stats['misses']}  taux {stats['hit_ratio']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
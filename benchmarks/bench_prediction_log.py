@@ -0,0 +1,65 @@
+"""
+Débit de la journalisation des prédictions : INSERT + commit synchrone par
+requête (ancien comportement de app_flask.py) contre l'écriture différée en
+masse de PredictionLogWriter, sur le substitut SQLite.
+
+Usage : python -m benchmarks.bench_prediction_log --rows 5000 --threads 8
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from prediction_log import INSERT_COLUMNS, PredictionLogWriter, SQLitePool, ensure_schema
+from preprocessing import FEATURE_COLUMNS
+
+
+def _run_threads(n_threads, n_rows, target):
+    per_thread = n_rows // n_threads
+    threads = [threading.Thread(target=target, args=(per_thread,)) for _ in range(n_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, per_thread * n_threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la journalisation des prédictions")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    row = [0.5] * len(FEATURE_COLUMNS)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pool = SQLitePool(os.path.join(tmpdir, "sync.db"), maxconn=args.threads)
+        ensure_schema(pool)
+
+        def synchronous(n):
+            for _ in range(n):
+                with pool.connection() as conn:
+                    pool.insert_many(conn, "predictions", INSERT_COLUMNS, [tuple(row) + (1, 0.5, time.time())])
+
+        elapsed, n = _run_threads(args.threads, args.rows, synchronous)
+        print(f"INSERT + commit par requête : {n / elapsed:10.0f} lignes/s")
+
+        pool = SQLitePool(os.path.join(tmpdir, "behind.db"))
+        ensure_schema(pool)
+        writer = PredictionLogWriter(pool, max_buffer=args.rows, batch_size=500, flush_interval=0.5)
+
+        def write_behind(n):
+            for _ in range(n):
+                writer.log(row, 1, 0.5)
+
+        elapsed, n = _run_threads(args.threads, args.rows, write_behind)
+        print(f"write-behind (appel log)    : {n / elapsed:10.0f} lignes/s")
+        start = time.perf_counter()
+        writer.close()
+        total = elapsed + time.perf_counter() - start
+        print(f"write-behind (jusqu'au disque) : {n / total:7.0f} lignes/s en {writer.batches} lots")
+
+
+if __name__ == "__main__":
+    main()
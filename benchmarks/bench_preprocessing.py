@@ -0,0 +1,51 @@
+"""
+Coût par ligne du prétraitement : chemin pandas (drop, encodage, scaling sur
+un DataFrame) contre la transformation affine NumPy de FittedPreprocessing,
+ligne par ligne et par lot.
+
+Usage : python -m benchmarks.bench_preprocessing --rows 2000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from preprocessing import FEATURE_COLUMNS, FittedPreprocessing
+from synthetic_data import make_churn_frame
+
+
+def _per_row_us(elapsed, n_rows):
+    return elapsed / n_rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du prétraitement à l'inférence")
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    train = make_churn_frame(10000, seed=0)
+    preprocessing = FittedPreprocessing.fit(train)
+    frame = make_churn_frame(args.rows, seed=1)
+    raw = preprocessing.encode_frame(frame)[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+    start = time.perf_counter()
+    for i in range(args.rows):
+        preprocessing.transform_frame(frame.iloc[i:i + 1])
+    pandas_row = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.rows):
+        preprocessing.transform_array(raw[i:i + 1])
+    numpy_row = time.perf_counter() - start
+
+    start = time.perf_counter()
+    preprocessing.transform_array(raw)
+    numpy_batch = time.perf_counter() - start
+
+    print(f"pandas, ligne par ligne : {_per_row_us(pandas_row, args.rows):10.2f} µs/ligne")
+    print(f"NumPy, ligne par ligne  : {_per_row_us(numpy_row, args.rows):10.2f} µs/ligne")
+    print(f"NumPy, lot de {args.rows:<9d}: {_per_row_us(numpy_batch, args.rows):10.4f} µs/ligne")
+
+
+if __name__ == "__main__":
+    main()
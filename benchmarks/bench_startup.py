@@ -0,0 +1,119 @@
+"""
+Démarrage à froid : temps d'import de chaque point d'entrée, puis, pour l'API
+FastAPI lancée sous uvicorn, délai avant liveness, readiness (modèle chargé et
+préchauffé) et première prédiction. Démarrage classique (modèle chargé à
+l'import) contre FAST_START=1, avec un modèle pickle puis un artefact mappé.
+
+Usage : python -m benchmarks.bench_startup --train-rows 20000 --repeat 3
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from model_artifact import save_artifact
+from model_pipeline1 import save_model
+from preprocessing import FEATURE_COLUMNS, FittedPreprocessing
+from synthetic_data import make_churn_frame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_seconds(module, env):
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _status(url, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def _serve(env, timeout=60.0):
+    """Lance uvicorn ; retourne les délais (s) avant liveness, readiness et première prédiction."""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    payload = {"features": [0.5] * len(FEATURE_COLUMNS)}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    times = {}
+    try:
+        for name, check in (("live", lambda: _status(base + "/healthcheck/live") == 200),
+                            ("ready", lambda: _status(base + "/healthcheck/ready") == 200),
+                            ("first_prediction", lambda: _status(base + "/predict", payload) == 200)):
+            while not check():
+                if time.perf_counter() - start > timeout:
+                    raise TimeoutError(f"{name} non atteint en {timeout} s")
+                time.sleep(0.005)
+            times[name] = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du démarrage à froid")
+    parser.add_argument("--train-rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    train = make_churn_frame(args.train_rows, seed=0)
+    preprocessing = FittedPreprocessing.fit(train)
+    X_train, y_train = preprocessing.transform_frame(train)
+    model = RandomForestClassifier(random_state=0).fit(X_train, y_train)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pickle_path = os.path.join(tmpdir, "churn_model.pkl")
+        artifact_path = os.path.join(tmpdir, "churn_model.artifact")
+        save_model(model, pickle_path, preprocessing)
+        save_artifact(model, artifact_path, preprocessing)
+        base_env = dict(os.environ, PREDICTION_CACHE_SIZE="0", DATASET_CACHE_DIR="")
+
+        print("Import (FAST_START=1, meilleur de", args.repeat, "essais)")
+        for module in ("main1", "app", "app_flask"):
+            env = dict(base_env, FAST_START="1", MODEL_PATH=pickle_path,
+                       DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'p.db')}")
+            seconds = min(_import_seconds(module, env) for _ in range(args.repeat))
+            print(f"  {module:10s} {seconds * 1e3:8.1f} ms")
+
+        print("API FastAPI sous uvicorn (médiane)")
+        for label, path in (("pickle", pickle_path), ("artefact", artifact_path)):
+            for fast_start in ("0", "1"):
+                env = dict(base_env, MODEL_PATH=path, FAST_START=fast_start)
+                runs = [_serve(env) for _ in range(args.repeat)]
+                median = {name: float(np.median([run[name] for run in runs])) for name in runs[0]}
+                print(f"  {label:8s} FAST_START={fast_start} : liveness {median['live'] * 1e3:7.0f} ms  "
+                      f"readiness {median['ready'] * 1e3:7.0f} ms  "
+                      f"1re prédiction {median['first_prediction'] * 1e3:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
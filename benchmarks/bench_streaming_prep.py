@@ -0,0 +1,53 @@
+"""
+Mémoire maximale et durée de prepare_data (en mémoire) et de
+prepare_data_streaming (par blocs) sur des CSV synthétiques de taille croissante.
+
+Chaque mesure est faite dans un processus neuf pour que le pic de mémoire
+résidente (ru_maxrss) ne soit pas pollué par les mesures précédentes.
+
+Usage : python -m benchmarks.bench_streaming_prep --rows 100000 1000000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from synthetic_data import write_churn_csv
+
+
+def _measure(mode, train_path, test_path, output_dir, chunksize):
+    start = time.perf_counter()
+    if mode == "memory":
+        from model_pipeline1 import prepare_data
+        prepare_data(train_path, test_path)
+    else:
+        from streaming_data import prepare_data_streaming
+        prepare_data_streaming(train_path, test_path, output_dir, chunksize=chunksize, outliers="iqr")
+    elapsed = time.perf_counter() - start
+    # ru_maxrss est en kilo-octets sous Linux
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mémoire de prepare_data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n_rows in args.rows:
+            train_path = write_churn_csv(os.path.join(tmpdir, "train.csv"), n_rows, seed=1)
+            test_path = write_churn_csv(os.path.join(tmpdir, "test.csv"), n_rows // 4, seed=2)
+            for mode in ("memory", "streaming"):
+                with ctx.Pool(1) as pool:
+                    elapsed, peak_mb = pool.apply(
+                        _measure, (mode, train_path, test_path, os.path.join(tmpdir, "out"), args.chunksize)
+                    )
+                print(f"{n_rows:>10d} lignes  {mode:9s}: {elapsed:7.2f} s  pic RSS {peak_mb:8.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Passage à l'échelle de la recherche d'hyperparamètres (successive halving +
+validation croisée) de 1 à N processus.
+
+Usage : python -m benchmarks.bench_tuning --rows 20000 --max-workers 8
+"""
+import argparse
+import os
+
+from preprocessing import FittedPreprocessing
+from synthetic_data import make_churn_frame
+from tuning import DEFAULT_PARAM_GRID, successive_halving
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la recherche d'hyperparamètres")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--cv-folds", type=int, default=3)
+    args = parser.parse_args()
+
+    train = make_churn_frame(args.rows, seed=0)
+    X, y = FittedPreprocessing.fit(train).transform_frame(train)
+
+    workers = sorted({1, *[2 ** i for i in range(1, args.max_workers.bit_length())], args.max_workers})
+    baseline = None
+    best = None
+    for n_workers in workers:
+        result = successive_halving(X, y, DEFAULT_PARAM_GRID, n_splits=args.cv_folds, n_workers=n_workers)
+        baseline = baseline or result.elapsed
+        if best is None:
+            best = result.best_params
+        assert result.best_params == best, "le résultat dépend du nombre de processus"
+        print(f"{n_workers:3d} processus : {result.elapsed:7.2f} s  accélération x{baseline / result.elapsed:.2f}"
+              f"  ({len(result.trials)} essais)")
+    print(f"Meilleurs paramètres : {best}")
+
+
+if __name__ == "__main__":
+    main()
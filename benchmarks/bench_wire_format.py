@@ -0,0 +1,96 @@
+"""
+Coût du format d'échange de /predict/batch, pour 10 000 lignes : décodage
+seul, décodage + prédiction, et requête complète (TestClient), en JSON
+(json.loads puis tableau NumPy, ou validation pydantic élément par élément)
+et dans les formats binaires (.npy float64/float32, Arrow IPC).
+
+Usage : python -m benchmarks.bench_wire_format --rows 10000
+"""
+import argparse
+import io
+import json
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from preprocessing import FEATURE_COLUMNS
+from wire_format import ARROW_MEDIA_TYPE, NPY_MEDIA_TYPE, decode_features
+
+
+def _best(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _npy(X):
+    buffer = io.BytesIO()
+    np.save(buffer, X)
+    return buffer.getvalue()
+
+
+def _arrow(X):
+    import pyarrow as pa
+
+    column = pa.FixedSizeListArray.from_arrays(pa.array(X.ravel()), X.shape[1])
+    table = pa.table({"features": column})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des formats d'échange de /predict/batch")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X_train = rng.random((5000, len(FEATURE_COLUMNS)))
+    y_train = (X_train[:, 0] + X_train[:, 5] > 1.0).astype(int)
+    model = RandomForestClassifier(random_state=0).fit(X_train, y_train)
+    app_module.model, app_module.model_loaded = model, True
+    app_module.MAX_BATCH_SIZE = max(app_module.MAX_BATCH_SIZE, args.rows)
+    client = TestClient(app_module.app)
+
+    X = rng.random((args.rows, len(FEATURE_COLUMNS)))
+    formats = {
+        "JSON (rows)": ("application/json", json.dumps({"rows": X.tolist()}).encode(),
+                        lambda body: app_module._batch_to_array(json.loads(body))),
+        "JSON (pydantic)": ("application/json", json.dumps({"rows": X.tolist()}).encode(),
+                            lambda body: np.asarray(app_module.BatchPredictionInput.model_validate_json(body).rows)),
+        ".npy float64": (NPY_MEDIA_TYPE, _npy(X), lambda body: decode_features(body, NPY_MEDIA_TYPE)),
+        ".npy float32": (NPY_MEDIA_TYPE, _npy(X.astype(np.float32)),
+                         lambda body: decode_features(body, NPY_MEDIA_TYPE)),
+    }
+    try:
+        formats["Arrow float32"] = (ARROW_MEDIA_TYPE, _arrow(X.astype(np.float32)),
+                                    lambda body: decode_features(body, ARROW_MEDIA_TYPE))
+    except ImportError:
+        print("pyarrow absent : format Arrow ignoré")
+
+    scale = 10_000 / args.rows
+    print(f"{'format':<17} {'corps Ko':>9} {'décodage ms':>12} {'+ prédiction ms':>16} {'requête ms':>11}  (pour 10 000 lignes)")
+    for name, (content_type, body, decode) in formats.items():
+        parse = _best(lambda: decode(body), args.repeat)
+        parse_predict = _best(lambda: model.predict_proba(decode(body)), args.repeat)
+        # L'API ne valide pas les lots avec pydantic : seul le décodage est mesuré pour comparaison.
+        request = "-"
+        if name != "JSON (pydantic)":
+            seconds = _best(lambda: client.post("/predict/batch", content=body,
+                                                headers={"Content-Type": content_type}).raise_for_status(),
+                            args.repeat)
+            request = f"{seconds * scale * 1e3:.1f}"
+        print(f"{name:<17} {len(body) / 1e3:>9.0f} {parse * scale * 1e3:>12.2f} {parse_predict * scale * 1e3:>16.1f} "
+              f"{request:>11}")
+
+
+if __name__ == "__main__":
+    main()
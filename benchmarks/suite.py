@@ -0,0 +1,226 @@
+"""
+Suite de benchmarks reproductible : temps et pic mémoire de chaque étape du
+pipeline sur des données synthétiques (schéma churn-bigml) de 10K à 10M lignes.
+
+Les résultats sont écrits en JSON ; `compare` signale les régressions par
+rapport à une référence enregistrée (code de sortie 1 en cas de régression).
+
+Usage :
+    python -m benchmarks.suite run --sizes 10000 100000 1000000 --output bench.json
+    python -m benchmarks.suite compare baseline.json bench.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+import model_pipeline
+import model_pipeline1
+from preprocessing import NUMERICAL_COLUMNS
+from synthetic_data import write_churn_csv
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def measure(function, repeat=1, memory=True):
+    """
+    Meilleur temps sur `repeat` exécutions, puis pic mémoire (tracemalloc) sur
+    une exécution séparée pour ne pas fausser le chronométrage.
+
+    Returns:
+    tuple: (secondes, pic mémoire en Mo ou None, résultat de la dernière exécution)
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            result = function()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return best, peak_mb, result
+
+
+def _record(results, size, stage, rows, seconds, peak_mb, units=None):
+    """Ajoute une mesure : `size` est la taille du jeu généré, `rows` les lignes traitées par l'étape."""
+    entry = {"size": size, "stage": stage, "rows": rows, "seconds": seconds, "peak_mb": peak_mb}
+    if units is not None:
+        entry["throughput"] = units / seconds if seconds > 0 else None
+    results.append(entry)
+    memory = f"{peak_mb:9.1f} Mo" if peak_mb is not None else "        -"
+    print(f"  {stage:26s} {rows:>10d} lignes  {seconds:9.3f} s  {memory}", flush=True)
+
+
+def _predict_throughput(model, X, n_requests):
+    """Débit de bout en bout de POST /predict (app.py) via un client en processus."""
+    from fastapi.testclient import TestClient
+
+    import app as app_module
+    from serving import ServingModel
+
+    saved = (app_module.model, app_module.model_loaded, app_module.prediction_cache)
+    app_module.model, app_module.model_loaded = ServingModel(model), True
+    app_module.prediction_cache = None  # mesure du modèle, pas du cache
+    try:
+        client = TestClient(app_module.app)
+        payloads = [{"features": row.tolist()} for row in X[:n_requests]]
+        client.post("/predict", json=payloads[0])
+        start = time.perf_counter()
+        for payload in payloads:
+            client.post("/predict", json=payload)
+        return time.perf_counter() - start
+    finally:
+        app_module.model, app_module.model_loaded, app_module.prediction_cache = saved
+
+
+def run_size(n_rows, workdir, max_train_rows, n_single, n_requests, repeat, seed):
+    """Exécute toutes les étapes pour une taille de données."""
+    results = []
+    train_path = write_churn_csv(os.path.join(workdir, f"train_{n_rows}.csv"), n_rows, seed=seed)
+    test_path = write_churn_csv(os.path.join(workdir, f"test_{n_rows}.csv"), max(1, n_rows // 4), seed=seed + 1)
+
+    seconds, peak, prepared = measure(
+        lambda: model_pipeline1.prepare_data(train_path, test_path), repeat)
+    _record(results, n_rows, "prepare_data", n_rows, seconds, peak, n_rows)
+    X_train, X_test, y_train, y_test = prepared
+
+    raw = model_pipeline.drop_columns(pd.read_csv(train_path), ["State"])
+    for method in ("zscore", "iqr", "iqr_mask"):
+        seconds, peak, _ = measure(
+            lambda: model_pipeline.remove_outliers(raw, NUMERICAL_COLUMNS, method=method), repeat)
+        _record(results, n_rows, f"remove_outliers[{method}]", n_rows, seconds, peak, n_rows)
+    del raw
+
+    # L'entraînement est plafonné : au-delà, seule la préparation passe à l'échelle.
+    n_train = min(n_rows, max_train_rows)
+    seconds, peak, model = measure(
+        lambda: model_pipeline1.train_model(X_train[:n_train], y_train[:n_train], random_state=seed), 1)
+    _record(results, n_rows, "train_model", n_train, seconds, peak, n_train)
+
+    seconds, peak, _ = measure(lambda: model_pipeline1.evaluate_model(model, X_test, y_test), repeat)
+    _record(results, n_rows, "evaluate_model", len(X_test), seconds, peak, len(X_test))
+
+    model_path = os.path.join(workdir, "model.pkl")
+    seconds, peak, _ = measure(lambda: model_pipeline1.save_model(model, model_path), repeat)
+    _record(results, n_rows, "save_model", n_train, seconds, peak)
+    seconds, peak, _ = measure(lambda: model_pipeline1.load_model(model_path), repeat)
+    _record(results, n_rows, "load_model", n_train, seconds, peak)
+
+    X = X_test.to_numpy()
+    single = X[:n_single]
+    seconds, peak, _ = measure(lambda: [model.predict_proba(row[np.newaxis]) for row in single], repeat)
+    _record(results, n_rows, "predict_single", len(single), seconds, peak, len(single))
+    seconds, peak, _ = measure(lambda: model.predict_proba(X), repeat)
+    _record(results, n_rows, "predict_batch", len(X), seconds, peak, len(X))
+
+    seconds = _predict_throughput(model, X, n_requests)
+    _record(results, n_rows, "api_predict", min(n_requests, len(X)), seconds, None, min(n_requests, len(X)))
+    return results
+
+
+def run(sizes, output, max_train_rows=200_000, n_single=200, n_requests=500, repeat=1, seed=0):
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": seed,
+            "max_train_rows": max_train_rows,
+        },
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_rows in sizes:
+            print(f"{n_rows} lignes", flush=True)
+            report["results"].extend(run_size(n_rows, workdir, max_train_rows, n_single, n_requests, repeat, seed))
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Résultats écrits dans {output}")
+    return report
+
+
+def compare(baseline, current, tolerance=0.2, memory_tolerance=0.2, min_seconds=0.005):
+    """
+    Compare deux rapports étape par étape (même étape, même taille de données).
+
+    Une étape régresse si son temps dépasse celui de la référence de plus de
+    `tolerance` (les étapes plus courtes que `min_seconds`, trop bruitées, sont
+    ignorées), ou son pic mémoire de plus de `memory_tolerance`.
+
+    Returns:
+    list: Régressions, dicts (stage, size, metric, baseline, current, ratio)
+    """
+    reference = {(entry["stage"], entry["size"]): entry for entry in baseline["results"]}
+    regressions = []
+    for entry in current["results"]:
+        base = reference.get((entry["stage"], entry["size"]))
+        if base is None:
+            continue
+        checks = [("seconds", tolerance)]
+        if entry.get("peak_mb") is not None and base.get("peak_mb"):
+            checks.append(("peak_mb", memory_tolerance))
+        for metric, limit in checks:
+            if metric == "seconds" and max(base["seconds"], entry["seconds"]) < min_seconds:
+                continue
+            ratio = entry[metric] / base[metric] if base[metric] else float("inf")
+            if ratio > 1 + limit:
+                regressions.append({"stage": entry["stage"], "size": entry["size"], "metric": metric,
+                                    "baseline": base[metric], "current": entry[metric], "ratio": ratio})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Suite de benchmarks du pipeline de churn")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Exécute la suite et écrit un rapport JSON")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    run_parser.add_argument("--output", default="bench.json")
+    run_parser.add_argument("--max-train-rows", type=int, default=200_000)
+    run_parser.add_argument("--single-rows", type=int, default=200)
+    run_parser.add_argument("--requests", type=int, default=500)
+    run_parser.add_argument("--repeat", type=int, default=1)
+    run_parser.add_argument("--seed", type=int, default=0)
+
+    compare_parser = commands.add_parser("compare", help="Compare un rapport à une référence")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=0.2)
+    compare_parser.add_argument("--memory-tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run(args.sizes, args.output, args.max_train_rows, args.single_rows, args.requests, args.repeat, args.seed)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.tolerance, args.memory_tolerance)
+    for regression in regressions:
+        print(f"RÉGRESSION {regression['stage']} ({regression['size']} lignes) {regression['metric']} : "
+              f"{regression['baseline']:.4g} -> {regression['current']:.4g} (x{regression['ratio']:.2f})")
+    if not regressions:
+        print("Aucune régression.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
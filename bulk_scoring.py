@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import CATEGORICAL_COLUMNS, FEATURE_COLUMNS
+
+# Modèle chargé une seule fois par processus du pool
+_worker_model = None
+
+
+def _init_worker(model_path, backend):
+    global _worker_model
+    from serving import load_serving_model
+
+    _worker_model = load_serving_model(model_path, backend=backend)
+
+
+def _score_chunk(chunk):
+    """Encode, prétraite et score un bloc ; retourne (prédictions, probabilités de churn)."""
+    model = _worker_model
+    if model.preprocessing is None:
+        raise ValueError("Le modèle n'a pas de prétraitement sauvegardé : réentraînez-le avec main1.py.")
+    data = model.preprocessing.encode_frame(chunk)
+    proba = model.predict_proba(data[FEATURE_COLUMNS].to_numpy(dtype=np.float64))
+    classes = list(model.classes_)
+    churn = proba[:, classes.index(1) if 1 in classes else len(classes) - 1]
+    return model.classes_.take(np.argmax(proba, axis=1)).astype(np.int64), churn
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        self._header = True
+
+    def write(self, frame):
+        frame.to_csv(self.path, mode="w" if self._header else "a", header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        if self._header:
+            # Entrée vide : fichier avec l'en-tête seul.
+            pd.DataFrame(columns=["row", "prediction", "churn_probability"]).to_csv(self.path, index=False)
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        import pyarrow.parquet
+
+        self.path = path
+        self._pq = pyarrow.parquet
+        self._writer = None
+
+    def write(self, frame):
+        import pyarrow
+
+        table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _open_writer(output_path):
+    if output_path.endswith(".parquet"):
+        return _ParquetWriter(output_path)
+    return _CsvWriter(output_path)
+
+
+def score_file(model_path, input_path, output_path, chunksize=50_000, n_workers=None,
+               backend="sklearn", id_column=None, on_chunk=None):
+    """
+    Score un fichier CSV complet, bloc par bloc, sur un pool de processus.
+
+    Chaque worker charge le modèle une seule fois (un artefact mappé est
+    partagé entre eux). Au plus deux blocs par worker sont en vol : la mémoire
+    reste bornée quelle que soit la taille du fichier. Les résultats sont
+    écrits au fur et à mesure, dans l'ordre des lignes d'entrée.
+
+    Parameters:
+    model_path (str): Modèle sauvegardé avec son prétraitement, ou répertoire d'artefact.
+    input_path (str): CSV brut (mêmes colonnes que les données d'entraînement, cible optionnelle).
+    output_path (str): CSV de sortie, ou .parquet (nécessite pyarrow).
+    chunksize (int): Nombre de lignes par bloc.
+    n_workers (int): Nombre de processus (os.cpu_count() par défaut).
+    backend (str): Moteur d'inférence ("sklearn" ou "flat").
+    id_column (str): Colonne d'entrée recopiée dans la sortie (optionnelle).
+    on_chunk (callable): Appelé après l'écriture de chaque bloc avec un dict
+        (chunk, rows, churn_rate, mean_probability, elapsed).
+
+    Returns:
+    dict: rows, chunks, seconds, rows_per_second, n_workers
+    """
+    n_workers = n_workers or os.cpu_count()
+    usecols = FEATURE_COLUMNS + ([id_column] if id_column else [])
+    dtypes = {col: object for col in CATEGORICAL_COLUMNS}
+
+    start = time.perf_counter()
+    rows = chunks = 0
+    writer = _open_writer(output_path)
+    pending = deque()
+
+    def write_oldest():
+        nonlocal rows, chunks
+        offset, ids, future = pending.popleft()
+        predictions, probabilities = future.result()
+        frame = pd.DataFrame({
+            "row": np.arange(offset, offset + len(predictions)),
+            "prediction": predictions,
+            "churn_probability": probabilities,
+        })
+        if ids is not None:
+            frame.insert(0, id_column, ids)
+        writer.write(frame)
+        rows += len(frame)
+        chunks += 1
+        if on_chunk is not None:
+            on_chunk({
+                "chunk": chunks - 1,
+                "rows": len(frame),
+                "churn_rate": float(predictions.mean()) if len(predictions) else 0.0,
+                "mean_probability": float(probabilities.mean()) if len(probabilities) else 0.0,
+                "elapsed": time.perf_counter() - start,
+            })
+
+    # "spawn" : les workers ne dépendent pas de l'état (threads, connexions) du parent.
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(n_workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(model_path, backend)) as pool:
+            offset = 0
+            for chunk in pd.read_csv(input_path, usecols=usecols, dtype=dtypes, chunksize=chunksize):
+                ids = chunk[id_column].to_numpy() if id_column else None
+                pending.append((offset, ids, pool.submit(_score_chunk, chunk[FEATURE_COLUMNS])))
+                offset += len(chunk)
+                if len(pending) >= 2 * n_workers:
+                    write_oldest()
+            while pending:
+                write_oldest()
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "chunks": chunks,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds > 0 else 0.0,
+        "n_workers": n_workers,
+    }
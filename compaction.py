@@ -0,0 +1,146 @@
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from fast_forest import FlatForest
+from model_artifact import load_artifact, save_artifact
+
+# Grille balayée par défaut : nombre d'arbres gardés et profondeur maximale (None : arbres complets)
+DEFAULT_TREE_COUNTS = (10, 25, 50, 100)
+DEFAULT_DEPTHS = (6, 8, 10, 12, None)
+
+
+def _directory_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def _best_seconds(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_candidate(forest, X, y, preprocessing=None, latency_rows=200, repeat=3):
+    """
+    Mesure une forêt candidate : métriques de `evaluate_model`, taille et
+    durée de chargement de son artefact, latence par ligne.
+
+    Parameters:
+    forest (FlatForest): Forêt candidate.
+    X (np.ndarray): Features prétraitées de validation.
+    y (array-like): Labels de validation.
+    preprocessing (FittedPreprocessing): Enregistré dans l'artefact mesuré (optionnel).
+    latency_rows (int): Nombre de lignes prédites une à une pour la latence unitaire.
+    repeat (int): Nombre de mesures (la meilleure est gardée).
+
+    Returns:
+    dict: n_estimators, max_depth, nodes, artifact_bytes, load_ms, latency_us (ligne seule),
+          batch_latency_us (par ligne dans un lot), accuracy, precision, recall, f1_score.
+    """
+    from model_pipeline1 import evaluate_model
+
+    X = np.asarray(X, dtype=np.float64)
+    accuracy, precision, recall, f1 = evaluate_model(forest, X, y)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        directory = os.path.join(tmpdir, "artifact")
+        save_artifact(forest, directory, preprocessing)
+        artifact_bytes = _directory_bytes(directory)
+        # Lecture complète des tableaux (sans mmap) : le coût dépend de leur taille.
+        load_seconds = _best_seconds(lambda: load_artifact(directory, mmap=False), repeat)
+
+    rows = [row[np.newaxis] for row in X[:latency_rows]]
+    single = _best_seconds(lambda: [forest.predict_proba(row) for row in rows], repeat) / len(rows)
+    batch = _best_seconds(lambda: forest.predict_proba(X), repeat) / len(X)
+    return {
+        "n_estimators": forest.n_estimators,
+        "max_depth": forest.max_depth,
+        "nodes": len(forest.feature),
+        "artifact_bytes": artifact_bytes,
+        "load_ms": load_seconds * 1e3,
+        "latency_us": single * 1e6,
+        "batch_latency_us": batch * 1e6,
+        "accuracy": float(accuracy),
+        "precision": float(precision),
+        "recall": float(recall),
+        "f1_score": float(f1),
+    }
+
+
+class CompactionResult:
+    """
+    Résultat d'une compaction : forêt retenue et mesures de chaque candidat.
+
+    `baseline` mesure la forêt complète aux types d'origine (avec la taille
+    de son pickle, `pickle_bytes`) ; chaque candidat (`candidates`) ajoute
+    delta_f1, delta_recall et within_tolerance à `measure_candidate`.
+    """
+
+    def __init__(self, forest, best, baseline, candidates):
+        self.forest = forest
+        self.best = best
+        self.baseline = baseline
+        self.candidates = candidates
+
+
+def compact_model(model, X, y, preprocessing=None, tree_counts=DEFAULT_TREE_COUNTS, depths=DEFAULT_DEPTHS,
+                  f1_tolerance=0.01, recall_tolerance=0.01, latency_rows=200):
+    """
+    Cherche le plus petit sous-ensemble de la forêt dont le F1 et le rappel
+    restent dans la tolérance de ceux de la forêt complète.
+
+    Chaque candidat garde les `n` premiers arbres (les arbres d'une forêt
+    aléatoire sont interchangeables), coupés à une profondeur maximale, et
+    stocke seuils et probabilités en float32 et indices en int16. Le candidat
+    retenu est celui dont l'artefact est le plus petit ; la forêt complète
+    compactée fait toujours partie de la grille et sert de repli.
+
+    Parameters:
+    model (RandomForestClassifier): Forêt entraînée.
+    X (pd.DataFrame): Features prétraitées de validation.
+    y (array-like): Labels de validation.
+    preprocessing (FittedPreprocessing): Prétraitement enregistré dans les artefacts (optionnel).
+    tree_counts (iterable): Nombres d'arbres essayés (limités à la taille de la forêt).
+    depths (iterable): Profondeurs maximales essayées (None : arbres complets).
+    f1_tolerance (float): Perte de F1 acceptée par rapport à la forêt complète.
+    recall_tolerance (float): Perte de rappel acceptée.
+    latency_rows (int): Nombre de lignes prédites une à une pour la latence unitaire.
+
+    Returns:
+    CompactionResult: Forêt retenue (FlatForest) et mesures.
+    """
+    n_trees = len(model.estimators_)
+    X = np.asarray(X, dtype=np.float64)
+    baseline = measure_candidate(FlatForest.from_sklearn(model), X, y, preprocessing, latency_rows)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "model.pkl")
+        joblib.dump(model, path)
+        baseline["pickle_bytes"] = os.path.getsize(path)
+
+    counts = sorted({min(count, n_trees) for count in tree_counts} | {n_trees})
+    grid = [(count, depth) for count in counts for depth in depths]
+    if (n_trees, None) not in grid:
+        grid.append((n_trees, None))
+
+    candidates, forests = [], []
+    for count, depth in grid:
+        forest = FlatForest.from_sklearn(model, n_estimators=count, max_depth=depth).compact()
+        candidate = measure_candidate(forest, X, y, preprocessing, latency_rows)
+        candidate["max_depth_limit"] = depth
+        candidate["delta_f1"] = candidate["f1_score"] - baseline["f1_score"]
+        candidate["delta_recall"] = candidate["recall"] - baseline["recall"]
+        candidate["within_tolerance"] = (candidate["delta_f1"] >= -f1_tolerance
+                                         and candidate["delta_recall"] >= -recall_tolerance)
+        candidates.append(candidate)
+        forests.append(forest)
+
+    # Repli sur la forêt complète compactée si même elle sort de la tolérance.
+    eligible = [i for i, candidate in enumerate(candidates) if candidate["within_tolerance"]]
+    eligible = eligible or [grid.index((n_trees, None))]
+    best = min(eligible, key=lambda i: (candidates[i]["artifact_bytes"], candidates[i]["latency_us"]))
+    return CompactionResult(forests[best], candidates[best], baseline, candidates)
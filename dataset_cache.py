@@ -0,0 +1,189 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import PREPROCESSING_VERSION, FittedPreprocessing
+
+SPLITS = ("X_train", "X_test", "y_train", "y_test")
+
+
+def file_digest(path):
+    """Empreinte SHA-256 du contenu d'un fichier, lu par blocs."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_digest(function):
+    """
+    Empreinte SHA-256 du code source d'une fonction (son nom qualifié si la
+    source n'est pas disponible).
+    """
+    try:
+        source = inspect.getsource(function)
+    except (OSError, TypeError):
+        source = f"{function.__module__}.{getattr(function, '__qualname__', type(function).__qualname__)}"
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def dataset_key(paths, config, code=None):
+    """
+    Clé adressée par le contenu : empreinte des fichiers d'entrée, de la
+    configuration du prétraitement et du code qui prépare les données.
+    Renommer ou déplacer un fichier ne change pas la clé ; modifier un octet,
+    un paramètre ou le corps de `prepare_data` la change.
+
+    Parameters:
+    paths (iterable): Fichiers d'entrée.
+    config (dict): Configuration du prétraitement.
+    code (str): Empreinte du code de préparation (voir `code_digest`).
+    """
+    payload = {
+        "files": [file_digest(path) for path in paths],
+        "config": config,
+        "code": code,
+        "preprocessing_version": PREPROCESSING_VERSION,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class DatasetCache:
+    """
+    Cache sur disque des jeux de données prétraités.
+
+    Chaque entrée est un répertoire nommé par sa clé, contenant X_train, X_test,
+    y_train et y_test au format .npy (rechargés mappés en mémoire), le
+    prétraitement ajusté et les noms de colonnes. Les entrées sont écrites dans
+    un répertoire temporaire puis renommées atomiquement. Au-delà de
+    `max_bytes`, les entrées les moins récemment utilisées sont supprimées.
+
+    Parameters:
+    directory (str): Répertoire du cache.
+    max_bytes (int): Taille totale maximale des entrées.
+    """
+
+    def __init__(self, directory=".dataset_cache", max_bytes=1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """
+        Retourne (X_train, X_test, y_train, y_test, preprocessing), ou None si absent.
+
+        Les DataFrame/Series sont adossés à des tableaux mappés en lecture seule.
+        """
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, "manifest.json")) as f:
+                manifest = json.load(f)
+            arrays = {name: np.load(os.path.join(entry, f"{name}.npy"), mmap_mode="r") for name in SPLITS}
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(entry)  # date d'accès utilisée par l'éviction LRU
+
+        columns, target = manifest["columns"], manifest["target"]
+        X_train = pd.DataFrame(arrays["X_train"], columns=columns, copy=False)
+        X_test = pd.DataFrame(arrays["X_test"], columns=columns, copy=False)
+        y_train = pd.Series(arrays["y_train"], name=target, copy=False)
+        y_test = pd.Series(arrays["y_test"], name=target, copy=False)
+        return X_train, X_test, y_train, y_test, FittedPreprocessing.from_dict(manifest["preprocessing"])
+
+    def put(self, key, X_train, X_test, y_train, y_test, preprocessing):
+        """Enregistre un jeu de données prétraité puis applique l'éviction."""
+        tmp_dir = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        try:
+            for name, values in zip(SPLITS, (X_train, X_test, y_train, y_test)):
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(np.asarray(values)))
+            manifest = {
+                "columns": list(X_train.columns),
+                "target": y_train.name,
+                "preprocessing": preprocessing.to_dict(),
+                "created_at": time.time(),
+            }
+            with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+            try:
+                os.rename(tmp_dir, self._entry(key))
+            except OSError:
+                # Entrée déjà écrite par un autre processus : contenu identique.
+                shutil.rmtree(tmp_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        self.evict(keep=key)
+
+    def entries(self):
+        """Liste (clé, taille en octets, date d'accès) des entrées du cache."""
+        result = []
+        for key in os.listdir(self.directory):
+            entry = self._entry(key)
+            if key.startswith(".") or not os.path.isdir(entry):
+                continue
+            size = sum(entry_file.stat().st_size for entry_file in os.scandir(entry))
+            result.append((key, size, os.stat(entry).st_mtime))
+        return result
+
+    def evict(self, keep=None):
+        """Supprime les entrées les moins récemment utilisées au-delà de `max_bytes`."""
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= size
+
+
+def default_cache():
+    """
+    Cache configuré par DATASET_CACHE_DIR (vide : désactivé) et
+    DATASET_CACHE_MAX_BYTES.
+    """
+    directory = os.getenv("DATASET_CACHE_DIR", ".dataset_cache")
+    if not directory:
+        return None
+    return DatasetCache(directory, int(os.getenv("DATASET_CACHE_MAX_BYTES", str(1 << 30))))
+
+
+def cached_prepare_data(prepare_data, train_path, test_path, config, cache=None):
+    """
+    Appelle `prepare_data(train_path, test_path, return_preprocessing=True)`,
+    sauf si le même contenu a déjà été préparé avec la même configuration et
+    le même code source de `prepare_data` : modifier la fonction invalide les
+    entrées sans avoir à changer `config`.
+
+    Parameters:
+    prepare_data (callable): Fonction de préparation (model_pipeline ou model_pipeline1).
+    config (dict): Configuration du prétraitement, incluse dans la clé.
+    cache (DatasetCache): Cache à utiliser (None : aucun cache).
+
+    Returns:
+    tuple: (X_train, X_test, y_train, y_test, preprocessing, status) avec status
+    "hit", "miss" ou "disabled"
+    """
+    if cache is None:
+        return (*prepare_data(train_path, test_path, return_preprocessing=True), "disabled")
+
+    key = dataset_key((train_path, test_path), config, code_digest(prepare_data))
+    cached = cache.get(key)
+    if cached is not None:
+        return (*cached, "hit")
+
+    result = prepare_data(train_path, test_path, return_preprocessing=True)
+    cache.put(key, *result)
+    return (*result, "miss")
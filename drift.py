@@ -0,0 +1,292 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from instrumentation import DRIFT_DETECTED, DRIFT_PSI
+from preprocessing import FEATURE_COLUMNS, NUMERICAL_COLUMNS
+
+# Nombre de classes (quantiles de l'entraînement) des histogrammes de référence
+DRIFT_BINS = 10
+
+# Plancher des proportions dans le PSI (évite log(0) pour une classe vide)
+_PSI_EPSILON = 1e-4
+
+
+def reference_histograms(values, bins=DRIFT_BINS):
+    """
+    Instantané de la distribution d'entraînement des colonnes numériques.
+
+    Les bornes des classes sont les quantiles de l'entraînement (dédoublonnés
+    pour les colonnes discrètes) ; les valeurs hors bornes tombent dans les
+    classes extrêmes.
+
+    Parameters:
+    values (np.ndarray): Colonnes numériques brutes (n_lignes, len(NUMERICAL_COLUMNS)).
+    bins (int): Nombre maximal de classes par colonne.
+
+    Returns:
+    dict: columns, edges (bornes intérieures par colonne), counts (effectifs par classe).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    quantiles = np.linspace(0, 1, bins + 1)[1:-1]
+    edges, counts = [], []
+    for column in values.T:
+        column = column[~np.isnan(column)]
+        column_edges = np.unique(np.quantile(column, quantiles)) if len(column) else np.empty(0)
+        edges.append(column_edges.tolist())
+        counts.append(np.bincount(np.searchsorted(column_edges, column, side="right"),
+                                  minlength=len(column_edges) + 1).tolist())
+    return {"columns": list(NUMERICAL_COLUMNS), "edges": edges, "counts": counts}
+
+
+def _proportions(counts):
+    total = counts.sum(axis=-1, keepdims=True)
+    return counts / np.maximum(total, 1)
+
+
+def population_stability_index(expected, actual):
+    """
+    PSI par colonne entre deux histogrammes aux mêmes classes (n_colonnes, n_classes).
+    """
+    e = np.maximum(_proportions(expected), _PSI_EPSILON)
+    a = np.maximum(_proportions(actual), _PSI_EPSILON)
+    return ((a - e) * np.log(a / e)).sum(axis=-1)
+
+
+def ks_statistic(expected, actual):
+    """
+    Statistique de Kolmogorov-Smirnov par colonne, calculée sur les fonctions
+    de répartition des histogrammes (borne inférieure du KS exact).
+    """
+    return np.abs(np.cumsum(_proportions(expected), axis=-1) - np.cumsum(_proportions(actual), axis=-1)).max(axis=-1)
+
+
+class DriftMonitor:
+    """
+    Suivi en continu de la dérive des features numériques servies.
+
+    `observe` dépose les lignes reçues dans une file et rend la main aussitôt ;
+    un thread de fond les range dans un histogramme par colonne aux classes de
+    la référence (un `searchsorted` vectorisé par colonne), puis compare ces
+    histogrammes à la référence (PSI et KS). La file est bornée en lignes
+    (`max_pending_rows`) : un lot qui dépasse la place restante est
+    sous-échantillonné à intervalles réguliers, le reste est compté dans
+    `dropped`. Les histogrammes suivis sont en O(colonnes × classes) quel que
+    soit le trafic ; les effectifs décroissent exponentiellement (demi-vie de
+    `half_life_rows` lignes) pour suivre le trafic récent.
+
+    La première fois que la dérive est détectée (au moins `min_rows` lignes
+    observées), `on_drift(report)` est appelé depuis le thread de fond ; le
+    signal est réarmé par `reset`.
+
+    Parameters:
+    reference (dict): Histogrammes de référence (voir `reference_histograms`).
+    psi_threshold (float): PSI à partir duquel une colonne dérive.
+    ks_threshold (float): KS à partir duquel une colonne dérive.
+    min_rows (int): Nombre de lignes observées avant de conclure.
+    half_life_rows (int): Demi-vie des effectifs, en lignes (0 : jamais oubliés).
+    on_drift (callable): Signal de réentraînement (optionnel).
+    max_pending_rows (int): Nombre maximal de lignes en attente du thread de fond.
+    """
+
+    def __init__(self, reference, psi_threshold=0.2, ks_threshold=0.15, min_rows=1000,
+                 half_life_rows=50_000, on_drift=None, max_pending_rows=20_000):
+        self.psi_threshold = psi_threshold
+        self.ks_threshold = ks_threshold
+        self.min_rows = min_rows
+        self.half_life_rows = half_life_rows
+        self.on_drift = on_drift
+        self.max_pending_rows = max_pending_rows
+        self.dropped = 0
+        self.signals = 0
+        self._lock = threading.Lock()
+        self._processed = threading.Condition()
+        self._wakeup = threading.Event()
+        self._queue = queue.SimpleQueue()
+        self._pending_rows = 0
+        # Lots reçus par `observe` / lots intégrés et vérifiés par le thread de fond
+        self._received = 0
+        self._done = 0
+        self._stopping = False
+        self.reset(reference)
+        self._thread = threading.Thread(target=self._run, name="drift-monitor", daemon=True)
+        self._thread.start()
+
+    def reset(self, reference=None):
+        """Remet les effectifs à zéro, avec une nouvelle référence si fournie, et réarme le signal."""
+        with self._lock:
+            if reference is not None:
+                self.columns = list(reference["columns"])
+                index = np.array([FEATURE_COLUMNS.index(col) for col in self.columns])
+                edges = [np.asarray(col_edges, dtype=np.float64) for col_edges in reference["edges"]]
+                n_bins = max(len(col_edges) for col_edges in edges) + 1
+                # Histogrammes de même largeur : les classes absentes restent à 0 des deux côtés.
+                self._reference = np.zeros((len(self.columns), n_bins))
+                for i, counts in enumerate(reference["counts"]):
+                    self._reference[i, :len(counts)] = counts
+                offsets = (np.arange(len(self.columns)) * n_bins)[:, None]
+                # Lu d'un bloc par `observe` : des lignes reçues avant un changement
+                # de référence sont reconnues (et ignorées) par le thread de fond.
+                self._binning = (index, edges, offsets, self._reference.shape)
+            self._counts = np.zeros_like(self._reference)
+            self.rows = 0
+            self.signalled = False
+
+    def _bin(self, X, binning):
+        index, edges, offsets, shape = binning
+        values = np.asarray(X, dtype=np.float64)[:, index].T
+        bins = np.stack([np.searchsorted(col_edges, column, side="right")
+                         for col_edges, column in zip(edges, values)])
+        return np.bincount((bins + offsets).ravel(), minlength=shape[0] * shape[1]).reshape(shape)
+
+    def observe(self, X):
+        """
+        Ajoute des lignes servies (n_lignes, n_features), dans l'ordre de FEATURE_COLUMNS.
+
+        Returns:
+        bool: False si le lot a été ignoré (mal dimensionné ou file pleine).
+        """
+        if np.ndim(X) != 2 or np.shape(X)[1] != len(FEATURE_COLUMNS):
+            return False
+        n_rows = len(X)
+        with self._lock:
+            kept = min(n_rows, self.max_pending_rows - self._pending_rows)
+            if kept <= 0:
+                self.dropped += n_rows
+                return False
+            self._pending_rows += kept
+            self.dropped += n_rows - kept
+            binning = self._binning
+        if kept < n_rows:
+            # Copie de l'échantillon : la file ne retient pas le lot complet.
+            X = np.take(X, np.linspace(0, n_rows - 1, kept).astype(np.intp), axis=0)
+        with self._lock:
+            self._queue.put((binning, X))
+            self._received += 1
+        self._wakeup.set()
+        return True
+
+    def _merge(self, binning, X):
+        try:
+            counts = self._bin(X, binning)
+        except Exception:
+            # Un lot illisible ne doit pas arrêter le suivi.
+            counts = None
+        with self._lock:
+            self._pending_rows -= len(X)
+            if counts is None or binning is not self._binning:
+                self.dropped += len(X)
+                return
+            if self.half_life_rows:
+                self._counts *= 0.5 ** (len(X) / self.half_life_rows)
+            self._counts += counts
+            self.rows += len(X)
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(0.5)
+            self._wakeup.clear()
+            with self._lock:
+                received = self._received
+            # Tous les lots comptés dans `received` sont déjà dans la file.
+            while True:
+                try:
+                    binning, X = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._merge(binning, X)
+            if received == self._done:
+                continue
+            try:
+                self._check()
+            finally:
+                with self._processed:
+                    self._done = received
+                    self._processed.notify_all()
+
+    def _check(self):
+        if self.signalled or self.on_drift is None:
+            return
+        report = self.report()
+        if report["drift"]:
+            self.signalled = True
+            self.signals += 1
+            try:
+                self.on_drift(report)
+            except Exception:
+                pass
+
+    def flush(self, timeout=None):
+        """Attend que les lignes déjà observées soient comptées."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            target = self._received
+        self._wakeup.set()
+        with self._processed:
+            while self._done < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._processed.wait(remaining)
+        return True
+
+    def close(self):
+        """Compte les lignes en attente puis arrête le thread de fond."""
+        if self._stopping:
+            return
+        self.flush()
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join()
+
+    def report(self):
+        """
+        Dérive de chaque colonne par rapport à la référence.
+
+        Returns:
+        dict: rows, dropped, drift (dérive détectée), retrain_signal, seuils et,
+              par colonne, psi, ks et drifted.
+        """
+        with self._lock:
+            # Instantané cohérent : un `reset` concurrent peut changer les classes.
+            counts = self._counts.copy()
+            rows = self.rows
+            reference = self._reference
+            columns = self.columns
+        psi = population_stability_index(reference, counts)
+        ks = ks_statistic(reference, counts)
+        enough = rows >= self.min_rows
+        drifted = enough & ((psi >= self.psi_threshold) | (ks >= self.ks_threshold))
+        return {
+            "rows": rows,
+            "dropped": self.dropped,
+            "min_rows": self.min_rows,
+            "psi_threshold": self.psi_threshold,
+            "ks_threshold": self.ks_threshold,
+            "drift": bool(drifted.any()),
+            "retrain_signal": self.signalled,
+            "features": {
+                col: {"psi": float(psi[i]), "ks": float(ks[i]), "drifted": bool(drifted[i])}
+                for i, col in enumerate(columns)
+            },
+        }
+
+    def export_metrics(self):
+        """Met à jour les jauges Prometheus de dérive (appelé par /metrics)."""
+        report = self.report()
+        for col, values in report["features"].items():
+            DRIFT_PSI.set(values["psi"], feature=col)
+        DRIFT_DETECTED.set(int(report["drift"]))
+
+
+def create_drift_monitor(current, **options):
+    """
+    Moniteur de dérive pour un modèle servi, ou None si son prétraitement
+    n'a pas d'histogrammes de référence (modèle sauvegardé sans eux).
+    """
+    reference = getattr(getattr(current, "preprocessing", None), "drift_reference", None)
+    if reference is None:
+        return None
+    return DriftMonitor(reference, **options)
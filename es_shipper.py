@@ -0,0 +1,243 @@
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+from batch_writer import BackgroundBatchWriter
+
+DEFAULT_INDEX = "mlflow-metrics"
+
+# Refus 4xx passagers (délai, limitation de débit) : le document est remis au spool.
+_RETRYABLE_STATUSES = (408, 429)
+
+
+class ElasticsearchShipper(BackgroundBatchWriter):
+    """
+    Envoi non bloquant de documents vers Elasticsearch.
+
+    `ship` dépose le document dans un tampon en mémoire et rend la main
+    aussitôt. Un thread de fond l'envoie avec l'API bulk dès que `batch_size`
+    documents sont en attente ou que `flush_interval` secondes se sont
+    écoulées. Le client n'est créé qu'au premier envoi : importer ou
+    instancier le shipper ne contacte jamais le cluster.
+
+    Un lot qui échoue (cluster injoignable, documents rejetés) est ajouté à un
+    fichier local en ajout seul (`spool_path`, une ligne JSON par document),
+    rejoué avant les lots suivants dès que le cluster répond de nouveau. Quand
+    le tampon est plein, ou quand `close` expire avant la fin de l'envoi, les
+    documents vont directement dans ce fichier. Le rejeu garantit au moins une
+    livraison : un rejeu interrompu reprend au prochain et peut renvoyer des
+    documents déjà indexés.
+
+    Les échecs définitifs d'un document ne sont pas remis au spool, où ils
+    reviendraient à chaque rejeu : un document que le client ne sait pas
+    sérialiser, ou que le cluster refuse en 4xx (erreur de mapping ou
+    d'analyse, hors 408 et 429), est écrit dans `dead_letter_path` avec la
+    raison du refus et compté dans `dead_lettered`.
+
+    Parameters:
+    hosts (str): URL du cluster (ELASTICSEARCH_HOST, http://localhost:9200 par défaut).
+    index (str): Index par défaut des documents.
+    batch_size (int): Nombre de documents par requête bulk.
+    flush_interval (float): Délai maximal (s) avant l'envoi d'un lot incomplet.
+    max_buffer (int): Nombre maximal de documents en mémoire.
+    spool_path (str): Fichier des documents en attente de renvoi.
+    retry_interval (float): Délai minimal (s) entre deux tentatives après un échec.
+    request_timeout (float): Délai maximal (s) d'une requête au cluster.
+    dead_letter_path (str): Fichier des documents refusés définitivement (`<spool_path>.dead` par défaut).
+    """
+
+    def __init__(self, hosts=None, index=DEFAULT_INDEX, batch_size=500, flush_interval=2.0, max_buffer=10000,
+                 spool_path=".es_spool.jsonl", retry_interval=30.0, request_timeout=5.0, dead_letter_path=None):
+        super().__init__(batch_size, flush_interval, max_buffer, thread_name="elasticsearch-shipper")
+        self.hosts = hosts or os.getenv("ELASTICSEARCH_HOST", "http://localhost:9200")
+        self.index = index
+        self.spool_path = spool_path
+        self.dead_letter_path = dead_letter_path or spool_path + ".dead"
+        self.retry_interval = retry_interval
+        self.request_timeout = request_timeout
+        self._client = None
+        # Erreurs propres au document (et non au cluster), complétées à la création du client
+        self._serialization_errors = (TypeError, ValueError)
+        self._spool_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._retry_at = 0.0
+        self.sent = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.dead_lettered = 0
+        self.failed_requests = 0
+
+    @property
+    def client(self):
+        """Client Elasticsearch, créé au premier usage."""
+        if self._client is None:
+            from elastic_transport import SerializationError
+            from elasticsearch import Elasticsearch
+
+            self._serialization_errors = (SerializationError, TypeError, ValueError)
+            self._client = Elasticsearch(self.hosts, request_timeout=self.request_timeout)
+        return self._client
+
+    def ship(self, document, index=None):
+        """
+        Ajoute un document au tampon d'envoi, sans attendre le cluster.
+
+        Returns:
+        bool: False si le tampon était plein (le document est alors mis en spool).
+        """
+        self._ensure_thread()
+        entry = (index or self.index, document)
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self._spool([entry])
+            return False
+
+    def close(self, timeout=None):
+        """
+        Vide le tampon puis arrête le thread d'envoi. Si `timeout` expire
+        avant, les documents encore en mémoire partent au spool.
+        """
+        if super().close(timeout):
+            return True
+        leftovers = self._drain()
+        if leftovers:
+            self._spool(leftovers)
+        return False
+
+    @property
+    def _replaying_path(self):
+        return self.spool_path + ".replaying"
+
+    def replay(self):
+        """
+        Renvoie les documents du spool. Ceux qui échouent encore y retournent.
+
+        Le spool est d'abord ajouté au fichier `.replaying`, qui n'est supprimé
+        qu'une fois chaque lot envoyé ou remis au spool : un rejeu interrompu
+        (arrêt, exception) est repris au suivant.
+
+        Returns:
+        int: Nombre de documents renvoyés avec succès.
+        """
+        with self._replay_lock:
+            replaying = self._replaying_path
+            with self._spool_lock:
+                if os.path.exists(self.spool_path):
+                    with open(self.spool_path, "rb") as src, open(replaying, "ab+") as dst:
+                        # Une dernière ligne tronquée ne doit pas absorber la première du spool.
+                        if dst.seek(0, os.SEEK_END):
+                            dst.seek(-1, os.SEEK_END)
+                            if dst.read(1) != b"\n":
+                                dst.write(b"\n")
+                        shutil.copyfileobj(src, dst)
+                    os.unlink(self.spool_path)
+                if not os.path.exists(replaying):
+                    return 0
+
+            entries = []
+            with open(replaying) as f:
+                for line in f:
+                    try:
+                        line = json.loads(line)
+                        entries.append((line["_index"], line["doc"]))
+                    except (ValueError, KeyError, TypeError):
+                        # Ligne tronquée par un arrêt brutal pendant l'écriture du spool.
+                        continue
+            sent = 0
+            for start in range(0, len(entries), self.batch_size):
+                sent += self._send(entries[start:start + self.batch_size])
+            os.unlink(replaying)
+            self.replayed += sent
+            return sent
+
+    def pending_spool(self):
+        """Nombre de documents en attente dans le spool (rejeu interrompu compris)."""
+        pending = 0
+        for path in (self.spool_path, self._replaying_path):
+            if os.path.exists(path):
+                with open(path) as f:
+                    pending += sum(1 for _ in f)
+        return pending
+
+    def stats(self):
+        return {
+            "pending": self._queue.qsize(),
+            "sent": self.sent,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "dead_lettered": self.dead_lettered,
+            "failed_requests": self.failed_requests,
+        }
+
+    def _spool(self, entries):
+        with self._spool_lock, open(self.spool_path, "a") as f:
+            for index, document in entries:
+                f.write(json.dumps({"_index": index, "doc": document}, default=str) + "\n")
+        self.spooled += len(entries)
+
+    def _dead_letter(self, entries, errors):
+        with self._spool_lock, open(self.dead_letter_path, "a") as f:
+            for (index, document), error in zip(entries, errors):
+                f.write(json.dumps({"_index": index, "doc": document, "error": error}, default=str) + "\n")
+        self.dead_lettered += len(entries)
+
+    def _send(self, entries):
+        """Envoie un lot en une requête bulk ; les documents non indexés vont au spool."""
+        if time.monotonic() < self._retry_at:
+            self._spool(entries)
+            return 0
+        operations = []
+        for index, document in entries:
+            operations.append({"index": {"_index": index}})
+            operations.append(document)
+        try:
+            response = self.client.bulk(operations=operations)
+        except self._serialization_errors as e:
+            # Un document du lot n'est pas sérialisable : le cluster n'y est pour
+            # rien. Les documents sont renvoyés un à un pour isoler le fautif.
+            if len(entries) == 1:
+                self._dead_letter(entries, [f"serialization: {e}"])
+                return 0
+            return sum(self._send([entry]) for entry in entries)
+        except Exception:
+            # Cluster injoignable ou lent : ne pas réessayer avant retry_interval.
+            self.failed_requests += 1
+            self._retry_at = time.monotonic() + self.retry_interval
+            self._spool(entries)
+            return 0
+
+        rejected, refused, reasons = [], [], []
+        if response.get("errors"):
+            for entry, item in zip(entries, response["items"]):
+                result = next(iter(item.values()))
+                status = result.get("status", 500)
+                if status < 300:
+                    continue
+                if 400 <= status < 500 and status not in _RETRYABLE_STATUSES:
+                    refused.append(entry)
+                    reasons.append(result.get("error") or status)
+                else:
+                    rejected.append(entry)
+        if rejected:
+            self._spool(rejected)
+        if refused:
+            self._dead_letter(refused, reasons)
+        sent = len(entries) - len(rejected) - len(refused)
+        self.sent += sent
+        return sent
+
+    def _write(self, batch):
+        try:
+            # Rejouer d'abord le spool, pour garder à peu près l'ordre d'émission.
+            if time.monotonic() >= self._retry_at and (
+                    os.path.exists(self.spool_path) or os.path.exists(self._replaying_path)):
+                self.replay()
+            self._send(batch)
+        except Exception:
+            # L'envoi des métriques ne doit jamais interrompre l'entraînement.
+            self._spool(batch)
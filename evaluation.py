@@ -0,0 +1,284 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Résolution du balayage des seuils : un seuil tous les 1/EVALUATION_BINS
+EVALUATION_BINS = 1000
+# Rappels minimaux pour lesquels on cherche le seuil le plus élevé qui les atteint
+DEFAULT_RECALL_TARGETS = (0.8, 0.9)
+# Tirages bootstrap par bloc : chaque bloc a sa propre graine dérivée de `seed`,
+# les intervalles ne dépendent donc pas du nombre de processus.
+_BOOTSTRAP_BLOCK = 100
+
+METRIC_NAMES = ("accuracy", "precision", "recall", "f1_score", "roc_auc", "average_precision")
+
+
+def positive_scores(model, X):
+    """
+    Un seul appel à `predict_proba` : probabilité de churn et prédiction de
+    `model.predict` (classe de probabilité maximale) pour chaque ligne.
+
+    Returns:
+    tuple: (scores float64, booléens « prédit churn »)
+    """
+    proba = model.predict_proba(X)
+    classes = list(model.classes_)
+    churn = proba[:, classes.index(1)] if 1 in classes else np.zeros(len(proba))
+    predicted = model.classes_.take(np.argmax(proba, axis=1)) == 1
+    return np.asarray(churn, dtype=np.float64), np.asarray(predicted)
+
+
+def confusion_counts(y_true, predicted):
+    """Matrice de confusion (tn, fp, fn, tp) en un passage (`np.bincount`)."""
+    cells = 2 * (np.asarray(y_true) == 1).astype(np.int64) + np.asarray(predicted, dtype=np.int64)
+    return tuple(int(count) for count in np.bincount(cells, minlength=4))
+
+
+def _ratio(numerator, denominator):
+    """Division élément par élément, 0 quand le dénominateur est nul (zero_division=0 de scikit-learn)."""
+    numerator, denominator = np.asarray(numerator, dtype=np.float64), np.asarray(denominator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape),
+                     where=denominator != 0)
+
+
+def metrics_from_counts(tn, fp, fn, tp):
+    """
+    Accuracy, précision, rappel et F1 depuis une matrice de confusion ; les
+    comptes peuvent être des tableaux (un jeu de métriques par élément).
+    """
+    return {
+        "accuracy": _ratio(tp + tn, tn + fp + fn + tp),
+        "precision": _ratio(tp, tp + fp),
+        "recall": _ratio(tp, tp + fn),
+        "f1_score": _ratio(2 * tp, 2 * tp + fp + fn),
+    }
+
+
+def score_histogram(y_true, scores, predicted, bins=EVALUATION_BINS):
+    """
+    Comptes par (label, prédiction, tranche de score), tableau (2, 2, bins).
+
+    La tranche `k` contient les scores de [k/bins, (k+1)/bins[ (la dernière
+    inclut 1.0). Toutes les métriques du rapport se calculent depuis ces
+    comptes : le coût du balayage et du bootstrap ne dépend plus du nombre
+    de lignes.
+    """
+    score_bins = np.clip((np.asarray(scores, dtype=np.float64) * bins).astype(np.int64), 0, bins - 1)
+    cells = (2 * (np.asarray(y_true) == 1).astype(np.int64) + np.asarray(predicted, dtype=np.int64)) * bins + score_bins
+    return np.bincount(cells, minlength=4 * bins).reshape(2, 2, bins)
+
+
+def _curves(histograms):
+    """
+    Balayage vectorisé des seuils k/bins (prédit churn si score >= seuil),
+    plus un seuil final où rien n'est prédit churn. `histograms` a la forme
+    (..., 2, 2, bins) ; chaque courbe a la forme (..., bins + 1).
+    """
+    positives = histograms[..., 1, :, :].sum(axis=-2)
+    negatives = histograms[..., 0, :, :].sum(axis=-2)
+    zero = np.zeros(positives.shape[:-1] + (1,), dtype=positives.dtype)
+    # Sommes cumulées depuis les scores les plus hauts : lignes au-dessus de chaque seuil.
+    tp = np.concatenate([np.cumsum(positives[..., ::-1], axis=-1)[..., ::-1], zero], axis=-1)
+    fp = np.concatenate([np.cumsum(negatives[..., ::-1], axis=-1)[..., ::-1], zero], axis=-1)
+    n_pos, n_neg = tp[..., :1], fp[..., :1]
+    return {
+        "tp": tp,
+        "fp": fp,
+        "precision": np.where(tp + fp > 0, _ratio(tp, tp + fp), 1.0),
+        "recall": _ratio(tp, n_pos),
+        "fpr": _ratio(fp, n_neg),
+        "f1_score": _ratio(2 * tp, tp + fp + n_pos),
+        "flagged_rate": _ratio(tp + fp, n_pos + n_neg),
+    }
+
+
+def _ranking_metrics(curves):
+    """ROC AUC (trapèzes) et précision moyenne (définition de scikit-learn), NaN sans positif ou négatif."""
+    tpr, fpr, recall, precision = curves["recall"], curves["fpr"], curves["recall"], curves["precision"]
+    roc_auc = np.sum((fpr[..., :-1] - fpr[..., 1:]) * (tpr[..., :-1] + tpr[..., 1:]) / 2, axis=-1)
+    average_precision = np.sum((recall[..., :-1] - recall[..., 1:]) * precision[..., :-1], axis=-1)
+    has_both = (curves["tp"][..., 0] > 0) & (curves["fp"][..., 0] > 0)
+    return np.where(has_both, roc_auc, np.nan), np.where(curves["tp"][..., 0] > 0, average_precision, np.nan)
+
+
+def histogram_metrics(histograms):
+    """
+    Métriques au seuil par défaut (prédiction de `model.predict`), ROC AUC et
+    précision moyenne, pour un ou plusieurs histogrammes (..., 2, 2, bins).
+    """
+    confusion = histograms.sum(axis=-1)
+    metrics = metrics_from_counts(confusion[..., 0, 0], confusion[..., 0, 1],
+                                  confusion[..., 1, 0], confusion[..., 1, 1])
+    metrics["roc_auc"], metrics["average_precision"] = _ranking_metrics(_curves(histograms))
+    return metrics
+
+
+def _bootstrap_block(histogram, n_draws, seed):
+    """Tirages d'un bloc : ré-échantillonner les lignes revient à tirer les comptes de chaque cellule (multinomiale)."""
+    flat = histogram.ravel()
+    filled = np.flatnonzero(flat)
+    total = int(flat.sum())
+    draws = np.random.default_rng(seed).multinomial(total, flat[filled] / total, size=n_draws)
+    samples = np.zeros((n_draws, flat.size), dtype=np.int64)
+    samples[:, filled] = draws
+    metrics = histogram_metrics(samples.reshape((n_draws,) + histogram.shape))
+    return np.column_stack([metrics[name] for name in METRIC_NAMES])
+
+
+def bootstrap_intervals(histogram, n_bootstrap=1000, confidence=0.95, seed=0, n_workers=None):
+    """
+    Intervalles de confiance bootstrap (percentiles) de chaque métrique.
+
+    Les tirages sont répartis en blocs de graines fixes (SeedSequence(seed)),
+    exécutés en parallèle sur un pool de processus : le résultat est le même
+    quel que soit `n_workers`.
+
+    Parameters:
+    histogram (np.ndarray): Comptes de `score_histogram`.
+    n_bootstrap (int): Nombre de ré-échantillonnages.
+    confidence (float): Niveau des intervalles.
+    seed (int): Graine des tirages.
+    n_workers (int): Nombre de processus (os.cpu_count() par défaut, 1 : sans pool).
+
+    Returns:
+    dict: {métrique: [borne basse, borne haute]}
+    """
+    sizes = [min(_BOOTSTRAP_BLOCK, n_bootstrap - start) for start in range(0, n_bootstrap, _BOOTSTRAP_BLOCK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    n_workers = min(n_workers or os.cpu_count(), len(sizes))
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            blocks = list(pool.map(_bootstrap_block, [histogram] * len(sizes), sizes, seeds))
+    else:
+        blocks = [_bootstrap_block(histogram, size, block_seed) for size, block_seed in zip(sizes, seeds)]
+    samples = np.vstack(blocks)
+    alpha = (1 - confidence) / 2
+    with np.errstate(all="ignore"):
+        bounds = np.nanquantile(samples, [alpha, 1 - alpha], axis=0)
+    return {name: [float(bounds[0, i]), float(bounds[1, i])] for i, name in enumerate(METRIC_NAMES)}
+
+
+def _operating_point(curves, index, bins):
+    return {
+        "threshold": index / bins,
+        "precision": float(curves["precision"][index]) if curves["tp"][index] + curves["fp"][index] else 0.0,
+        "recall": float(curves["recall"][index]),
+        "f1_score": float(curves["f1_score"][index]),
+        "flagged_rate": float(curves["flagged_rate"][index]),
+    }
+
+
+def evaluation_report(model, X_test, y_test, bins=EVALUATION_BINS, recall_targets=DEFAULT_RECALL_TARGETS,
+                      n_bootstrap=1000, confidence=0.95, seed=0, n_workers=None):
+    """
+    Rapport d'évaluation complet à partir d'un seul `predict_proba`.
+
+    Parameters:
+    model: Modèle exposant predict_proba et classes_ (RandomForestClassifier, FlatForest...).
+    X_test (pd.DataFrame): Données de test.
+    y_test (pd.Series): Labels de test.
+    bins (int): Nombre de seuils balayés.
+    recall_targets (iterable): Rappels minimaux recherchés.
+    n_bootstrap (int): Nombre de ré-échantillonnages (0 : sans intervalles).
+    confidence (float): Niveau des intervalles.
+    seed (int): Graine du bootstrap.
+    n_workers (int): Nombre de processus du bootstrap.
+
+    Returns:
+    dict: rows, positives, metrics (seuil par défaut, ROC AUC, précision moyenne),
+          intervals, best_f1 et recall_targets (seuil, précision, rappel, F1,
+          part de clients signalés) et curves (seuils, précision, rappel, fpr, F1).
+    """
+    scores, predicted = positive_scores(model, X_test)
+    histogram = score_histogram(y_test, scores, predicted, bins)
+    # Métriques exactes au seuil par défaut : mêmes prédictions que `model.predict`.
+    metrics = {name: float(value) for name, value in histogram_metrics(histogram).items()}
+    curves = _curves(histogram)
+
+    # Seuils 0..bins-1 (le dernier point, où rien n'est signalé, n'est pas un seuil utilisable).
+    best = int(np.argmax(curves["f1_score"][:bins]))
+    targets = {}
+    for target in recall_targets:
+        reaching = np.flatnonzero(curves["recall"][:bins] >= target)
+        targets[str(target)] = _operating_point(curves, int(reaching[-1]), bins) if reaching.size else None
+
+    report = {
+        "rows": int(histogram.sum()),
+        "positives": int(histogram[1].sum()),
+        "metrics": metrics,
+        "best_f1": _operating_point(curves, best, bins),
+        "recall_targets": targets,
+        "curves": {
+            "threshold": (np.arange(bins + 1) / bins).tolist(),
+            **{name: curves[name].tolist() for name in ("precision", "recall", "fpr", "f1_score")},
+        },
+    }
+    if n_bootstrap:
+        report.update(confidence=confidence, n_bootstrap=n_bootstrap, seed=seed,
+                      intervals=bootstrap_intervals(histogram, n_bootstrap, confidence, seed, n_workers))
+    return report
+
+
+def plot_report(report):
+    """Figures matplotlib du rapport : courbes précision-rappel, ROC et métriques selon le seuil."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    curves, metrics = report["curves"], report["metrics"]
+    figures = {}
+
+    figure, axes = plt.subplots(figsize=(6, 5))
+    axes.plot(curves["recall"], curves["precision"], label=f"AP = {metrics['average_precision']:.3f}")
+    best = report["best_f1"]
+    axes.scatter([best["recall"]], [best["precision"]], color="red", zorder=3,
+                 label=f"Meilleur F1 (seuil {best['threshold']:.3f})")
+    axes.set(xlabel="Rappel", ylabel="Précision", title="Courbe précision-rappel", xlim=(0, 1), ylim=(0, 1.05))
+    axes.legend(loc="lower left")
+    figures["precision_recall.png"] = figure
+
+    figure, axes = plt.subplots(figsize=(6, 5))
+    axes.plot(curves["fpr"], curves["recall"], label=f"AUC = {metrics['roc_auc']:.3f}")
+    axes.plot([0, 1], [0, 1], linestyle="--", color="grey")
+    axes.set(xlabel="Taux de faux positifs", ylabel="Rappel", title="Courbe ROC", xlim=(0, 1), ylim=(0, 1.05))
+    axes.legend(loc="lower right")
+    figures["roc.png"] = figure
+
+    figure, axes = plt.subplots(figsize=(7, 5))
+    for name, label in (("precision", "Précision"), ("recall", "Rappel"), ("f1_score", "F1")):
+        axes.plot(curves["threshold"], curves[name], label=label)
+    for target, point in report["recall_targets"].items():
+        if point is not None:
+            axes.axvline(point["threshold"], linestyle=":", color="grey")
+            axes.annotate(f"rappel ≥ {target}", (point["threshold"], 0.02), rotation=90, fontsize=8)
+    axes.set(xlabel="Seuil de probabilité de churn", ylabel="Valeur", title="Métriques selon le seuil",
+             xlim=(0, 1), ylim=(0, 1.05))
+    axes.legend(loc="upper right")
+    figures["threshold_metrics.png"] = figure
+    return figures
+
+
+def log_to_mlflow(report, artifact_dir="evaluation"):
+    """
+    Envoie le rapport dans le run MLflow actif : métriques, bornes des
+    intervalles, points de fonctionnement, rapport JSON et figures.
+    """
+    import matplotlib.pyplot as plt
+    import mlflow
+
+    metrics = {name: value for name, value in report["metrics"].items() if not np.isnan(value)}
+    for name, (low, high) in report.get("intervals", {}).items():
+        if not np.isnan(low):
+            metrics[f"{name}_ci_low"], metrics[f"{name}_ci_high"] = low, high
+    for name, value in report["best_f1"].items():
+        metrics[f"best_f1_{name}"] = value
+    for target, point in report["recall_targets"].items():
+        for name, value in (point or {}).items():
+            metrics[f"recall_{target}_{name}"] = value
+    mlflow.log_metrics(metrics)
+    mlflow.log_dict(report, f"{artifact_dir}/report.json")
+    for filename, figure in plot_report(report).items():
+        mlflow.log_figure(figure, f"{artifact_dir}/{filename}")
+        plt.close(figure)
@@ -0,0 +1,182 @@
+import numpy as np
+
+
+def _values_are_fractions():
+    """Avant scikit-learn 1.4, tree_.value contient des effectifs à normaliser."""
+    # Import local : servir un artefact aplati ne doit pas charger scikit-learn.
+    import sklearn
+    from sklearn.utils.fixes import parse_version
+
+    return parse_version(sklearn.__version__) >= parse_version("1.4")
+
+
+def _node_depths(tree):
+    """Profondeur de chaque nœud d'un arbre scikit-learn, niveau par niveau."""
+    depth = np.zeros(tree.node_count, dtype=np.int64)
+    frontier = np.array([0])
+    level = 0
+    while frontier.size:
+        depth[frontier] = level
+        children = np.concatenate([tree.children_left[frontier], tree.children_right[frontier]])
+        frontier = children[children != -1]
+        level += 1
+    return depth
+
+
+def _round_down_float32(values):
+    """Plus grand float32 <= chaque valeur : `x <= t` est inchangé pour tout x float32."""
+    rounded = values.astype(np.float32)
+    return np.where(rounded > values, np.nextafter(rounded, np.float32(-np.inf)), rounded)
+
+
+class FlatForest:
+    """
+    Forêt aléatoire aplatie en tableaux NumPy contigus pour l'inférence.
+
+    Tous les nœuds de tous les arbres sont concaténés : `feature`, `threshold`,
+    `left`, `right` et `value` (probabilités de chaque classe au nœud). Une
+    feuille boucle sur elle-même avec un seuil infini, ce qui permet de
+    parcourir tous les arbres pour toutes les lignes en `max_depth` étapes
+    vectorisées, sans branchement.
+
+    Les probabilités sont bit à bit identiques à celles de
+    RandomForestClassifier.predict_proba : mêmes entrées converties en float32,
+    mêmes comparaisons `x <= seuil` en float64 et même ordre d'accumulation.
+
+    `from_sklearn` peut ne garder que les premiers arbres et couper leur
+    profondeur, et `compact` réduit les types des tableaux (voir compaction.py).
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes, n_features_in):
+        self.feature = np.ascontiguousarray(feature)
+        self.threshold = np.ascontiguousarray(threshold)
+        self.left = np.ascontiguousarray(left)
+        self.right = np.ascontiguousarray(right)
+        self.value = np.ascontiguousarray(value)
+        self.roots = np.ascontiguousarray(roots)
+        self.max_depth = int(max_depth)
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = int(n_features_in)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        """Taille des tableaux de la forêt, en octets."""
+        return sum(getattr(self, name).nbytes for name in ("feature", "threshold", "left", "right", "value", "roots"))
+
+    @classmethod
+    def from_sklearn(cls, model, n_estimators=None, max_depth=None):
+        """
+        Aplatit un RandomForestClassifier entraîné (une seule sortie).
+
+        Parameters:
+        model (RandomForestClassifier): Forêt entraînée.
+        n_estimators (int): Ne garder que les premiers arbres (optionnel).
+        max_depth (int): Couper les arbres à cette profondeur (optionnel) ; un
+            nœud coupé devient une feuille qui prédit sa distribution de classes.
+        """
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Seules les forêts à une sortie sont supportées.")
+
+        values_are_fractions = _values_are_fractions()
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        forest_depth = 0
+        for estimator in model.estimators_[:n_estimators]:
+            tree = estimator.tree_
+            children_left, children_right = tree.children_left, tree.children_right
+            keep = slice(None)
+            is_leaf = children_left == -1
+            if max_depth is not None and tree.max_depth > max_depth:
+                depth = _node_depths(tree)
+                keep = depth <= max_depth
+                is_leaf = (is_leaf | (depth == max_depth))[keep]
+                # Renumérotation des nœuds conservés (les enfants d'un nœud gardé non coupé le sont aussi).
+                new_ids = np.cumsum(keep) - 1
+                children_left = np.where(children_left[keep] == -1, -1, new_ids[children_left[keep]])
+                children_right = np.where(children_right[keep] == -1, -1, new_ids[children_right[keep]])
+            n_nodes = len(is_leaf)
+            node_ids = np.arange(offset, offset + n_nodes)
+
+            value = tree.value[keep, 0, :].astype(np.float64)
+            if not values_are_fractions:
+                normalizer = value.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value /= normalizer
+
+            features.append(np.where(is_leaf, 0, tree.feature[keep]).astype(np.int32))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold[keep]))
+            lefts.append(np.where(is_leaf, node_ids, children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, node_ids, children_right + offset).astype(np.int32))
+            values.append(value)
+            roots.append(offset)
+            forest_depth = max(forest_depth, tree.max_depth if max_depth is None else min(tree.max_depth, max_depth))
+            offset += n_nodes
+
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(lefts), np.concatenate(rights), np.concatenate(values),
+            np.array(roots, dtype=np.int32), forest_depth, model.classes_, model.n_features_in_,
+        )
+
+    def compact(self):
+        """
+        Copie aux types réduits : seuils float32 (arrondis vers le bas, donc
+        mêmes décisions sur les entrées float32), probabilités des feuilles
+        float32, features int16 et indices de nœuds int16 quand la forêt
+        compte moins de 32 768 nœuds (int32 sinon).
+        """
+        index_dtype = np.int16 if len(self.feature) <= np.iinfo(np.int16).max else np.int32
+        return FlatForest(
+            self.feature.astype(np.int16), _round_down_float32(self.threshold),
+            self.left.astype(index_dtype), self.right.astype(index_dtype), self.value.astype(np.float32),
+            self.roots.astype(index_dtype), self.max_depth, self.classes_, self.n_features_in_,
+        )
+
+    def apply(self, X):
+        """
+        Indice de la feuille atteinte dans chaque arbre, tableau (n_arbres, n_lignes).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X doit être de forme (n_lignes, {self.n_features_in_}).")
+        rows = np.arange(X.shape[0])
+        node = np.repeat(self.roots[:, np.newaxis], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X, chunk_size=4096):
+        X = np.asarray(X, dtype=np.float32)
+        if X.shape[0] > chunk_size:
+            # Borne la mémoire intermédiaire (n_arbres x n_lignes x n_classes).
+            return np.vstack([self.predict_proba(X[i:i + chunk_size], chunk_size)
+                              for i in range(0, X.shape[0], chunk_size)])
+        leaves = self.apply(X)
+        # Somme arbre par arbre (réduction sur l'axe 0), comme l'accumulation de scikit-learn.
+        proba = self.value[leaves].sum(axis=0, dtype=np.float64)
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def save(self, path):
+        """Sauvegarde les tableaux dans un fichier .npz non compressé."""
+        np.savez(
+            path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            value=self.value, roots=self.roots, max_depth=self.max_depth,
+            classes=self.classes_, n_features_in=self.n_features_in_,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["feature"], data["threshold"], data["left"], data["right"], data["value"],
+                data["roots"], data["max_depth"], data["classes"], data["n_features_in"],
+            )
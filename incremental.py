@@ -0,0 +1,162 @@
+import json
+import os
+
+import numpy as np
+
+from prediction_log import FEATURE_DB_COLUMNS, PREDICTIONS_TABLE
+from preprocessing import FEATURE_COLUMNS, NUMERICAL_COLUMNS, FittedPreprocessing
+
+# Position des colonnes numériques (min/max suivis) parmi les features brutes
+_NUMERICAL_INDEX = [FEATURE_COLUMNS.index(col) for col in NUMERICAL_COLUMNS]
+
+
+def incremental_state_path(model_path):
+    """Chemin de l'état de l'entraînement incrémental (filigrane) associé à un modèle (voir `preprocessing_path`)."""
+    return os.path.splitext(os.path.realpath(model_path))[0] + ".incremental.json"
+
+
+def load_state(model_path):
+    """
+    État du dernier entraînement incrémental installé pour ce modèle.
+
+    Returns:
+    dict: watermark ([labeled_at, id] de la dernière ligne apprise, ou None),
+          runs (nombre d'entraînements incrémentaux), rows (lignes apprises au total).
+    """
+    path = incremental_state_path(model_path)
+    if not os.path.exists(path):
+        return {"watermark": None, "runs": 0, "rows": 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path):
+    with open(path, "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def fetch_labeled_rows(pool, watermark=None, table=PREDICTIONS_TABLE, limit=None):
+    """
+    Lit les prédictions étiquetées après le filigrane, dans l'ordre (labeled_at, id).
+
+    Le filtre s'appuie sur l'index (labeled_at, id) : le coût dépend du nombre
+    de nouvelles lignes, pas de la taille de la table.
+
+    Parameters:
+    pool: Pool de connexions (PostgresPool ou SQLitePool).
+    watermark (list): [labeled_at, id] de la dernière ligne déjà apprise (None : tout lire).
+    limit (int): Nombre maximal de lignes lues (optionnel).
+
+    Returns:
+    tuple: (X brut (n, n_features) dans l'ordre de FEATURE_COLUMNS, labels, nouveau filigrane)
+    """
+    p = pool.placeholder
+    sql = f"SELECT labeled_at, id, {', '.join(FEATURE_DB_COLUMNS)}, label FROM {table} WHERE label IS NOT NULL"
+    params = []
+    if watermark is not None:
+        sql += f" AND (labeled_at > {p} OR (labeled_at = {p} AND id > {p}))"
+        params = [watermark[0], watermark[0], watermark[1]]
+    sql += " ORDER BY labeled_at, id"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+
+    if not rows:
+        return np.empty((0, len(FEATURE_COLUMNS))), np.empty(0, dtype=np.int64), watermark
+    values = np.asarray(rows, dtype=np.float64)
+    last = rows[-1]
+    return values[:, 2:-1], values[:, -1].astype(np.int64), [float(last[0]), int(last[1])]
+
+
+def update_preprocessing(preprocessing, X_raw):
+    """
+    Étend les statistiques du scaling (min/max des colonnes numériques) avec
+    les nouvelles lignes seulement ; encodages, classes et histogrammes de
+    référence du suivi de dérive sont conservés.
+
+    Returns:
+    FittedPreprocessing: Nouveau prétraitement (identique si le delta reste dans les bornes).
+    """
+    if len(X_raw) == 0:
+        return preprocessing
+    values = X_raw[:, _NUMERICAL_INDEX]
+    data_min = np.fmin(preprocessing.data_min, np.nanmin(values, axis=0))
+    data_max = np.fmax(preprocessing.data_max, np.nanmax(values, axis=0))
+    return FittedPreprocessing.from_statistics(
+        data_min, data_max, preprocessing.encodings, preprocessing.target_classes, preprocessing.drift_reference
+    )
+
+
+def rescale_forest(model, old, new):
+    """
+    Réexprime les seuils des arbres existants dans le nouveau scaling.
+
+    Le scaling est affine et croissant par feature : un seuil t appris sur
+    `x * s + o` devient `(t - o) / s * s' + o'` sur `x * s' + o'`, et chaque
+    arbre prend les mêmes décisions qu'avant sur les features brutes, à la
+    résolution float32 près (une valeur collée au seuil peut changer de côté).
+    """
+    if np.array_equal(old.scale, new.scale) and np.array_equal(old.offset, new.offset):
+        return
+    changed = (old.scale != new.scale) | (old.offset != new.offset)
+    for estimator in model.estimators_:
+        state = estimator.tree_.__getstate__()
+        # Copie : le tableau retourné est une vue sur la mémoire de l'arbre.
+        nodes = state["nodes"].copy()
+        split = (nodes["left_child"] != -1) & changed[np.maximum(nodes["feature"], 0)]
+        feature = nodes["feature"][split]
+        nodes["threshold"][split] = _remap_thresholds(nodes["threshold"][split], feature, old, new)
+        state["nodes"] = nodes
+        estimator.tree_.__setstate__(state)
+
+
+def _remap_thresholds(threshold, feature, old, new):
+    """
+    Les arbres comparent des entrées float32 à un seuil float64 : la frontière
+    réelle passe entre les deux float32 qui encadrent le seuil. On transporte
+    ces deux voisins dans le nouveau scaling et on reprend leur milieu.
+    """
+    below = threshold.astype(np.float32)
+    below = np.where(below > threshold, np.nextafter(below, np.float32(-np.inf)), below)
+    above = np.nextafter(below, np.float32(np.inf))
+    scale, offset = new.scale[feature] / old.scale[feature], new.offset[feature]
+    new_below = (((below - old.offset[feature]) * scale) + offset).astype(np.float32).astype(np.float64)
+    new_above = (((above - old.offset[feature]) * scale) + offset).astype(np.float32).astype(np.float64)
+    return np.where(new_above > new_below, (new_below + new_above) / 2, new_below)
+
+
+def grow_forest(model, X, y, n_new_trees, max_estimators=None):
+    """
+    Ajoute `n_new_trees` arbres entraînés sur le delta seulement (warm_start),
+    puis retire les plus anciens au-delà de `max_estimators`.
+
+    Parameters:
+    model (RandomForestClassifier): Forêt existante, modifiée sur place.
+    X (pd.DataFrame): Nouvelles lignes prétraitées.
+    y (array-like): Leurs labels ; toutes les classes du modèle doivent y figurer.
+    n_new_trees (int): Nombre d'arbres ajoutés.
+    max_estimators (int): Taille maximale de la forêt (optionnelle).
+
+    Returns:
+    int: Nombre d'arbres retirés.
+    """
+    classes = np.unique(y)
+    if not np.array_equal(classes, model.classes_):
+        raise ValueError(f"Le delta doit contenir les classes {model.classes_.tolist()}, reçu {classes.tolist()}.")
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_new_trees)
+    try:
+        model.fit(X, y)
+    finally:
+        model.set_params(warm_start=False)
+
+    retired = 0
+    if max_estimators is not None and len(model.estimators_) > max_estimators:
+        retired = len(model.estimators_) - max_estimators
+        model.estimators_ = model.estimators_[retired:]
+        model.set_params(n_estimators=len(model.estimators_))
+    return retired
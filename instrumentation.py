@@ -0,0 +1,340 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Bornes (secondes) des histogrammes de latence par étape
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+# Bornes (secondes) des durées longues : chargement de modèle, réentraînement, étapes d'entraînement
+DURATION_BUCKETS = [0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0]
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class HistogramValue:
+    """Histogramme à bornes fixes (mémoire constante), effectifs par intervalle."""
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value):
+        # bisect_left : la valeur va dans le premier intervalle dont la borne est >= value.
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.n += 1
+
+    def copy(self):
+        histogram = HistogramValue.__new__(HistogramValue)
+        histogram.buckets = self.buckets
+        histogram.counts = list(self.counts)
+        histogram.total = self.total
+        histogram.n = self.n
+        return histogram
+
+    def as_dict(self):
+        labels = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.n,
+            "mean": self.total / self.n if self.n else 0.0,
+        }
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        try:
+            key = tuple([str(labels[name]) for name in self.labelnames])
+        except KeyError:
+            key = None
+        if key is None or len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} attend les labels {self.labelnames}, reçu {tuple(labels)}")
+        return key
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def _items(self):
+        # Copie prise sous le verrou : les threads qui mettent à jour la
+        # métrique pendant le rendu ne modifient pas ce qui est parcouru.
+        with self._lock:
+            return sorted(self._values.items())
+
+
+class Counter(_Metric):
+    """Compteur croissant (requêtes, lignes, erreurs)."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        lines = self._header()
+        for key, value in self._items():
+            lines.append(f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+    def snapshot(self):
+        return dict(self._items())
+
+
+class Gauge(_Metric):
+    """Valeur instantanée (requêtes en cours, taille de file)."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self):
+        lines = self._header()
+        for key, value in self._items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+    def snapshot(self):
+        return dict(self._items())
+
+
+class Histogram(_Metric):
+    """Histogramme de durées par combinaison de labels (bornes fixes)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = list(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = HistogramValue(self.buckets)
+            histogram.observe(value)
+
+    def time(self, **labels):
+        """Context manager mesurant la durée du bloc (même en cas d'exception)."""
+        return _Timer(self, labels)
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels))
+
+    def _items(self):
+        with self._lock:
+            return sorted((key, histogram.copy()) for key, histogram in self._values.items())
+
+    def render(self):
+        lines = self._header()
+        for key, histogram in self._items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + [float("inf")], histogram.counts):
+                cumulative += count
+                le = (("le", _format_value(float(bound))),)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(histogram.total)}")
+            lines.append(f"{self.name}_count{labels} {histogram.n}")
+        return lines
+
+    def snapshot(self):
+        return dict(self._items())
+
+
+class _Timer:
+    # Classe plutôt que @contextmanager : moins coûteux sur le chemin chaud.
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Registry:
+    """
+    Ensemble des métriques d'un processus, rendu au format texte Prometheus.
+
+    Les métriques sont créées à la demande et partagées : demander deux fois le
+    même nom retourne la même instance.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"La métrique {name} existe déjà avec un autre type.")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames=labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames=labelnames)
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        return self._get_or_create(Histogram, name, documentation, buckets=buckets, labelnames=labelnames)
+
+    def render(self):
+        """Texte d'exposition Prometheus de toutes les métriques."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Valeurs à plat, au format des noms de métriques MLflow : compteurs et
+        jauges par leur valeur, histogrammes par leur somme, effectif et moyenne.
+        """
+        flat = {}
+        for metric in list(self._metrics.values()):
+            for key, value in metric.snapshot().items():
+                name = "_".join([metric.name, *key])
+                name = re.sub(r"[^0-9A-Za-z_\-./ ]", "_", name)
+                if isinstance(value, HistogramValue):
+                    flat[f"{name}_sum"] = value.total
+                    flat[f"{name}_count"] = value.n
+                    flat[f"{name}_mean"] = value.total / value.n if value.n else 0.0
+                else:
+                    flat[name] = value
+        return flat
+
+
+# Registre du processus, partagé par les API, l'entraînement et le réentraînement
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "churn_stage_seconds", "Durée de chaque étape de traitement.", LATENCY_BUCKETS, ("app", "endpoint", "stage"))
+REQUESTS = REGISTRY.counter("churn_requests", "Requêtes de prédiction traitées.", ("app", "endpoint", "status"))
+PREDICTED_ROWS = REGISTRY.counter("churn_predicted_rows", "Lignes scorées.", ("app", "endpoint"))
+IN_FLIGHT = REGISTRY.gauge("churn_requests_in_flight", "Requêtes de prédiction en cours.", ("app", "endpoint"))
+DURATIONS = REGISTRY.histogram(
+    "churn_duration_seconds", "Durée des opérations longues (chargement du modèle, réentraînement, entraînement).",
+    DURATION_BUCKETS, ("operation",))
+DRIFT_PSI = REGISTRY.gauge("churn_feature_drift_psi", "PSI de chaque feature numérique servie.", ("feature",))
+DRIFT_DETECTED = REGISTRY.gauge("churn_drift_detected", "1 si une dérive des features servies est détectée.")
+MODEL_SECONDS = REGISTRY.histogram(
+    "churn_model_predict_seconds", "Durée de predict_proba par version du modèle (principale ou en ombre).",
+    LATENCY_BUCKETS, ("version", "role"))
+SHADOW_ROWS = REGISTRY.counter(
+    "churn_shadow_rows", "Lignes scorées en ombre, selon l'accord avec la version principale.", ("version", "outcome"))
+SHADOW_DROPPED = REGISTRY.counter("churn_shadow_dropped", "Lots non scorés en ombre (file pleine).")
+
+
+def stage(app, endpoint, name):
+    """Chronomètre une étape du chemin de prédiction (context manager)."""
+    return STAGE_SECONDS.time(app=app, endpoint=endpoint, stage=name)
+
+
+def timed(operation):
+    """Chronomètre une opération longue : chargement, réentraînement, étape d'entraînement (context manager)."""
+    return DURATIONS.time(operation=operation)
+
+
+class ASGIMetricsMiddleware:
+    """
+    Middleware ASGI minimal : durée totale (étape "request"), statut et
+    requêtes en cours des routes instrumentées. Les autres routes passent
+    sans aucun coût.
+    """
+
+    def __init__(self, app, app_name, paths):
+        self.app = app
+        self.app_name = app_name
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = scope["path"]
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        IN_FLIGHT.inc(app=self.app_name, endpoint=endpoint)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec(app=self.app_name, endpoint=endpoint)
+            STAGE_SECONDS.observe(time.perf_counter() - start, app=self.app_name, endpoint=endpoint, stage="request")
+            REQUESTS.inc(app=self.app_name, endpoint=endpoint, status=status[0])
+
+
+def log_to_mlflow(registry=REGISTRY, prefix=""):
+    """Envoie l'instantané du registre dans le run MLflow actif."""
+    import mlflow
+
+    mlflow.log_metrics({prefix + name: float(value) for name, value in registry.snapshot().items()})
@@ -2,7 +2,9 @@ import numpy as np
 import mlflow
 import mlflow.sklearn
 import joblib
-from model_pipeline import prepare_data, train_model, evaluate_model, save_model
+from dataset_cache import cached_prepare_data, default_cache
+from evaluation import evaluation_report, log_to_mlflow as log_report_to_mlflow
+from model_pipeline import PREPARE_DATA_CONFIG, prepare_data, train_model, save_model
 
 if __name__ == "__main__":
     train_path = 'churn-bigml-80.csv'
@@ -14,19 +16,18 @@ if __name__ == "__main__":
         mlflow.log_param("train_data", train_path)
         mlflow.log_param("test_data", test_path)
 
-        # Préparation des données
-        X_train, X_test, y_train, y_test = prepare_data(train_path, test_path)
+        # Préparation des données (réutilisée depuis le cache si les fichiers n'ont pas changé)
+        X_train, X_test, y_train, y_test, preprocessing, cache_status = cached_prepare_data(
+            prepare_data, train_path, test_path, PREPARE_DATA_CONFIG, default_cache()
+        )
+        mlflow.log_param("dataset_cache", cache_status)
 
         # Entraînement du modèle
         model = train_model(X_train, y_train)
 
-        # Évaluation du modèle
-        accuracy, precision, recall, f1 = evaluate_model(model, X_test, y_test)
-        
-        mlflow.log_metric("accuracy", accuracy)
-        mlflow.log_metric("precision", precision)
-        mlflow.log_metric("recall", recall)
-        mlflow.log_metric("f1_score", f1)
+        # Évaluation du modèle : métriques, intervalles bootstrap, seuils et courbes
+        report = evaluation_report(model, X_test, y_test)
+        log_report_to_mlflow(report)
 
         # ✅ Correction : Conversion en NumPy avec `.iloc[0].to_numpy()`
         input_example = np.expand_dims(X_train.iloc[0].to_numpy(), axis=0)
@@ -34,4 +35,7 @@ if __name__ == "__main__":
         # Enregistrer le modèle avec l'exemple d'entrée
         mlflow.sklearn.log_model(model, "churn_model", input_example=input_example)
 
+        # Prétraitement ajusté, nécessaire pour servir le modèle sur des features brutes
+        mlflow.log_dict(preprocessing.to_dict(), "churn_model/preprocessing.json")
+
         print(" Modèle et métriques enregistrés avec MLflow !")
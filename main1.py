@@ -1,11 +1,12 @@
 import argparse
+import atexit
+import math
 import os
-import numpy as np
-import joblib
-import mlflow
-import mlflow.sklearn
-from model_pipeline1 import prepare_data, train_model, evaluate_model, save_model, load_model
-from elasticsearch import Elasticsearch
+from datetime import datetime, timezone
+from instrumentation import log_to_mlflow as log_timers_to_mlflow, timed
+from es_shipper import ElasticsearchShipper
+# MLflow, scikit-learn et pandas sont importés dans main(), après l'analyse des
+# arguments : `--help` et les erreurs d'usage répondent sans les charger.
 
 
 def _get_tracking_uri():
@@ -25,25 +26,112 @@ def _get_tracking_uri():
     return os.getenv("MLFLOW_TRACKING_URI", "http://localhost:8090")
 
 
-def _get_elasticsearch_client():
-    """Return an Elasticsearch client reachable from the host.
+def _get_elasticsearch_shipper():
+    """Return the process-wide Elasticsearch metrics shipper.
 
     When executed from Jenkins (outside the Docker network), the hostname
     ``elasticsearch`` is not resolvable.  We therefore default to the host
     mapped port.  The hostname can still be overridden through the
     ``ELASTICSEARCH_HOST`` environment variable if needed.
+
+    The shipper is created on first use and never connects before the first
+    flush, so importing this module or running without a cluster costs
+    nothing.  Documents it could not deliver are kept in
+    ``ELASTICSEARCH_SPOOL`` and replayed on a later run.
     """
 
-    es_host = os.getenv("ELASTICSEARCH_HOST", "http://localhost:9200")
-    return Elasticsearch(es_host)
+    global _shipper
+    if _shipper is None:
+        _shipper = ElasticsearchShipper(
+            hosts=os.getenv("ELASTICSEARCH_HOST", "http://localhost:9200"),
+            spool_path=os.getenv("ELASTICSEARCH_SPOOL", ".es_spool.jsonl"),
+        )
+        # Vider le tampon à la sortie du programme (au plus 10 s, le reste part au spool)
+        atexit.register(_shipper.close, 10.0)
+    return _shipper
 
 
-# Connexion à Elasticsearch
-es = _get_elasticsearch_client()
+# Envoi des métriques vers Elasticsearch, créé au premier usage
+_shipper = None
+
+def log_to_elasticsearch(metrics, **fields):
+    """ Envoie les métriques MLflow vers Elasticsearch (en tâche de fond, par lots) """
+    import mlflow
+
+    run = mlflow.active_run()
+    document = {"@timestamp": datetime.now(timezone.utc).isoformat(), **fields, **metrics}
+    if run is not None:
+        document["run_id"] = run.info.run_id
+    _get_elasticsearch_shipper().ship(document)
+
+def log_trials_to_mlflow(result):
+    """
+    Enregistre chaque essai de la recherche comme run MLflow imbriqué.
+    """
+    import mlflow
 
-def log_to_elasticsearch(metrics):
-    """ Envoie les métriques MLflow vers Elasticsearch """
-    es.index(index="mlflow-metrics", body=metrics)
+    for trial in result.trials:
+        with mlflow.start_run(run_name=f"trial-{trial['candidate']}-rung-{trial['rung']}", nested=True):
+            mlflow.log_params(trial["params"])
+            mlflow.log_params({"candidate": trial["candidate"], "rung": trial["rung"], "n_samples": trial["n_samples"]})
+            mlflow.log_metrics({"cv_f1_mean": trial["mean_f1"], "cv_f1_std": trial["std_f1"], "fit_time": trial["fit_time"]})
+        fields = {"candidate": trial["candidate"], "rung": trial["rung"], "n_samples": trial["n_samples"]}
+        log_to_elasticsearch({"cv_f1_mean": trial["mean_f1"], "cv_f1_std": trial["std_f1"], "fit_time": trial["fit_time"]},
+                             kind="trial", **fields)
+        for fold, score in enumerate(trial["scores"]):
+            log_to_elasticsearch({"f1_score": score}, kind="fold", fold=fold, **fields)
+
+def log_compaction_to_mlflow(result):
+    """
+    Enregistre chaque candidat de la compaction comme run MLflow imbriqué
+    (taille, chargement, latence et écarts de métriques), puis le candidat retenu.
+    """
+    import mlflow
+
+    mlflow.log_metrics({f"compaction_baseline_{name}": result.baseline[name]
+                        for name in ("artifact_bytes", "pickle_bytes", "load_ms", "latency_us", "f1_score", "recall")})
+    for candidate in result.candidates:
+        depth = candidate["max_depth_limit"]
+        with mlflow.start_run(run_name=f"compact-{candidate['n_estimators']}x{depth or 'full'}", nested=True):
+            mlflow.log_params({"n_estimators": candidate["n_estimators"], "max_depth": depth,
+                               "within_tolerance": candidate["within_tolerance"]})
+            mlflow.log_metrics({name: value for name, value in candidate.items()
+                                if name not in ("max_depth_limit", "within_tolerance")})
+        log_to_elasticsearch({name: value for name, value in candidate.items() if name != "max_depth_limit"},
+                             kind="compaction", max_depth_limit=depth)
+    mlflow.log_params({"compact_n_estimators": result.best["n_estimators"],
+                       "compact_max_depth": result.best["max_depth_limit"]})
+    mlflow.log_metrics({f"compact_{name}": result.best[name]
+                        for name in ("artifact_bytes", "load_ms", "latency_us", "delta_f1", "delta_recall")})
+
+def log_evaluation(report, kind):
+    """
+    Affiche le rapport d'évaluation (métriques au seuil par défaut avec leurs
+    intervalles, seuils conseillés) et l'enregistre dans MLflow et Elasticsearch.
+    """
+    from evaluation import log_to_mlflow as log_report_to_mlflow
+
+    intervals = report.get("intervals", {})
+    for icon, label, name in (("📊", "Accuracy", "accuracy"), ("🎯", "Precision", "precision"),
+                              ("🔁", "Recall", "recall"), ("🏆", "F1 Score", "f1_score"),
+                              ("📈", "ROC AUC", "roc_auc"), ("📉", "Average precision", "average_precision")):
+        interval = f" (IC {report['confidence']:.0%} : {intervals[name][0]:.4f} – {intervals[name][1]:.4f})" if intervals else ""
+        print(f"{icon} {label}: {report['metrics'][name]}{interval}")
+    best = report["best_f1"]
+    print(f"🎚️ Seuil du meilleur F1 : {best['threshold']:.3f} (F1 {best['f1_score']:.4f}, "
+          f"précision {best['precision']:.4f}, rappel {best['recall']:.4f})")
+    for target, point in report["recall_targets"].items():
+        if point is not None:
+            print(f"🎚️ Rappel ≥ {target} : seuil {point['threshold']:.3f} (précision {point['precision']:.4f}, "
+                  f"{point['flagged_rate']:.1%} des clients signalés)")
+
+    # Enregistrer les métriques dans MLflow et Elasticsearch
+    log_report_to_mlflow(report)
+    document = dict(report["metrics"], best_f1_threshold=best["threshold"], best_f1_score=best["f1_score"])
+    for name, (low, high) in intervals.items():
+        document[f"{name}_ci_low"], document[f"{name}_ci_high"] = low, high
+    # NaN (AUC sans positif ni négatif) n'est pas du JSON valide pour Elasticsearch.
+    log_to_elasticsearch({name: value for name, value in document.items() if not math.isnan(value)}, kind=kind)
 
 def main():
     """
@@ -54,8 +142,40 @@ def main():
     parser.add_argument("--test_path", type=str, help="Path to testing dataset")
     parser.add_argument("--save_model", type=str, default='churn_model.pkl', help="Path to save trained model")
     parser.add_argument("--load_model", type=str, help="Path to load existing model for evaluation")
+    parser.add_argument("--save_artifact", type=str, help="Also write a memory-mappable model artifact directory")
+    parser.add_argument("--tune", action="store_true", help="Search forest hyperparameters (parallel CV + successive halving)")
+    parser.add_argument("--n_workers", type=int, default=os.cpu_count(), help="Number of worker processes used by --tune, --score and the evaluation bootstrap")
+    parser.add_argument("--cv_folds", type=int, default=3, help="Number of cross-validation folds used by --tune")
+    parser.add_argument("--score", type=str, help="Raw CSV to score with the model given by --load_model (or --save_model)")
+    parser.add_argument("--output", type=str, help="Output of --score: CSV, or .parquet (requires pyarrow)")
+    parser.add_argument("--chunksize", type=int, default=50000, help="Rows per chunk used by --score")
+    parser.add_argument("--id_column", type=str, help="Input column copied into the --score output, to join predictions back to subscribers")
+    parser.add_argument("--backend", type=str, default=os.getenv("MODEL_BACKEND", "sklearn"), choices=["sklearn", "flat"], help="Inference engine used by --score (MODEL_BACKEND)")
+    parser.add_argument("--record_labels", type=str, help="CSV of observed churn (columns id,label) for logged predictions, recorded in --database_url before any --incremental run")
+    parser.add_argument("--incremental", action="store_true", help="Update the model with the predictions labelled since the last incremental run")
+    parser.add_argument("--database_url", type=str, default=os.getenv("DATABASE_URL"), help="Predictions database used by --record_labels and --incremental")
+    parser.add_argument("--new_trees", type=int, default=20, help="Trees added by --incremental")
+    parser.add_argument("--max_trees", type=int, help="Retire the oldest trees beyond this forest size (--incremental)")
+    parser.add_argument("--min_rows", type=int, default=100, help="Minimum new labelled rows required by --incremental")
+    parser.add_argument("--n_bootstrap", type=int, default=1000, help="Bootstrap resamples for the evaluation confidence intervals (0 to skip)")
+    parser.add_argument("--compact", action="store_true", help="Write the smallest tree count/depth within tolerance (compact dtypes) to --save_artifact")
+    parser.add_argument("--compact_f1_tolerance", type=float, default=0.01, help="F1 loss on the test set accepted by --compact")
+    parser.add_argument("--compact_recall_tolerance", type=float, default=0.01, help="Recall loss on the test set accepted by --compact")
     
     args = parser.parse_args()
+
+    import mlflow
+    import mlflow.sklearn
+    from bulk_scoring import score_file
+    from compaction import compact_model
+    from evaluation import evaluation_report
+    from dataset_cache import cached_prepare_data, default_cache
+    from incremental import incremental_state_path
+    from model_artifact import save_artifact
+    from model_pipeline1 import PREPARE_DATA_CONFIG, prepare_data, train_model, save_model, load_model, load_preprocessing
+    from prediction_log import create_pool, ensure_schema, record_labels_csv
+    from retraining import install_version, run_incremental_training
+    from tuning import DEFAULT_PARAM_GRID, successive_halving
     
     # Définir l'expérience MLflow
     mlflow.set_tracking_uri(_get_tracking_uri())  # Utiliser MLflow sans SQLite
@@ -65,46 +185,125 @@ def main():
         mlflow.log_param("train_path", args.train_path)
         mlflow.log_param("test_path", args.test_path)
 
-        # Vérification si nous effectuons un entraînement ou une évaluation
-        if args.load_model:
+        # Churn observé des prédictions journalisées : c'est ce que --incremental apprend ensuite.
+        if args.record_labels:
+            if not args.database_url:
+                raise ValueError("Vous devez fournir `--database_url` (ou DATABASE_URL) avec `--record_labels`.")
+            pool = create_pool(args.database_url, maxconn=1)
+            try:
+                ensure_schema(pool)
+                labels = record_labels_csv(pool, args.record_labels)
+            finally:
+                pool.closeall()
+            print(f"🏷️ {labels} labels enregistrés depuis {args.record_labels}")
+            mlflow.log_param("record_labels", args.record_labels)
+            mlflow.log_metric("recorded_labels", labels)
+
+        # Vérification si nous effectuons un scoring, un entraînement ou une évaluation
+        if args.score:
+            if not args.output:
+                raise ValueError("Vous devez fournir `--output` avec `--score`.")
+            model_path = args.load_model or args.save_model
+            stats = score_file(model_path, args.score, args.output, chunksize=args.chunksize, n_workers=args.n_workers,
+                               backend=args.backend, id_column=args.id_column,
+                               on_chunk=lambda chunk: log_to_elasticsearch(chunk, kind="scoring_chunk"))
+            print(f"📤 {stats['rows']} lignes scorées en {stats['seconds']:.1f} s "
+                  f"({stats['rows_per_second']:.0f} lignes/s, {stats['n_workers']} processus) -> {args.output}")
+            mlflow.log_params({"score_input": args.score, "score_output": args.output, "model_path": model_path,
+                               "chunksize": args.chunksize, "n_workers": stats["n_workers"],
+                               "backend": args.backend, "id_column": args.id_column})
+            mlflow.log_metrics({"scored_rows": stats["rows"], "scoring_seconds": stats["seconds"],
+                                "rows_per_second": stats["rows_per_second"]})
+            log_to_elasticsearch(stats, kind="scoring")
+        elif args.incremental:
+            if not args.database_url:
+                raise ValueError("Vous devez fournir `--database_url` (ou DATABASE_URL) avec `--incremental`.")
+            model_path = args.load_model or args.save_model
+            with timed("training_incremental"):
+                tmp_model, tmp_preprocessing, metrics, tmp_state = run_incremental_training(
+                    model_path, args.database_url, n_new_trees=args.new_trees,
+                    max_estimators=args.max_trees, min_rows=args.min_rows,
+                )
+            # Modèle, prétraitement et filigrane publiés ensemble, en une seule opération atomique.
+            install_version(model_path, tmp_model, tmp_preprocessing, tmp_state)
+            print(f"➕ {metrics['rows']} nouvelles lignes apprises, {metrics['n_estimators']} arbres "
+                  f"({metrics['retired_trees']} retirés) -> {model_path}")
+            print(f"🏆 F1 du modèle précédent sur ces lignes : {metrics['f1_score']}")
+            mlflow.log_params({"mode": "incremental", "model_path": model_path, "new_trees": args.new_trees,
+                               "max_trees": args.max_trees})
+            mlflow.log_metrics(metrics)
+            log_to_elasticsearch(metrics, kind="incremental")
+            log_timers_to_mlflow()
+        elif args.load_model:
             model = load_model(args.load_model)
             print(f"📂 Modèle chargé depuis {args.load_model}")
             
             if args.test_path:
-                _, X_test, _, y_test = prepare_data(args.test_path, args.test_path)
-                accuracy, precision, recall, f1 = evaluate_model(model, X_test, y_test)
-                
-                print(f"📊 Accuracy: {accuracy}")
-                print(f"🎯 Precision: {precision}")
-                print(f"🔁 Recall: {recall}")
-                print(f"🏆 F1 Score: {f1}")
-
-                # Enregistrer les métriques dans MLflow et Elasticsearch
-                metrics = {"accuracy": accuracy, "precision": precision, "recall": recall, "f1_score": f1}
-                mlflow.log_metrics(metrics)
-                log_to_elasticsearch(metrics)
+                # Réutiliser le prétraitement ajusté à l'entraînement s'il a été sauvegardé
+                preprocessing = load_preprocessing(args.load_model)
+                _, X_test, _, y_test = prepare_data(args.test_path, args.test_path, preprocessing=preprocessing)
+                report = evaluation_report(model, X_test, y_test, n_bootstrap=args.n_bootstrap,
+                                           n_workers=args.n_workers)
+                log_evaluation(report, kind="evaluation")
             else:
                 raise ValueError("Vous devez fournir `--test_path` pour évaluer un modèle chargé.")
         elif args.train_path and args.test_path:
-            X_train, X_test, y_train, y_test = prepare_data(args.train_path, args.test_path)
-            model = train_model(X_train, y_train)
-            save_model(model, args.save_model)
+            if args.compact and not args.save_artifact:
+                raise ValueError("Vous devez fournir `--save_artifact` avec `--compact`.")
+            with timed("training_prepare_data"):
+                X_train, X_test, y_train, y_test, preprocessing, cache_status = cached_prepare_data(
+                    prepare_data, args.train_path, args.test_path, PREPARE_DATA_CONFIG, default_cache()
+                )
+            mlflow.log_param("dataset_cache", cache_status)
+            if args.tune:
+                with timed("training_tuning"):
+                    result = successive_halving(X_train, y_train, DEFAULT_PARAM_GRID,
+                                                n_splits=args.cv_folds, n_workers=args.n_workers)
+                log_trials_to_mlflow(result)
+                print(f"🔍 Meilleurs paramètres : {result.best_params} (F1 CV {result.best_score:.4f}, "
+                      f"{len(result.trials)} essais en {result.elapsed:.1f} s)")
+                mlflow.log_params({f"best_{name}": value for name, value in result.best_params.items()})
+                mlflow.log_metrics({"cv_f1_best": result.best_score, "tuning_seconds": result.elapsed})
+                with timed("training_fit"):
+                    model = train_model(X_train, y_train, n_jobs=args.n_workers, **result.best_params)
+                    # Le modèle enregistré sert des prédictions unitaires : pas de pool joblib par appel.
+                    model.set_params(n_jobs=None)
+            else:
+                with timed("training_fit"):
+                    model = train_model(X_train, y_train)
+            with timed("training_save_model"):
+                save_model(model, args.save_model, preprocessing)
+            # Nouveau modèle complet : le prochain incrémental repart de toutes les lignes étiquetées.
+            if os.path.exists(incremental_state_path(args.save_model)):
+                os.unlink(incremental_state_path(args.save_model))
             print(f"💾 Modèle enregistré sous {args.save_model}")
+            if args.compact:
+                with timed("training_compaction"):
+                    compaction = compact_model(model, X_test, y_test, preprocessing,
+                                               f1_tolerance=args.compact_f1_tolerance,
+                                               recall_tolerance=args.compact_recall_tolerance)
+                log_compaction_to_mlflow(compaction)
+                best = compaction.best
+                print(f"🗜️ Forêt compactée : {best['n_estimators']} arbres, profondeur {best['max_depth']} "
+                      f"({best['artifact_bytes'] / 1e6:.1f} Mo au lieu de {compaction.baseline['artifact_bytes'] / 1e6:.1f} Mo, "
+                      f"ΔF1 {best['delta_f1']:+.4f}, Δrecall {best['delta_recall']:+.4f})")
+            if args.save_artifact:
+                manifest = save_artifact(compaction.forest if args.compact else model, args.save_artifact, preprocessing)
+                mlflow.log_param("artifact_version", manifest["version"])
+                print(f"💾 Artefact mappable {manifest['version']} enregistré sous {args.save_artifact}")
             
-            accuracy, precision, recall, f1 = evaluate_model(model, X_test, y_test)
-            print(f"📊 Accuracy: {accuracy}")
-            print(f"🎯 Precision: {precision}")
-            print(f"🔁 Recall: {recall}")
-            print(f"🏆 F1 Score: {f1}")
-
-            # Enregistrer les métriques dans MLflow et Elasticsearch
-            metrics = {"accuracy": accuracy, "precision": precision, "recall": recall, "f1_score": f1}
-            mlflow.log_metrics(metrics)
-            log_to_elasticsearch(metrics)
+            with timed("training_evaluate"):
+                report = evaluation_report(model, X_test, y_test, n_bootstrap=args.n_bootstrap,
+                                           n_workers=args.n_workers)
+            log_evaluation(report, kind="training")
 
             # Sauvegarde du modèle dans MLflow
             mlflow.sklearn.log_model(model, "model_churn")
-        else:
+            mlflow.log_dict(preprocessing.to_dict(), "model_churn/preprocessing.json")
+
+            # Durées de chaque étape (mêmes histogrammes que /metrics)
+            log_timers_to_mlflow()
+        elif not args.record_labels:
             raise ValueError("Vous devez spécifier `--train_path` et `--test_path` pour entraîner ou `--load_model` avec `--test_path` pour évaluer.")
 
 if __name__ == "__main__":
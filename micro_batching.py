@@ -0,0 +1,150 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from instrumentation import HistogramValue
+
+# Bornes supérieures des histogrammes exposés par MicroBatcher.stats()
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+QUEUE_WAIT_BUCKETS_MS = [0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 25.0, 50.0, 100.0]
+
+
+class MicroBatcher:
+    """
+    Regroupe les prédictions unitaires concurrentes en lots.
+
+    Chaque appel à `submit` place une ligne dans une file asyncio. Une tâche de
+    fond forme un lot dès que `max_batch_size` lignes sont en attente ou que la
+    première ligne a attendu `max_wait_ms`, puis le score avec un seul appel à
+    `predict_proba` dans un thread de travail. Chaque appelant reçoit la ligne
+    du résultat qui lui correspond.
+
+    Parameters:
+    predict_proba (callable): Fonction (n_lignes, n_features) -> (n_lignes, n_classes),
+        ou toute séquence indexée par ligne, appelée à chaque lot (ce qui permet
+        de changer de modèle à chaud).
+    max_batch_size (int): Nombre maximal de lignes par lot.
+    max_wait_ms (float): Attente maximale d'une ligne avant l'envoi de son lot.
+    max_workers (int): Nombre de lots scorés en parallèle.
+    """
+
+    def __init__(self, predict_proba, max_batch_size=64, max_wait_ms=2.0, max_workers=1):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size doit être >= 1")
+        self._predict_proba = predict_proba
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_workers = max_workers
+        self._executor = None
+        self._slots = None
+        self._queue = None
+        self._task = None
+        self._in_flight = set()
+        self.loop = None
+        self.batch_sizes = HistogramValue(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = HistogramValue(QUEUE_WAIT_BUCKETS_MS)
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Démarre la tâche de regroupement sur la boucle asyncio courante."""
+        if self.running:
+            return
+        self.loop = asyncio.get_running_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="micro-batch")
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._queue = asyncio.Queue()
+        self._task = self.loop.create_task(self._run())
+
+    async def stop(self):
+        """Termine les lots en cours puis arrête la tâche de regroupement."""
+        if self.running:
+            await self._queue.put(None)
+            await self._task
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def submit(self, row):
+        """
+        Ajoute une ligne à la file et attend sa ligne de probabilités.
+
+        Parameters:
+        row (array-like): Vecteur de features d'une seule observation.
+
+        Returns:
+        Ligne du résultat de `predict_proba` (probabilités de chaque classe).
+        """
+        if not self.running:
+            self.start()
+        future = self.loop.create_future()
+        await self._queue.put((np.asarray(row, dtype=np.float64), future, time.perf_counter()))
+        return await future
+
+    def stats(self):
+        """Distributions des tailles de lot et des temps d'attente en file."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_sizes.as_dict(),
+            "queue_wait_ms": self.queue_wait_ms.as_dict(),
+        }
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = self.loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # Vider d'abord ce qui est déjà en file, sans attendre.
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - self.loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._slots.acquire()
+            task = self.loop.create_task(self._score(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _score(self, batch):
+        try:
+            dispatched = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait_ms.observe((dispatched - enqueued) * 1000.0)
+            self.batch_sizes.observe(len(batch))
+
+            X = np.vstack([row for row, _, _ in batch])
+            try:
+                proba = await self.loop.run_in_executor(self._executor, self._predict_proba, X)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for i, (_, future, _) in enumerate(batch):
+                if not future.done():
+                    future.set_result(proba[i])
+        finally:
+            self._slots.release()
@@ -0,0 +1,220 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from fast_forest import FlatForest
+from preprocessing import FEATURE_COLUMNS, FittedPreprocessing
+
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+# Tableaux de la forêt aplatie, un fichier .npy non compressé chacun
+ARRAY_NAMES = ("feature", "threshold", "left", "right", "value", "roots")
+
+# Versions publiées conservées (la courante et la précédente, encore lue par
+# un worker qui a résolu le lien juste avant le remplacement)
+KEEP_VERSIONS = 2
+
+
+def is_artifact(path):
+    """Vrai si `path` est un répertoire d'artefact (contient un manifeste)."""
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def versions_directory(path):
+    """Répertoire caché des versions publiées de `path` (fichier modèle ou artefact)."""
+    path = os.path.abspath(path)
+    return os.path.join(os.path.dirname(path), "." + os.path.basename(path) + ".versions")
+
+
+def new_version_directory(path):
+    """
+    Crée un répertoire de version vide pour `path`. Les lecteurs ne le voient
+    qu'une fois désigné par `publish`.
+    """
+    versions = versions_directory(path)
+    os.makedirs(versions, exist_ok=True)
+    # Le préfixe horodaté ordonne les versions ; mkdtemp garantit un nom unique.
+    return tempfile.mkdtemp(dir=versions, prefix=f"{time.time_ns():020d}-")
+
+
+def publish(path, version_dir, entry=None):
+    """
+    Fait désigner à `path` le répertoire de version `version_dir` (ou le
+    fichier `entry` de ce répertoire), en remplaçant atomiquement le lien
+    symbolique `path` (os.replace). Un lecteur qui résout `path` voit
+    l'ancienne version ou la nouvelle, complète : tous les fichiers d'une
+    version (modèle, prétraitement, filigrane, manifeste) changent ensemble.
+
+    Un fichier ordinaire à la place de `path` est remplacé de la même façon.
+    Un ancien répertoire d'artefact est d'abord déplacé parmi les versions :
+    c'est la seule mise en place non atomique, une fois par artefact.
+
+    Parameters:
+    path (str): Chemin lu par les API et les scripts.
+    version_dir (str): Répertoire créé par `new_version_directory` et déjà rempli.
+    entry (str): Fichier désigné dans le répertoire de version (optionnel).
+    """
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    target = os.path.join(version_dir, entry) if entry else version_dir
+    if os.path.isdir(path) and not os.path.islink(path):
+        os.rename(path, os.path.join(versions_directory(path), f"{0:020d}-{uuid.uuid4().hex}"))
+    link = os.path.join(parent, f".{os.path.basename(path)}.{uuid.uuid4().hex}.link")
+    os.symlink(os.path.relpath(target, parent), link)
+    try:
+        os.replace(link, path)
+    except BaseException:
+        os.unlink(link)
+        raise
+    _prune_versions(path, os.path.basename(version_dir))
+
+
+def _prune_versions(path, current):
+    # Seules les versions antérieures à la courante sont supprimées : une
+    # version plus récente peut être en cours d'écriture par un autre processus.
+    versions = versions_directory(path)
+    names = sorted(os.listdir(versions))
+    for name in names[:max(0, names.index(current) - KEEP_VERSIONS + 1)]:
+        shutil.rmtree(os.path.join(versions, name), ignore_errors=True)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_artifact(model, directory, preprocessing=None):
+    """
+    Sauvegarde un modèle sous forme de répertoire d'artefact mappable en mémoire.
+
+    Les tableaux de la forêt aplatie sont écrits en .npy non compressés, à côté
+    d'un manifeste (version du format, version du modèle, ordre des features,
+    classes, forme, type et empreinte SHA-256 de chaque tableau, prétraitement).
+    La version du modèle couvre les tableaux et le prétraitement.
+
+    L'artefact est écrit dans un nouveau répertoire de version, puis `directory`
+    (un lien symbolique) est basculé dessus par `publish` : un lecteur voit
+    l'ancien ou le nouvel artefact, jamais un mélange ni un chemin absent. Les
+    processus qui ont déjà mappé l'ancien le gardent valide.
+
+    Parameters:
+    model: RandomForestClassifier entraîné ou FlatForest.
+    directory (str): Répertoire de l'artefact.
+    preprocessing (FittedPreprocessing): Prétraitement ajusté (optionnel).
+
+    Returns:
+    dict: Le manifeste écrit.
+    """
+    flat = model if isinstance(model, FlatForest) else FlatForest.from_sklearn(model)
+    tmp_dir = new_version_directory(directory)
+    try:
+        arrays = {}
+        for name in ARRAY_NAMES:
+            values = getattr(flat, name)
+            path = os.path.join(tmp_dir, f"{name}.npy")
+            np.save(path, values)
+            arrays[name] = {"file": f"{name}.npy", "dtype": values.dtype.str,
+                            "shape": list(values.shape), "sha256": _sha256(path)}
+
+        preprocessing_dict = preprocessing.to_dict() if preprocessing is not None else None
+        checksum = hashlib.sha256("".join(arrays[name]["sha256"] for name in ARRAY_NAMES).encode())
+        # Un prétraitement différent change les prédictions : il change aussi la version.
+        checksum.update(json.dumps(preprocessing_dict, sort_keys=True).encode())
+        manifest = {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "version": checksum.hexdigest()[:12],
+            "feature_columns": list(preprocessing.feature_columns) if preprocessing is not None else FEATURE_COLUMNS,
+            "n_features_in": flat.n_features_in_,
+            "classes": flat.classes_.tolist(),
+            "max_depth": flat.max_depth,
+            "arrays": arrays,
+            "preprocessing": preprocessing_dict,
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+
+        publish(directory, tmp_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return manifest
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Format d'artefact non supporté : {manifest.get('format_version')}")
+    return manifest
+
+
+def load_artifact(directory, mmap=True, verify=False):
+    """
+    Charge un artefact : les tableaux sont ouverts avec mmap_mode="r", si bien
+    que tous les processus d'une machine partagent une seule copie en cache
+    disque et que le chargement ne lit que le manifeste.
+
+    Parameters:
+    directory (str): Répertoire de l'artefact.
+    mmap (bool): Mapper les tableaux (False : les lire en mémoire privée).
+    verify (bool): Vérifier l'empreinte SHA-256 de chaque tableau (lit tous les fichiers).
+
+    Returns:
+    ServingModel: Modèle prêt à servir (forêt aplatie), de version celle du manifeste.
+    """
+    from serving import ServingModel
+
+    # Lien d'une version publiée résolu une seule fois : manifeste et tableaux viennent de la même version.
+    directory = os.path.realpath(directory)
+    manifest = read_manifest(directory)
+    if manifest["feature_columns"] != FEATURE_COLUMNS:
+        raise ValueError(f"Ordre des features de l'artefact inattendu : {manifest['feature_columns']}")
+
+    arrays = {}
+    for name in ARRAY_NAMES:
+        spec = manifest["arrays"][name]
+        path = os.path.join(directory, spec["file"])
+        if verify and _sha256(path) != spec["sha256"]:
+            raise ValueError(f"Empreinte invalide pour {spec['file']}")
+        values = np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+        if values.dtype.str != spec["dtype"] or list(values.shape) != spec["shape"]:
+            raise ValueError(f"{spec['file']} ne correspond pas au manifeste.")
+        arrays[name] = values
+
+    forest = FlatForest(
+        arrays["feature"], arrays["threshold"], arrays["left"], arrays["right"], arrays["value"],
+        arrays["roots"], manifest["max_depth"], np.asarray(manifest["classes"]), manifest["n_features_in"],
+    )
+    preprocessing = None
+    if manifest["preprocessing"] is not None:
+        preprocessing = FittedPreprocessing.from_dict(manifest["preprocessing"])
+    return ServingModel(forest, preprocessing, manifest["version"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convertit un modèle joblib en artefact mappable en mémoire")
+    parser.add_argument("model_path", help="Modèle sauvegardé par save_model (.pkl)")
+    parser.add_argument("artifact_dir", help="Répertoire de l'artefact à écrire")
+    args = parser.parse_args()
+
+    from model_pipeline1 import load_model, load_preprocessing
+
+    manifest = save_artifact(load_model(args.model_path), args.artifact_dir, load_preprocessing(args.model_path))
+    print(f"Artefact {manifest['version']} écrit dans {args.artifact_dir}")
+
+
+if __name__ == "__main__":
+    main()
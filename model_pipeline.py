@@ -3,9 +3,11 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, MinMaxScaler
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 import joblib
+import os
 from scipy.stats import zscore
+from evaluation import confusion_counts, metrics_from_counts, positive_scores
+from preprocessing import FittedPreprocessing, preprocessing_path
 
 
 def normalize_data(data, columns_to_normalize):
@@ -23,25 +25,54 @@ def remove_outliers(data, num_cols, method="zscore", threshold=3):
         z_scores = np.abs(zscore(data[num_cols]))
         data = data[(z_scores < threshold).all(axis=1)]
     elif method == "iqr":
-        for col in num_cols:
-            Q1 = data[col].quantile(0.25)
-            Q3 = data[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            data = data[(data[col] >= lower_bound) & (data[col] <= upper_bound)]
+        data = within_bounds(data, iqr_bounds(data, num_cols))
+    elif method == "iqr_mask":
+        # Bornes calculées sur les données non filtrées, un seul masque combiné
+        # (équivalent en mémoire du filtre appliqué par prepare_data_streaming).
+        quartiles = data[num_cols].quantile([0.25, 0.75])
+        iqr = quartiles.loc[0.75] - quartiles.loc[0.25]
+        lower_bound = quartiles.loc[0.25] - 1.5 * iqr
+        upper_bound = quartiles.loc[0.75] + 1.5 * iqr
+        data = data[((data[num_cols] >= lower_bound) & (data[num_cols] <= upper_bound)).all(axis=1)]
     return data
 
 
-def prepare_data(train_path, test_path):
+def iqr_bounds(data, num_cols):
+    # Bornes de remove_outliers(method="iqr") : celles de chaque colonne sont
+    # calculées sur les lignes retenues par les colonnes précédentes.
+    bounds = {}
+    for col in num_cols:
+        Q1 = data[col].quantile(0.25)
+        Q3 = data[col].quantile(0.75)
+        IQR = Q3 - Q1
+        bounds[col] = (Q1 - 1.5 * IQR, Q3 + 1.5 * IQR)
+        data = data[(data[col] >= bounds[col][0]) & (data[col] <= bounds[col][1])]
+    return bounds
+
+
+def within_bounds(data, bounds):
+    mask = np.ones(len(data), dtype=bool)
+    for col, (lower_bound, upper_bound) in bounds.items():
+        mask &= ((data[col] >= lower_bound) & (data[col] <= upper_bound)).to_numpy()
+    return data[mask]
+
+
+# Configuration de prepare_data, incluse dans la clé du cache des jeux de données
+PREPARE_DATA_CONFIG = {"pipeline": "model_pipeline.prepare_data", "outliers": "iqr", "filter_test_outliers": False,
+                       "drift_reference": "before_outliers"}
+
+
+def prepare_data(train_path, test_path, return_preprocessing=False, filter_test_outliers=False):
+    # Par défaut, les outliers ne sont retirés que de l'entraînement : l'ensemble
+    # de test reste complet, comme le trafic servi. filter_test_outliers=True
+    # retire aussi du test les lignes hors des bornes IQR de l'entraînement,
+    # proche du comportement d'origine (filtrage de l'union train + test).
     # Charger les données
     train_data = pd.read_csv(train_path)
     test_data = pd.read_csv(test_path)
 
-    # Fusionner les données pour le prétraitement
-    data = pd.concat([train_data, test_data], ignore_index=True)
-
-    # Supprimer les colonnes inutiles
+    # Les paramètres du prétraitement (encodage, suppression des outliers,
+    # normalisation) sont appris sur l'ensemble d'entraînement uniquement.
     columns_to_drop = [
         "State",
         "Area code",
@@ -50,15 +81,6 @@ def prepare_data(train_path, test_path):
         "Total night minutes",
         "Total intl minutes",
     ]
-    data = drop_columns(data, columns_to_drop)
-
-    # Encodage des variables catégorielles
-    label_encoder = LabelEncoder()
-    data["International plan"] = label_encoder.fit_transform(data["International plan"])
-    data["Voice mail plan"] = label_encoder.fit_transform(data["Voice mail plan"])
-    data["Churn"] = label_encoder.fit_transform(data["Churn"])
-
-    # Normalisation des données numériques
     numerical_columns = [
         "Account length",
         "Number vmail messages",
@@ -73,21 +95,21 @@ def prepare_data(train_path, test_path):
         "Customer service calls",
     ]
 
-    # Suppression des outliers
-    data = remove_outliers(data, numerical_columns, method="iqr")
-
-    data = normalize_data(data, numerical_columns)
-
-    # Séparer les données en ensembles d'entraînement et de test
-    train_data = data.iloc[: len(train_data)]
-    test_data = data.iloc[len(train_data) :]
-
-    # Séparer les caractéristiques et la cible
-    X_train = train_data.drop("Churn", axis=1)
-    y_train = train_data["Churn"]
-    X_test = test_data.drop("Churn", axis=1)
-    y_test = test_data["Churn"]
-
+    # Suppression des outliers (entraînement, et test si demandé)
+    raw_train = drop_columns(train_data, columns_to_drop)
+    bounds = iqr_bounds(raw_train, numerical_columns)
+    train_data = within_bounds(raw_train, bounds)
+    if filter_test_outliers:
+        test_data = within_bounds(test_data, bounds)
+
+    # Encodage des variables catégorielles et normalisation des données numériques.
+    # Les histogrammes de référence du suivi de dérive gardent les outliers : le trafic servi n'est pas filtré.
+    preprocessing = FittedPreprocessing.fit(train_data, drift_data=raw_train)
+    X_train, y_train = preprocessing.transform_frame(train_data)
+    X_test, y_test = preprocessing.transform_frame(test_data)
+
+    if return_preprocessing:
+        return X_train, X_test, y_train, y_test, preprocessing
     return X_train, X_test, y_train, y_test
 
 
@@ -98,16 +120,19 @@ def train_model(X_train, y_train):
 
 
 def evaluate_model(model, X_test, y_test):
-    y_pred = model.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred)
-    recall = recall_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
-    return accuracy, precision, recall, f1
+    # Un seul predict_proba et une seule matrice de confusion pour les quatre métriques
+    _, predicted = positive_scores(model, X_test)
+    metrics = metrics_from_counts(*confusion_counts(y_test, predicted))
+    return tuple(float(metrics[name]) for name in ("accuracy", "precision", "recall", "f1_score"))
 
 
-def save_model(model, filename):
+def save_model(model, filename, preprocessing=None):
+    # Un modèle publié par version (lien symbolique) est remplacé, pas réécrit à travers le lien.
+    if os.path.islink(filename):
+        os.unlink(filename)
     joblib.dump(model, filename)
+    if preprocessing is not None:
+        preprocessing.save(preprocessing_path(filename))
 
 
 def load_model(filename):
@@ -1,68 +1,58 @@
 import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 import joblib
-from scipy.stats import zscore
+import os
+from drift import DRIFT_BINS
+from evaluation import confusion_counts, metrics_from_counts, positive_scores
+from preprocessing import FEATURE_COLUMNS, FittedPreprocessing, preprocessing_path
 
-def prepare_data(train_path, test_path):
+# Configuration de prepare_data, incluse dans la clé du cache des jeux de données
+PREPARE_DATA_CONFIG = {"pipeline": "model_pipeline1.prepare_data", "drift_bins": DRIFT_BINS}
+
+
+def prepare_data(train_path, test_path, preprocessing=None, return_preprocessing=False):
     """
     Charge et prépare les données pour l'entraînement et le test.
     
+    Le prétraitement (encodage, scaling) est ajusté sur l'ensemble
+    d'entraînement uniquement, puis appliqué tel quel à l'ensemble de test.
+    
     Parameters:
     train_path (str): Chemin du fichier CSV d'entraînement.
     test_path (str): Chemin du fichier CSV de test.
+    preprocessing (FittedPreprocessing): Prétraitement déjà ajusté à réutiliser (optionnel).
+    return_preprocessing (bool): Retourner aussi le prétraitement ajusté.
     
     Returns:
-    tuple: (X_train, X_test, y_train, y_test)
+    tuple: (X_train, X_test, y_train, y_test), suivi du prétraitement si demandé
     """
     train_data = pd.read_csv(train_path)
     test_data = pd.read_csv(test_path)
     
-    # Fusionner pour assurer une transformation identique
-    data = pd.concat([train_data, test_data], ignore_index=True)
-    
-    # Supprimer les colonnes inutiles
-    columns_to_drop = ['State', 'Area code', 'Total day minutes',
-                       'Total eve minutes', 'Total night minutes', 'Total intl minutes']
-    data = data.drop(columns=columns_to_drop, errors='ignore')
-    
-    # Encodage des variables catégorielles
-    label_encoder = LabelEncoder()
-    for col in ['International plan', 'Voice mail plan', 'Churn']:
-        data[col] = label_encoder.fit_transform(data[col])
+    # Ajustement sur l'entraînement seulement : scorer de nouvelles données ne demande aucun réajustement
+    if preprocessing is None:
+        preprocessing = FittedPreprocessing.fit(train_data)
     
-    # Normalisation des données numériques
-    numerical_columns = ['Account length', 'Number vmail messages', 'Total day calls',
-                         'Total day charge', 'Total eve calls', 'Total eve charge',
-                         'Total night calls', 'Total night charge', 'Total intl calls',
-                         'Total intl charge', 'Customer service calls']
-    
-    data[numerical_columns] = MinMaxScaler().fit_transform(data[numerical_columns])
-    
-    # Séparer les données en ensembles d'entraînement et de test
-    train_data = data.iloc[:len(train_data)]
-    test_data = data.iloc[len(train_data):]
-    
-    X_train, y_train = train_data.drop('Churn', axis=1), train_data['Churn']
-    X_test, y_test = test_data.drop('Churn', axis=1), test_data['Churn']
+    X_train, y_train = preprocessing.transform_frame(train_data)
+    X_test, y_test = preprocessing.transform_frame(test_data)
     
+    if return_preprocessing:
+        return X_train, X_test, y_train, y_test, preprocessing
     return X_train, X_test, y_train, y_test
 
-def train_model(X_train, y_train):
+def train_model(X_train, y_train, **params):
     """
     Entraîne un modèle RandomForestClassifier.
-    
+
     Parameters:
     X_train (pd.DataFrame): Données d'entraînement.
     y_train (pd.Series): Labels d'entraînement.
-    
+    **params: Hyperparamètres de RandomForestClassifier (par exemple issus de tuning.py).
+
     Returns:
     RandomForestClassifier: Modèle entraîné.
     """
-    model = RandomForestClassifier()
+    model = RandomForestClassifier(**params)
     model.fit(X_train, y_train)
     return model
 
@@ -78,22 +68,26 @@ def evaluate_model(model, X_test, y_test):
     Returns:
     tuple: (accuracy, precision, recall, f1_score)
     """
-    y_pred = model.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred)
-    recall = recall_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
-    return accuracy, precision, recall, f1
+    # Un seul predict_proba et une seule matrice de confusion pour les quatre métriques
+    _, predicted = positive_scores(model, X_test)
+    metrics = metrics_from_counts(*confusion_counts(y_test, predicted))
+    return tuple(float(metrics[name]) for name in ("accuracy", "precision", "recall", "f1_score"))
 
-def save_model(model, filename):
+def save_model(model, filename, preprocessing=None):
     """
-    Sauvegarde le modèle entraîné.
+    Sauvegarde le modèle entraîné et, si fourni, son prétraitement à côté.
     
     Parameters:
     model (RandomForestClassifier): Modèle entraîné.
     filename (str): Nom du fichier de sauvegarde.
+    preprocessing (FittedPreprocessing): Prétraitement ajusté (optionnel).
     """
+    # Un modèle publié par version (lien symbolique) est remplacé, pas réécrit à travers le lien.
+    if os.path.islink(filename):
+        os.unlink(filename)
     joblib.dump(model, filename)
+    if preprocessing is not None:
+        preprocessing.save(preprocessing_path(filename))
 
 def load_model(filename):
     """
@@ -106,3 +100,18 @@ def load_model(filename):
     RandomForestClassifier: Modèle chargé.
     """
     return joblib.load(filename)
+
+def load_preprocessing(filename):
+    """
+    Charge le prétraitement sauvegardé à côté d'un modèle.
+    
+    Parameters:
+    filename (str): Nom du fichier du modèle.
+    
+    Returns:
+    FittedPreprocessing: Prétraitement ajusté, ou None si le modèle n'en a pas.
+    """
+    path = preprocessing_path(filename)
+    if not os.path.exists(path):
+        return None
+    return FittedPreprocessing.load(path)
@@ -0,0 +1,366 @@
+import os
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from instrumentation import LATENCY_BUCKETS, MODEL_SECONDS, SHADOW_DROPPED, SHADOW_ROWS, HistogramValue
+from model_artifact import is_artifact, read_manifest
+
+
+_fingerprints = weakref.WeakKeyDictionary()
+
+
+def model_key(model):
+    """
+    Version d'un modèle servi : celle de son artefact, sinon l'empreinte de
+    son contenu (calculée une fois), identique d'un worker à l'autre.
+    """
+    version = getattr(model, "version", None)
+    if version:
+        return version
+    fingerprint = _fingerprints.get(model)
+    if fingerprint is None:
+        # Import local : un artefact (toujours versionné) se sert sans joblib.
+        import joblib
+
+        fingerprint = _fingerprints[model] = joblib.hash(model)[:12]
+    return fingerprint
+
+
+def path_version(model_path):
+    """Version d'un modèle sur disque, connue sans le charger."""
+    from serving import model_version
+
+    return read_manifest(model_path)["version"] if is_artifact(model_path) else model_version(model_path)
+
+
+def _churn_probability(model, proba):
+    classes = list(model.classes_)
+    return proba[:, classes.index(1) if 1 in classes else len(classes) - 1]
+
+
+class _VersionStats:
+    """Compteurs d'une version : latence principale, et accord avec la principale quand elle est en ombre."""
+
+    def __init__(self):
+        self.loaded_at = time.time()
+        self.primary_requests = 0
+        self.primary_rows = 0
+        self.primary_latency = HistogramValue(LATENCY_BUCKETS)
+        self.shadow_requests = 0
+        self.shadow_rows = 0
+        self.shadow_agreements = 0
+        self.shadow_probability_diff = 0.0
+        self.shadow_probability_rows = 0
+        self.shadow_errors = 0
+        self.shadow_latency = HistogramValue(LATENCY_BUCKETS)
+
+    def as_dict(self):
+        return {
+            "loaded_at": self.loaded_at,
+            "primary": {
+                "requests": self.primary_requests,
+                "rows": self.primary_rows,
+                "latency_seconds": self.primary_latency.as_dict(),
+                "row_latency_us": self.primary_latency.total / self.primary_rows * 1e6 if self.primary_rows else None,
+            },
+            "shadow": {
+                "requests": self.shadow_requests,
+                "rows": self.shadow_rows,
+                "agreement": self.shadow_agreements / self.shadow_rows if self.shadow_rows else None,
+                "mean_abs_probability_diff": (self.shadow_probability_diff / self.shadow_probability_rows
+                                              if self.shadow_probability_rows else None),
+                "errors": self.shadow_errors,
+                "latency_seconds": self.shadow_latency.as_dict(),
+                "row_latency_us": self.shadow_latency.total / self.shadow_rows * 1e6 if self.shadow_rows else None,
+            },
+        }
+
+
+class ModelRegistry:
+    """
+    Versions du modèle chargées en mémoire : une version principale, qui sert
+    les réponses, et des candidates évaluées en ombre sur le trafic réel.
+
+    `shadow` tire au sort une fraction des lots déjà prédits par la principale
+    et les confie à un pool de threads, sans attendre : la latence de la
+    réponse ne change pas. Chaque candidate score alors le lot ; sa latence et
+    son accord avec la principale (même classe prédite, écart moyen de la
+    probabilité de churn) sont comptés par version. Si trop de lots attendent
+    déjà, le lot n'est pas scoré en ombre (compté dans `dropped`).
+
+    Le pool d'ombre tourne dans le processus de l'API : ses threads partagent
+    le GIL avec ceux des requêtes. Scorer une fraction `shadow_fraction` du
+    trafic avec k candidates ajoute de l'ordre de k × `shadow_fraction` au
+    temps CPU de prédiction ; sous forte charge, c'est autant de latence pour
+    la principale. `shadow_fraction` et `n_workers` (1 par défaut) bornent ce
+    coût.
+
+    `promote` et `rollback` ne font qu'échanger des références vers des
+    modèles déjà chargés et préchauffés. Les artefacts mappés en mémoire
+    (model_artifact.py) partagent leurs pages entre les workers, et une version
+    déjà chargée n'est jamais chargée une seconde fois.
+
+    Parameters:
+    shadow_fraction (float): Part des lots scorés en ombre (0 : aucun) ; partage le CPU et le GIL des requêtes.
+    n_workers (int): Nombre de threads du pool d'ombre.
+    max_pending (int): Nombre maximal de lots en attente de scoring en ombre.
+    max_versions (int): Nombre maximal de versions chargées ; au-delà, la plus ancienne candidate est déchargée.
+    on_promote (callable): Reçoit le modèle devenu principal (installation dans l'API).
+    seed (int): Graine du tirage des lots (optionnel).
+    """
+
+    def __init__(self, shadow_fraction=0.0, n_workers=1, max_pending=1000, max_versions=4, on_promote=None,
+                 seed=None):
+        self.shadow_fraction = shadow_fraction
+        self.max_pending = max_pending
+        self.max_versions = max_versions
+        self.on_promote = on_promote
+        self.dropped = 0
+        self.primary_version = None
+        self.history = []
+        self._models = OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+        # Sérialise les changements de version principale, callback `on_promote`
+        # compris : les modèles sont installés dans l'ordre de `primary_version`.
+        self._promote_lock = threading.RLock()
+        self._pending = 0
+        self._processed = threading.Condition()
+        self._random = random.Random(seed)
+        self._executor = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="shadow")
+
+    @property
+    def primary(self):
+        return self._models.get(self.primary_version)
+
+    def versions(self):
+        return list(self._models)
+
+    def get(self, version):
+        return self._models.get(version)
+
+    def candidates(self):
+        """Versions évaluées en ombre (toutes sauf la principale)."""
+        return [(version, model) for version, model in list(self._models.items()) if version != self.primary_version]
+
+    def _stats_for(self, version):
+        # Une version déchargée pendant une requête en cours n'a plus de statistiques.
+        if version not in self._models:
+            return None
+        stats = self._stats.get(version)
+        if stats is None:
+            stats = self._stats[version] = _VersionStats()
+        return stats
+
+    def add(self, model, primary=False):
+        """
+        Ajoute une version déjà chargée (réutilise celle de même version si
+        elle l'est déjà), et la promeut si demandé ou s'il n'y a pas encore de
+        version principale.
+
+        Returns:
+        str: Version du modèle.
+        """
+        version = model_key(model)
+        # Insertion et promotion d'un bloc : un autre `add` ne peut pas décharger
+        # la version entre les deux.
+        with self._promote_lock:
+            with self._lock:
+                if version not in self._models:
+                    self._models[version] = model
+                    self._stats_for(version)
+                evicted = [name for name in self._models if name not in (version, self.primary_version)]
+                for name in evicted[:max(0, len(self._models) - self.max_versions)]:
+                    self._forget(name)
+            if primary or self.primary_version is None:
+                self.promote(version)
+        return version
+
+    def load(self, model_path, backend="sklearn", primary=False):
+        """
+        Charge (et préchauffe) un modèle depuis le disque, sauf si sa version
+        est déjà chargée.
+
+        Returns:
+        str: Version du modèle.
+        """
+        from serving import load_serving_model, warm_up
+
+        version = path_version(model_path)
+        model = self._models.get(version)
+        if model is None:
+            model = load_serving_model(model_path, backend=backend)
+            warm_up(model)
+        return self.add(model, primary=primary)
+
+    def _forget(self, version):
+        del self._models[version]
+        self._stats.pop(version, None)
+        self.history = [name for name in self.history if name != version]
+
+    def remove(self, version):
+        """Décharge une candidate (la version principale ne peut pas l'être)."""
+        with self._lock:
+            if version == self.primary_version:
+                raise ValueError(f"La version {version} est la version principale : promouvoir une autre version d'abord.")
+            if version not in self._models:
+                raise KeyError(version)
+            self._forget(version)
+
+    def promote(self, version):
+        """Fait de `version` (déjà chargée) la version principale ; l'ancienne reste chargée, en ombre."""
+        self._swap(version, rollback=False)
+
+    def rollback(self):
+        """
+        Revient à la version principale précédente (toujours chargée).
+
+        Returns:
+        str: Version redevenue principale.
+        """
+        with self._promote_lock:
+            with self._lock:
+                if not self.history:
+                    raise ValueError("Aucune version précédente à restaurer.")
+                version = self.history[-1]
+            self._swap(version, rollback=True)
+        return version
+
+    def _swap(self, version, rollback):
+        with self._promote_lock:
+            with self._lock:
+                model = self._models.get(version)
+                if model is None:
+                    raise KeyError(version)
+                if version == self.primary_version:
+                    return
+                if rollback:
+                    self.history.pop()
+                elif self.primary_version is not None:
+                    self.history.append(self.primary_version)
+                self.primary_version = version
+            if self.on_promote is not None:
+                self.on_promote(model)
+
+    def record(self, version, seconds, rows):
+        """Compte la latence d'une prédiction servie par la version principale."""
+        MODEL_SECONDS.observe(seconds, version=version, role="primary")
+        with self._lock:
+            stats = self._stats_for(version)
+            if stats is None:
+                return
+            stats.primary_requests += 1
+            stats.primary_rows += rows
+            stats.primary_latency.observe(seconds)
+
+    def shadow(self, X, predictions, probabilities=None):
+        """
+        Confie éventuellement un lot déjà prédit par la principale au pool d'ombre.
+
+        Parameters:
+        X (np.ndarray): Features brutes (n_lignes, n_features) envoyées à la principale.
+        predictions (np.ndarray): Classes prédites par la principale.
+        probabilities (np.ndarray): Probabilités de churn de la principale (optionnel).
+
+        Returns:
+        bool: True si le lot a été confié au pool.
+        """
+        if self.shadow_fraction <= 0 or len(self._models) < 2 or self._random.random() >= self.shadow_fraction:
+            return False
+        with self._processed:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                SHADOW_DROPPED.inc()
+                return False
+            self._pending += 1
+        try:
+            self._executor.submit(self._score, X, np.asarray(predictions),
+                                  None if probabilities is None else np.asarray(probabilities))
+        except RuntimeError:
+            # Pool arrêté (fermeture de l'API).
+            self._done()
+            return False
+        return True
+
+    def _score(self, X, predictions, probabilities):
+        try:
+            for version, model in self.candidates():
+                start = time.perf_counter()
+                try:
+                    proba = model.predict_proba(X)
+                except Exception:
+                    with self._lock:
+                        stats = self._stats_for(version)
+                        if stats is not None:
+                            stats.shadow_errors += 1
+                    continue
+                seconds = time.perf_counter() - start
+                agree = int((model.classes_.take(np.argmax(proba, axis=1)) == predictions).sum())
+                diff = 0.0 if probabilities is None else float(np.abs(_churn_probability(model, proba) - probabilities).sum())
+                MODEL_SECONDS.observe(seconds, version=version, role="shadow")
+                SHADOW_ROWS.inc(agree, version=version, outcome="agree")
+                SHADOW_ROWS.inc(len(predictions) - agree, version=version, outcome="disagree")
+                with self._lock:
+                    stats = self._stats_for(version)
+                    if stats is None:
+                        continue
+                    stats.shadow_requests += 1
+                    stats.shadow_rows += len(predictions)
+                    stats.shadow_agreements += agree
+                    stats.shadow_probability_diff += diff
+                    stats.shadow_probability_rows += 0 if probabilities is None else len(predictions)
+                    stats.shadow_latency.observe(seconds)
+        finally:
+            self._done()
+
+    def _done(self):
+        with self._processed:
+            self._pending -= 1
+            self._processed.notify_all()
+
+    def flush(self, timeout=None):
+        """Attend que les lots confiés au pool d'ombre soient scorés."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._processed:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._processed.wait(remaining)
+        return True
+
+    def close(self):
+        """Termine les lots en attente puis arrête le pool d'ombre."""
+        self._executor.shutdown(wait=True)
+
+    def report(self):
+        """
+        Returns:
+        dict: primary, history (versions principales précédentes), shadow_fraction,
+              pending, dropped et, par version, son rôle et ses statistiques.
+        """
+        with self._lock:
+            return {
+                "primary": self.primary_version,
+                "history": list(self.history),
+                "shadow_fraction": self.shadow_fraction,
+                "pending": self._pending,
+                "dropped": self.dropped,
+                "versions": {
+                    version: {"role": "primary" if version == self.primary_version else "shadow",
+                              **self._stats_for(version).as_dict()}
+                    for version in self._models
+                },
+            }
+
+
+def within_directory(path, directory):
+    """Vrai si `path` désigne un fichier situé dans `directory` (liens symboliques résolus)."""
+    directory = os.path.realpath(directory)
+    return os.path.commonpath([os.path.realpath(path), directory]) == directory
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def cache_key(features, model_version):
+    """
+    Clé de cache : empreinte du vecteur de features canonique et version du modèle.
+
+    Les features sont converties en float64 contigus (-0.0 normalisé en 0.0),
+    de sorte que [1, 2] et [1.0, 2.0] partagent la même entrée.
+    """
+    canonical = np.ascontiguousarray(np.asarray(features, dtype=np.float64).ravel()) + 0.0
+    digest = hashlib.blake2b(canonical.tobytes(), digest_size=16).hexdigest()
+    return f"{model_version}:{digest}"
+
+
+class SQLiteCacheBackend:
+    """
+    Cache partagé entre les workers d'une même machine, adossé à un fichier
+    SQLite. Substitut local d'un cache réseau (Redis).
+
+    Parameters:
+    path (str): Fichier SQLite partagé.
+    max_size (int): Nombre maximal d'entrées ; les plus anciennes écrites sont évincées.
+    purge_every (int): Nombre d'écritures d'un worker entre deux purges.
+
+    Une lecture n'écrit rien dans le fichier : seules les écritures prennent
+    le verrou d'écriture SQLite partagé par les workers. Les entrées expirées
+    et l'excédent sur `max_size` sont purgés toutes les `purge_every` écritures
+    (via les index sur `expires_at` et `accessed_at`) et non à chaque écriture :
+    entre deux purges, le fichier peut dépasser `max_size` d'au plus
+    `purge_every` entrées par worker.
+    """
+
+    def __init__(self, path, max_size=100000, purge_every=1000):
+        self.path = path
+        self.max_size = max_size
+        self.purge_every = max(1, purge_every)
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS prediction_cache ("
+            "key TEXT PRIMARY KEY, value TEXT, expires_at REAL, accessed_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS prediction_cache_expires_at ON prediction_cache (expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS prediction_cache_accessed_at ON prediction_cache (accessed_at)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT value, expires_at FROM prediction_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] < now:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO prediction_cache VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), None if ttl is None else now + ttl, now),
+        )
+        with self._writes_lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self._purge(conn, now)
+        conn.commit()
+
+    def _purge(self, conn, now):
+        # Les entrées expirées sont purgées à l'écriture, pas à la lecture.
+        conn.execute("DELETE FROM prediction_cache WHERE expires_at < ?", (now,))
+        (size,) = conn.execute("SELECT COUNT(*) FROM prediction_cache").fetchone()
+        if size > self.max_size:
+            conn.execute(
+                "DELETE FROM prediction_cache WHERE key IN ("
+                "SELECT key FROM prediction_cache ORDER BY accessed_at LIMIT ?)",
+                (size - self.max_size,),
+            )
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM prediction_cache")
+        conn.commit()
+
+
+class RedisCacheBackend:
+    """Cache partagé sur Redis (nécessite le paquet `redis`)."""
+
+    def __init__(self, url, prefix="churn:prediction:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self.prefix + key, json.dumps(value), ex=None if ttl is None else max(1, int(ttl)))
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + "*"):
+            self._client.delete(key)
+
+
+def create_backend(url):
+    """Backend partagé à partir d'une URL : `sqlite:///chemin.db` ou `redis://...`."""
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteCacheBackend(url[len("sqlite:///"):])
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        return RedisCacheBackend(url)
+    raise ValueError(f"Backend de cache non supporté : {url}")
+
+
+class PredictionCache:
+    """
+    Cache en mémoire des prédictions, LRU borné avec TTL optionnel.
+
+    La clé inclut la version du modèle : une prédiction faite par un ancien
+    modèle n'est jamais resservie. `invalidate` vide en plus le cache local
+    lorsqu'un nouveau modèle est installé. Un backend partagé optionnel est
+    consulté en cas d'absence locale, pour partager le cache entre workers.
+
+    Parameters:
+    max_size (int): Nombre maximal d'entrées en mémoire.
+    ttl (float): Durée de vie d'une entrée en secondes (None : illimitée).
+    backend: Backend partagé optionnel (SQLiteCacheBackend, RedisCacheBackend).
+    """
+
+    def __init__(self, max_size=10000, ttl=None, backend=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+        self.invalidations = 0
+
+    def get(self, features, model_version):
+        """Retourne la valeur en cache, ou None."""
+        key = cache_key(features, model_version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, features, model_version, value):
+        key = cache_key(features, model_version)
+        self._store(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value, self.ttl)
+
+    def _store(self, key, value):
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Vide le cache local (nouveau modèle installé)."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "shared_backend": type(self.backend).__name__ if self.backend is not None else None,
+            }
+
+
+def create_cache(max_size, ttl=None, backend_url=None):
+    """Cache configuré, ou None si `max_size` vaut 0 (cache désactivé)."""
+    if max_size <= 0:
+        return None
+    return PredictionCache(max_size=max_size, ttl=ttl, backend=create_backend(backend_url))
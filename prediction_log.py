@@ -0,0 +1,278 @@
+import csv
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from batch_writer import BackgroundBatchWriter
+from instrumentation import stage
+from preprocessing import FEATURE_COLUMNS
+
+PREDICTIONS_TABLE = "predictions"
+
+
+def _column_name(feature):
+    return re.sub(r"\W+", "_", feature.strip().lower())
+
+
+# Une colonne typée par feature, dans l'ordre de FEATURE_COLUMNS
+FEATURE_DB_COLUMNS = [_column_name(feature) for feature in FEATURE_COLUMNS]
+INSERT_COLUMNS = FEATURE_DB_COLUMNS + ["prediction", "probability", "created_at"]
+
+
+class SQLitePool:
+    """
+    Substitut local du pool PostgreSQL, adossé à un fichier SQLite.
+
+    Sert aux tests et au développement sans serveur PostgreSQL.
+    """
+
+    dialect = "sqlite"
+    placeholder = "?"
+
+    def __init__(self, path, maxconn=4):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    @contextmanager
+    def connection(self):
+        """Emprunte une connexion ; commit en sortie normale, rollback sur erreur."""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._idle.put(conn)
+
+    def insert_many(self, conn, table, columns, rows):
+        placeholders = ", ".join("?" for _ in columns)
+        conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+    def execute_many(self, conn, sql, rows):
+        conn.executemany(sql, rows)
+
+    def closeall(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class PostgresPool:
+    """Pool de connexions PostgreSQL partagé entre les threads de requêtes."""
+
+    dialect = "postgres"
+    placeholder = "%s"
+
+    def __init__(self, dsn, minconn=1, maxconn=8):
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self._pool = ThreadedConnectionPool(minconn, maxconn, dsn)
+
+    @contextmanager
+    def connection(self):
+        """Emprunte une connexion ; commit en sortie normale, rollback sur erreur."""
+        conn = self._pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.putconn(conn)
+
+    def insert_many(self, conn, table, columns, rows):
+        from psycopg2.extras import execute_values
+
+        with conn.cursor() as cursor:
+            execute_values(cursor, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s", rows, page_size=1000)
+
+    def execute_many(self, conn, sql, rows):
+        from psycopg2.extras import execute_batch
+
+        with conn.cursor() as cursor:
+            execute_batch(cursor, sql, rows, page_size=1000)
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+def create_pool(database_url, maxconn=8):
+    """
+    Crée le pool correspondant à l'URL : `sqlite:///chemin.db` pour le
+    substitut local, sinon une URL PostgreSQL.
+    """
+    if database_url.startswith("sqlite:///"):
+        return SQLitePool(database_url[len("sqlite:///"):], maxconn=maxconn)
+    return PostgresPool(database_url, maxconn=maxconn)
+
+
+def ensure_schema(pool, table=PREDICTIONS_TABLE):
+    """
+    Crée la table des prédictions (une colonne par feature) et ajoute les
+    colonnes typées manquantes à une table créée par une version précédente.
+
+    `label` (churn observé) et `labeled_at` restent NULL jusqu'à ce que le
+    label soit connu (voir `record_labels`) ; l'index sur (labeled_at, id)
+    permet à l'entraînement incrémental de ne lire que les nouvelles lignes.
+    """
+    if pool.dialect == "postgres":
+        serial, real, timestamp = "SERIAL PRIMARY KEY", "DOUBLE PRECISION", "DOUBLE PRECISION"
+    else:
+        serial, real, timestamp = "INTEGER PRIMARY KEY AUTOINCREMENT", "REAL", "REAL"
+    column_types = {name: real for name in FEATURE_DB_COLUMNS}
+    column_types.update({"prediction": "INT", "probability": real, "created_at": timestamp,
+                         "label": "INT", "labeled_at": timestamp})
+
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        columns_sql = ",\n".join(f"    {name} {sql_type}" for name, sql_type in column_types.items())
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} (\n    id {serial},\n{columns_sql}\n)")
+
+        if pool.dialect == "postgres":
+            for name, sql_type in column_types.items():
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {sql_type}")
+        else:
+            existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+            for name, sql_type in column_types.items():
+                if name not in existing:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_labeled_at_idx ON {table} (labeled_at, id)")
+        cursor.close()
+
+
+def record_labels(pool, labels, table=PREDICTIONS_TABLE):
+    """
+    Enregistre le churn observé de prédictions déjà journalisées.
+
+    Parameters:
+    pool: Pool de connexions (PostgresPool ou SQLitePool).
+    labels (iterable): Couples (id de la prédiction, label 0/1).
+
+    Returns:
+    int: Nombre de lignes mises à jour demandées.
+    """
+    labeled_at = time.time()
+    rows = [(int(label), labeled_at, int(prediction_id)) for prediction_id, label in labels]
+    p = pool.placeholder
+    with pool.connection() as conn:
+        pool.execute_many(conn, f"UPDATE {table} SET label = {p}, labeled_at = {p} WHERE id = {p}", rows)
+    return len(rows)
+
+
+_LABEL_VALUES = {"0": 0, "1": 1, "false": 0, "true": 1}
+
+
+def record_labels_csv(pool, path, table=PREDICTIONS_TABLE, chunksize=10000):
+    """
+    Enregistre le churn observé lu dans un CSV à colonnes `id` et `label`.
+
+    `id` est celui de la ligne de la table des prédictions ; `label` vaut
+    0/1 ou False/True (comme la colonne Churn des jeux d'entraînement). Le
+    fichier est lu en flux et appliqué par lots de `chunksize` lignes.
+
+    Returns:
+    int: Nombre de labels enregistrés.
+    """
+    total = 0
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        missing = {"id", "label"} - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"Colonnes manquantes dans {path} : {sorted(missing)}")
+        batch = []
+        for line, row in enumerate(reader, start=2):
+            label = _LABEL_VALUES.get(row["label"].strip().lower())
+            if label is None:
+                raise ValueError(f"{path}, ligne {line} : label invalide {row['label']!r} (0/1 ou False/True attendu).")
+            batch.append((int(row["id"]), label))
+            if len(batch) >= chunksize:
+                total += record_labels(pool, batch, table)
+                batch = []
+        if batch:
+            total += record_labels(pool, batch, table)
+    return total
+
+
+class PredictionLogWriter(BackgroundBatchWriter):
+    """
+    Journalisation des prédictions en écriture différée (write-behind).
+
+    `log` dépose la ligne dans un tampon borné et rend la main aussitôt. Un
+    thread de fond insère les lignes en masse (une transaction par lot) dès que
+    `batch_size` lignes sont en attente ou que `flush_interval` secondes se sont
+    écoulées. Quand le tampon est plein, `log` attend au plus `put_timeout`
+    secondes (contre-pression) puis abandonne la ligne et la comptabilise.
+
+    Parameters:
+    pool: Pool de connexions (PostgresPool ou SQLitePool).
+    max_buffer (int): Nombre maximal de lignes en attente d'écriture.
+    batch_size (int): Nombre de lignes par insertion en masse.
+    flush_interval (float): Délai maximal (s) avant l'écriture d'un lot incomplet.
+    put_timeout (float): Attente maximale (s) de `log` quand le tampon est plein.
+    """
+
+    def __init__(self, pool, table=PREDICTIONS_TABLE, max_buffer=10000, batch_size=500,
+                 flush_interval=1.0, put_timeout=0.5):
+        super().__init__(batch_size, flush_interval, max_buffer, thread_name="prediction-log-writer")
+        self.pool = pool
+        self.table = table
+        self.put_timeout = put_timeout
+        # `dropped` est incrémenté par les threads des requêtes.
+        self._dropped_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._ensure_thread()
+
+    def log(self, features, prediction, probability=None):
+        """
+        Ajoute une prédiction au tampon d'écriture.
+
+        Returns:
+        bool: False si la ligne a été abandonnée (tampon plein).
+        """
+        row = tuple(float(value) for value in features) + (
+            int(prediction),
+            None if probability is None else float(probability),
+            time.time(),
+        )
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return False
+
+    def stats(self):
+        return {
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+    def _write(self, batch):
+        try:
+            with stage("prediction_log", "background", "bulk_insert"), self.pool.connection() as conn:
+                self.pool.insert_many(conn, self.table, INSERT_COLUMNS, batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception:
+            # La journalisation ne doit jamais faire échouer les prédictions.
+            self.failed += len(batch)
@@ -0,0 +1,193 @@
+import json
+import os
+
+import numpy as np
+
+# pandas n'est importé que par les fonctions qui manipulent des DataFrames :
+# le chemin de prédiction (transform_array) démarre sans lui.
+
+# Version du format de l'artefact de prétraitement
+PREPROCESSING_VERSION = 1
+
+COLUMNS_TO_DROP = ['State', 'Area code', 'Total day minutes',
+                   'Total eve minutes', 'Total night minutes', 'Total intl minutes']
+CATEGORICAL_COLUMNS = ['International plan', 'Voice mail plan']
+TARGET_COLUMN = 'Churn'
+NUMERICAL_COLUMNS = ['Account length', 'Number vmail messages', 'Total day calls',
+                     'Total day charge', 'Total eve calls', 'Total eve charge',
+                     'Total night calls', 'Total night charge', 'Total intl calls',
+                     'Total intl charge', 'Customer service calls']
+
+# Ordre des colonnes produites par prepare_data, c'est-à-dire l'ordre des
+# features attendu par le modèle entraîné.
+FEATURE_COLUMNS = ['Account length', 'International plan', 'Voice mail plan',
+                   'Number vmail messages', 'Total day calls', 'Total day charge',
+                   'Total eve calls', 'Total eve charge', 'Total night calls',
+                   'Total night charge', 'Total intl calls', 'Total intl charge',
+                   'Customer service calls']
+
+
+def preprocessing_path(model_path):
+    """
+    Chemin de l'artefact de prétraitement associé à un fichier modèle, à côté
+    du fichier réel (celui de la version publiée si le modèle est un lien).
+    """
+    return os.path.splitext(os.path.realpath(model_path))[0] + ".preprocessing.json"
+
+
+def _encode(values, classes):
+    """Équivalent de LabelEncoder.transform pour des classes déjà apprises."""
+    import pandas as pd
+
+    codes = pd.Index(classes).get_indexer(values)
+    if (codes < 0).any():
+        unknown = sorted(set(pd.unique(values[codes < 0])), key=str)
+        raise ValueError(f"Valeurs inconnues : {unknown}")
+    return codes
+
+
+class FittedPreprocessing:
+    """
+    Prétraitement ajusté sur l'ensemble d'entraînement.
+
+    Contient les colonnes supprimées, l'encodage des variables catégorielles et
+    de la cible, l'ordre des features et les paramètres du MinMaxScaler. Le
+    scaling est ramené à une transformation affine `X * scale + offset` sur
+    toutes les features (identité pour les colonnes non normalisées), appliquée
+    en une opération NumPy pour une ligne comme pour un lot.
+
+    `drift_reference` conserve les histogrammes des colonnes numériques de
+    l'entraînement, comparés au trafic servi par `drift.DriftMonitor`.
+    """
+
+    def __init__(self, feature_columns, numerical_columns, columns_to_drop, encodings,
+                 target_classes, data_min, data_max, scale, offset, version=PREPROCESSING_VERSION,
+                 drift_reference=None):
+        self.feature_columns = list(feature_columns)
+        self.numerical_columns = list(numerical_columns)
+        self.columns_to_drop = list(columns_to_drop)
+        self.encodings = {col: list(classes) for col, classes in encodings.items()}
+        self.target_classes = list(target_classes)
+        self.data_min = np.asarray(data_min, dtype=np.float64)
+        self.data_max = np.asarray(data_max, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.version = version
+        self.drift_reference = drift_reference
+
+    @classmethod
+    def fit(cls, data, drift_data=None):
+        """
+        Ajuste le prétraitement sur un DataFrame brut (schéma des CSV d'origine),
+        avec les histogrammes de référence du suivi de dérive.
+
+        Parameters:
+        data (pd.DataFrame): Données d'entraînement uniquement.
+        drift_data (pd.DataFrame): Données des histogrammes de référence (par défaut
+            `data`), par exemple l'entraînement avant suppression des outliers : le
+            trafic servi, lui, n'est pas filtré.
+
+        Returns:
+        FittedPreprocessing: Prétraitement ajusté.
+        """
+        encodings = {col: np.unique(data[col]).tolist() for col in CATEGORICAL_COLUMNS}
+        target_classes = np.unique(data[TARGET_COLUMN]).tolist()
+        values = data[NUMERICAL_COLUMNS].to_numpy(dtype=np.float64)
+        reference = values if drift_data is None else drift_data[NUMERICAL_COLUMNS].to_numpy(dtype=np.float64)
+        from drift import reference_histograms
+
+        return cls.from_statistics(np.nanmin(values, axis=0), np.nanmax(values, axis=0), encodings, target_classes,
+                                   reference_histograms(reference))
+
+    @classmethod
+    def from_statistics(cls, data_min, data_max, encodings, target_classes, drift_reference=None):
+        """
+        Construit le prétraitement à partir de statistiques déjà calculées
+        (min/max des colonnes numériques, classes des variables catégorielles).
+
+        Les paramètres de scaling sont calculés exactement comme MinMaxScaler.
+        """
+        data_min = np.asarray(data_min, dtype=np.float64)
+        data_max = np.asarray(data_max, dtype=np.float64)
+        data_range = data_max - data_min
+        # Colonne constante : MinMaxScaler utilise une amplitude de 1.
+        data_range[data_range < 10 * np.finfo(data_range.dtype).eps] = 1.0
+
+        scale = np.ones(len(FEATURE_COLUMNS))
+        offset = np.zeros(len(FEATURE_COLUMNS))
+        idx = [FEATURE_COLUMNS.index(col) for col in NUMERICAL_COLUMNS]
+        scale[idx] = 1.0 / data_range
+        offset[idx] = 0.0 - data_min * scale[idx]
+
+        return cls(FEATURE_COLUMNS, NUMERICAL_COLUMNS, COLUMNS_TO_DROP, encodings, target_classes,
+                   data_min, data_max, scale, offset, drift_reference=drift_reference)
+
+    def encode_frame(self, data):
+        """
+        Supprime les colonnes inutiles et encode les variables catégorielles (sans scaling).
+        """
+        data = data.drop(columns=self.columns_to_drop, errors='ignore')
+        for col, classes in self.encodings.items():
+            data[col] = _encode(data[col], classes)
+        if TARGET_COLUMN in data.columns:
+            data[TARGET_COLUMN] = _encode(data[TARGET_COLUMN], self.target_classes)
+        return data
+
+    def transform_array(self, X):
+        """
+        Applique le scaling à un tableau (n_lignes, n_features) dans l'ordre de `feature_columns`.
+
+        Les variables catégorielles doivent déjà être encodées (0/1).
+        """
+        X = np.asarray(X, dtype=np.float64)
+        return X * self.scale + self.offset
+
+    def transform_frame(self, data):
+        """
+        Transforme un DataFrame brut en features prêtes pour le modèle.
+
+        Returns:
+        tuple: (X, y) où y vaut None si la colonne cible est absente.
+        """
+        import pandas as pd
+
+        data = self.encode_frame(data)
+        X = pd.DataFrame(
+            self.transform_array(data[self.feature_columns].to_numpy(dtype=np.float64)),
+            columns=self.feature_columns,
+            index=data.index,
+        )
+        y = data[TARGET_COLUMN] if TARGET_COLUMN in data.columns else None
+        return X, y
+
+    def to_dict(self):
+        params = {
+            "version": self.version,
+            "feature_columns": self.feature_columns,
+            "numerical_columns": self.numerical_columns,
+            "columns_to_drop": self.columns_to_drop,
+            "encodings": self.encodings,
+            "target_classes": self.target_classes,
+            "data_min": self.data_min.tolist(),
+            "data_max": self.data_max.tolist(),
+            "scale": self.scale.tolist(),
+            "offset": self.offset.tolist(),
+        }
+        if self.drift_reference is not None:
+            params["drift_reference"] = self.drift_reference
+        return params
+
+    @classmethod
+    def from_dict(cls, params):
+        if params.get("version") != PREPROCESSING_VERSION:
+            raise ValueError(f"Version de prétraitement non supportée : {params.get('version')}")
+        return cls(**params)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
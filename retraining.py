@@ -0,0 +1,365 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentation import DURATIONS
+from incremental import incremental_state_path
+from preprocessing import FEATURE_COLUMNS, FittedPreprocessing, preprocessing_path
+from model_artifact import is_artifact, load_artifact, new_version_directory, publish, save_artifact
+from serving import build_serving_model, model_version
+
+# Étapes d'un réentraînement et avancement associé
+STAGES = {
+    "queued": 0.0,
+    "training": 0.1,
+    "validating": 0.8,
+    "installing": 0.9,
+    "succeeded": 1.0,
+    "failed": 1.0,
+}
+
+
+def _write_temp(target_path, write):
+    """
+    Écrit un fichier temporaire voisin de `target_path` (à côté du lien, pas
+    dans une version publiée), synchronisé sur disque.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(target_path)),
+        prefix="." + os.path.basename(target_path) + ".",
+        suffix=".tmp",
+    )
+    os.close(fd)
+    try:
+        write(tmp_path)
+        # S'assurer que l'artefact est sur disque avant le renommage atomique.
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path
+
+
+def run_training(train_path, test_path, model_path):
+    """
+    Prépare les données, entraîne et évalue un modèle, puis écrit le modèle et
+    son prétraitement dans des fichiers temporaires voisins de `model_path`.
+
+    Exécutée dans un processus du pool : rien n'est partagé avec l'API.
+
+    Returns:
+    tuple: (fichier temporaire du modèle, fichier temporaire du prétraitement, métriques)
+    """
+    # Import local : scikit-learn n'est chargé par l'API qu'au premier réentraînement.
+    from dataset_cache import cached_prepare_data, default_cache
+    from model_pipeline1 import PREPARE_DATA_CONFIG, prepare_data, train_model, evaluate_model, save_model
+
+    X_train, X_test, y_train, y_test, preprocessing, _ = cached_prepare_data(
+        prepare_data, train_path, test_path, PREPARE_DATA_CONFIG, default_cache()
+    )
+    model = train_model(X_train, y_train)
+    accuracy, precision, recall, f1 = evaluate_model(model, X_test, y_test)
+
+    tmp_model = _write_temp(model_path, lambda path: save_model(model, path))
+    try:
+        tmp_preprocessing = _write_temp(model_path, preprocessing.save)
+    except BaseException:
+        os.unlink(tmp_model)
+        raise
+
+    metrics = {"accuracy": accuracy, "precision": precision, "recall": recall, "f1_score": f1}
+    return tmp_model, tmp_preprocessing, {name: float(value) for name, value in metrics.items()}
+
+
+def run_incremental_training(model_path, database_url, n_new_trees=20, max_estimators=None, min_rows=100,
+                             limit=None):
+    """
+    Met à jour le modèle avec les seules prédictions étiquetées depuis le
+    dernier entraînement incrémental (filigrane), sans relire les CSV d'origine.
+
+    Le modèle actuel est d'abord évalué sur ces lignes (évaluation avant
+    apprentissage). Les min/max du scaling sont étendus avec le delta, les
+    seuils des arbres existants réexprimés dans le nouveau scaling, puis
+    `n_new_trees` arbres sont entraînés sur le delta et les plus anciens
+    retirés au-delà de `max_estimators`. Le coût dépend de la taille du delta,
+    pas de l'historique.
+
+    Exécutée dans un processus du pool ; le modèle, le prétraitement et le
+    nouveau filigrane sont écrits dans des fichiers temporaires, installés
+    ensemble par l'appelant (voir `install_version`).
+
+    Parameters:
+    model_path (str): Modèle scikit-learn sauvegardé avec son prétraitement.
+    database_url (str): Base des prédictions (PostgreSQL ou sqlite:///chemin.db).
+    n_new_trees (int): Nombre d'arbres ajoutés.
+    max_estimators (int): Taille maximale de la forêt (optionnelle).
+    min_rows (int): Nombre minimal de nouvelles lignes étiquetées.
+    limit (int): Nombre maximal de lignes lues en une fois (optionnel).
+
+    Returns:
+    tuple: (modèle temporaire, prétraitement temporaire, métriques, état temporaire)
+    """
+    import pandas as pd
+
+    from incremental import fetch_labeled_rows, grow_forest, load_state, rescale_forest, save_state, update_preprocessing
+    from model_pipeline1 import evaluate_model, load_model, load_preprocessing, save_model
+    from prediction_log import create_pool, ensure_schema
+
+    if is_artifact(model_path):
+        raise ValueError("L'entraînement incrémental nécessite le modèle scikit-learn (.pkl), pas un artefact.")
+    # Lien résolu une seule fois : modèle, prétraitement et filigrane viennent de la même version.
+    source = os.path.realpath(model_path)
+    preprocessing = load_preprocessing(source)
+    if preprocessing is None:
+        raise ValueError("Le modèle n'a pas de prétraitement sauvegardé : réentraînez-le complètement.")
+
+    state = load_state(source)
+    pool = create_pool(database_url, maxconn=1)
+    try:
+        ensure_schema(pool)
+        X_raw, y, watermark = fetch_labeled_rows(pool, state["watermark"], limit=limit)
+    finally:
+        pool.closeall()
+    if len(y) < min_rows:
+        raise ValueError(f"{len(y)} nouvelles lignes étiquetées depuis le dernier entraînement, "
+                         f"{min_rows} au minimum.")
+
+    def frame(fitted):
+        return pd.DataFrame(fitted.transform_array(X_raw), columns=fitted.feature_columns)
+
+    model = load_model(source)
+    accuracy, precision, recall, f1 = evaluate_model(model, frame(preprocessing), y)
+
+    updated = update_preprocessing(preprocessing, X_raw)
+    rescale_forest(model, preprocessing, updated)
+    retired = grow_forest(model, frame(updated), y, n_new_trees, max_estimators)
+
+    tmp_model = _write_temp(model_path, lambda path: save_model(model, path))
+    tmp_paths = [tmp_model]
+    try:
+        tmp_paths.append(_write_temp(model_path, updated.save))
+        new_state = {"watermark": watermark, "runs": state["runs"] + 1, "rows": state["rows"] + len(y)}
+        tmp_paths.append(_write_temp(model_path, lambda path: save_state(new_state, path)))
+    except BaseException:
+        for path in tmp_paths:
+            os.unlink(path)
+        raise
+
+    metrics = {"accuracy": accuracy, "precision": precision, "recall": recall, "f1_score": f1}
+    metrics = {name: float(value) for name, value in metrics.items()}
+    metrics.update({"rows": len(y), "n_estimators": len(model.estimators_), "retired_trees": retired})
+    return tmp_paths[0], tmp_paths[1], metrics, tmp_paths[2]
+
+
+def install_version(model_path, tmp_model, tmp_preprocessing, tmp_state=None):
+    """
+    Installe ensemble un modèle, son prétraitement et son filigrane
+    incrémental : les fichiers temporaires sont déplacés dans un nouveau
+    répertoire de version, puis `model_path` le désigne en une seule opération
+    atomique (voir model_artifact.publish). Un lecteur ne peut donc pas
+    associer le nouveau prétraitement à l'ancien modèle.
+
+    Sans `tmp_state`, la version n'a pas de filigrane : il repart de zéro
+    après un réentraînement complet.
+    """
+    version_dir = new_version_directory(model_path)
+    installed = os.path.join(version_dir, os.path.basename(model_path))
+    try:
+        os.rename(tmp_model, installed)
+        os.rename(tmp_preprocessing, preprocessing_path(installed))
+        if tmp_state is not None:
+            os.rename(tmp_state, incremental_state_path(installed))
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    publish(model_path, version_dir, os.path.basename(model_path))
+
+
+def validate_model(model):
+    """
+    Vérifie qu'un modèle rechargé depuis le disque est utilisable pour servir.
+
+    Lève ValueError sinon.
+    """
+    if not hasattr(model, "predict_proba"):
+        raise ValueError("Le modèle ne fournit pas predict_proba.")
+    n_features = getattr(model, "n_features_in_", len(FEATURE_COLUMNS))
+    if n_features != len(FEATURE_COLUMNS):
+        raise ValueError(f"Le modèle attend {n_features} features au lieu de {len(FEATURE_COLUMNS)}.")
+    proba = model.predict_proba(np.zeros((1, n_features)))
+    if proba.shape[0] != 1 or not np.isfinite(proba).all():
+        raise ValueError("Le modèle produit des probabilités invalides.")
+
+
+class RetrainJob:
+    """État d'un réentraînement lancé en arrière-plan."""
+
+    def __init__(self, train_path, test_path, mode="full"):
+        self.id = uuid.uuid4().hex
+        self.train_path = train_path
+        self.test_path = test_path
+        self.mode = mode
+        self.status = "queued"
+        self.metrics = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    def as_dict(self):
+        return {
+            "job_id": self.id,
+            "mode": self.mode,
+            "status": self.status,
+            "progress": STAGES[self.status],
+            "metrics": self.metrics,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "duration_s": (self.finished_at or time.time()) - self.created_at,
+        }
+
+
+class RetrainManager:
+    """
+    Exécute les réentraînements dans un pool de processus et installe le
+    nouveau modèle à chaud.
+
+    Le modèle est écrit dans un fichier temporaire, rechargé et validé, puis
+    publié avec son prétraitement en une seule opération atomique
+    (`install_version`). Le callback `install` n'est appelé qu'ensuite :
+    jusque-là, l'ancien modèle continue de servir.
+
+    Un job "full" réentraîne sur les CSV et remet à zéro le filigrane
+    incrémental ; un job "incremental" (voir `run_incremental_training`)
+    n'apprend que les prédictions étiquetées depuis le précédent.
+
+    Parameters:
+    model_path (str): Chemin de l'artefact servi.
+    install (callable): Reçoit le modèle validé pour l'installer en mémoire.
+    backend (str): Moteur d'inférence du modèle installé ("sklearn" ou "flat").
+    max_jobs (int): Nombre de jobs terminés conservés pour consultation.
+    database_url (str): Base des prédictions lue par les jobs incrémentaux.
+    incremental_options (dict): Arguments de `run_incremental_training` (n_new_trees, max_estimators, min_rows).
+    """
+
+    def __init__(self, model_path, install, backend="sklearn", max_jobs=100, database_url=None,
+                 incremental_options=None):
+        self.model_path = model_path
+        self.install = install
+        self.backend = backend
+        self.max_jobs = max_jobs
+        self.database_url = database_url
+        self.incremental_options = incremental_options or {}
+        self.jobs = OrderedDict()
+        self._executor = None
+        self._tasks = set()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # "spawn" : un fork d'un serveur multi-threadé peut hériter de verrous tenus.
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def running_job(self):
+        return next((job for job in self.jobs.values() if not job.done), None)
+
+    def submit(self, train_path, test_path, mode="full"):
+        """
+        Lance un réentraînement en arrière-plan sur la boucle asyncio courante.
+
+        Returns:
+        RetrainJob: Le job créé.
+        """
+        if mode not in ("full", "incremental"):
+            raise ValueError(f"Mode de réentraînement inconnu : {mode}")
+        if mode == "incremental" and not self.database_url:
+            raise ValueError("L'entraînement incrémental nécessite une base de prédictions (DATABASE_URL).")
+        job = RetrainJob(train_path, test_path, mode)
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.max_jobs:
+            oldest = next(iter(self.jobs.values()))
+            if not oldest.done:
+                break
+            self.jobs.popitem(last=False)
+
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job):
+        from model_pipeline1 import load_model
+
+        loop = asyncio.get_running_loop()
+        tmp_paths = []
+        try:
+            job.status = "training"
+            tmp_state = None
+            if job.mode == "incremental":
+                tmp_model, tmp_preprocessing, job.metrics, tmp_state = await loop.run_in_executor(
+                    self._get_executor(), functools.partial(
+                        run_incremental_training, self.model_path, self.database_url, **self.incremental_options)
+                )
+                tmp_paths = [tmp_model, tmp_preprocessing, tmp_state]
+            else:
+                tmp_model, tmp_preprocessing, job.metrics = await loop.run_in_executor(
+                    self._get_executor(), run_training, job.train_path, job.test_path, self.model_path
+                )
+                tmp_paths = [tmp_model, tmp_preprocessing]
+
+            job.status = "validating"
+            new_model = await asyncio.to_thread(
+                lambda: build_serving_model(
+                    load_model(tmp_model), FittedPreprocessing.load(tmp_preprocessing), self.backend,
+                    model_version(tmp_model, tmp_preprocessing),
+                )
+            )
+            await asyncio.to_thread(validate_model, new_model)
+
+            job.status = "installing"
+            if is_artifact(self.model_path):
+                # Artefact mappé : réécrit puis rechargé depuis le disque, comme les autres workers.
+                state_path = incremental_state_path(self.model_path)
+                await asyncio.to_thread(save_artifact, new_model.estimator, self.model_path, new_model.preprocessing)
+                new_model = await asyncio.to_thread(load_artifact, self.model_path)
+                if os.path.exists(state_path):
+                    os.unlink(state_path)
+            else:
+                # Le filigrane suit le modèle installé : remplacé après un incrémental, absent après un complet.
+                install_version(self.model_path, tmp_model, tmp_preprocessing, tmp_state)
+                tmp_paths = []
+            self.install(new_model)
+            job.status = "succeeded"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            for path in tmp_paths:
+                if os.path.exists(path):
+                    os.unlink(path)
+            job.finished_at = time.time()
+            DURATIONS.observe(job.finished_at - job.created_at, operation=f"retrain_{job.status}")
+
+    async def wait(self):
+        """Attend la fin des jobs en cours."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
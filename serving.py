@@ -0,0 +1,121 @@
+import hashlib
+import os
+import time
+
+import numpy as np
+
+from fast_forest import FlatForest
+from model_artifact import is_artifact, load_artifact
+from preprocessing import FEATURE_COLUMNS, preprocessing_path
+
+# Moteurs d'inférence disponibles : l'estimateur scikit-learn tel quel, ou la
+# forêt aplatie (FlatForest), plus rapide sur une ligne ou un petit lot.
+BACKENDS = ("sklearn", "flat")
+
+
+class ServingModel:
+    """
+    Modèle servi par les API : estimateur entraîné et prétraitement ajusté.
+
+    Les entrées sont des features brutes dans l'ordre de FEATURE_COLUMNS (variables
+    catégorielles encodées en 0/1). Le prétraitement est appliqué en une seule
+    transformation affine vectorisée, pour une ligne comme pour un lot. Sans
+    prétraitement (ancien modèle), les features sont transmises telles quelles.
+
+    Parameters:
+    estimator: Modèle scikit-learn entraîné.
+    preprocessing (FittedPreprocessing): Prétraitement ajusté (optionnel).
+    version (str): Identifiant de l'artefact servi (voir `model_version`).
+    """
+
+    def __init__(self, estimator, preprocessing=None, version=None):
+        self.estimator = estimator
+        self.preprocessing = preprocessing
+        self.version = version
+        self.classes_ = estimator.classes_
+        if preprocessing is not None:
+            self.n_features_in_ = len(preprocessing.feature_columns)
+        else:
+            self.n_features_in_ = getattr(estimator, "n_features_in_", None)
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.preprocessing is None:
+            return X
+        return self.preprocessing.transform_array(X)
+
+    def predict_proba(self, X):
+        return self.estimator.predict_proba(self.transform(X))
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def warm_up(model, n_rows=64):
+    """
+    Prédictions à blanc (une ligne, puis un lot) avant d'annoncer l'API prête :
+    la première vraie requête ne paie ni les imports paresseux de scikit-learn,
+    ni les allocations initiales, ni le chargement des premières pages d'un
+    artefact mappé.
+
+    Returns:
+    float: Durée du préchauffage (secondes).
+    """
+    start = time.perf_counter()
+    X = np.zeros((n_rows, model.n_features_in_ or len(FEATURE_COLUMNS)))
+    model.predict(X[:1])
+    model.predict_proba(X)
+    return time.perf_counter() - start
+
+
+def model_version(model_path, preprocessing_file=None):
+    """
+    Version d'un artefact : empreinte SHA-256 (12 caractères) du modèle et de son prétraitement.
+    """
+    digest = hashlib.sha256()
+    for path in (model_path, preprocessing_file or preprocessing_path(model_path)):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def build_serving_model(estimator, preprocessing=None, backend="sklearn", version=None):
+    """
+    Assemble le modèle servi avec le moteur d'inférence demandé.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Moteur d'inférence inconnu : {backend} (attendu : {BACKENDS})")
+    if backend == "flat":
+        estimator = FlatForest.from_sklearn(estimator)
+    return ServingModel(estimator, preprocessing, version)
+
+
+def load_serving_model(model_path, backend="sklearn"):
+    """
+    Charge un modèle et le prétraitement sauvegardé à côté de lui.
+
+    Un répertoire d'artefact (voir model_artifact.py) est chargé mappé en
+    mémoire, toujours avec la forêt aplatie.
+
+    Parameters:
+    model_path (str): Chemin du modèle sauvegardé ou répertoire d'artefact.
+    backend (str): "sklearn" ou "flat" (forêt aplatie, probabilités identiques).
+
+    Returns:
+    ServingModel: Modèle prêt à servir.
+    """
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(model_path)
+    if is_artifact(model_path):
+        return load_artifact(model_path)
+    # Import local : un artefact aplati se sert sans scikit-learn ni joblib.
+    from model_pipeline1 import load_model, load_preprocessing
+
+    # Lien d'une version publiée résolu une seule fois : le modèle et son prétraitement viennent de la même version.
+    model_path = os.path.realpath(model_path)
+
+    return build_serving_model(
+        load_model(model_path), load_preprocessing(model_path), backend, model_version(model_path)
+    )
@@ -0,0 +1,193 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from drift import DRIFT_BINS
+from preprocessing import (CATEGORICAL_COLUMNS, FEATURE_COLUMNS, NUMERICAL_COLUMNS,
+                           TARGET_COLUMN, FittedPreprocessing)
+
+# Colonnes lues dans les CSV (les colonnes supprimées ne sont jamais chargées)
+# et types fixes : pas d'inférence de type différente d'un bloc à l'autre.
+CSV_DTYPES = {col: np.float64 for col in NUMERICAL_COLUMNS}
+CSV_DTYPES.update({col: object for col in CATEGORICAL_COLUMNS})
+CSV_DTYPES[TARGET_COLUMN] = bool
+
+
+def _read_chunks(path, chunksize):
+    return pd.read_csv(path, usecols=list(CSV_DTYPES), dtype=CSV_DTYPES, chunksize=chunksize)
+
+
+def _merge_counts(acc, counts):
+    if acc is None:
+        return counts
+    return acc.add(counts, fill_value=0)
+
+
+def quantile_from_counts(counts, q):
+    """
+    Quantile exact (interpolation linéaire, comme pandas/NumPy) à partir d'une
+    table de comptage valeur -> effectif.
+
+    Les tables de comptage se fusionnent bloc par bloc et leur taille ne dépend
+    que du nombre de valeurs distinctes, pas directement du nombre de lignes
+    (mais sans borne pour une colonne à valeurs continues).
+    """
+    counts = counts.sort_index()
+    values = counts.index.to_numpy(dtype=np.float64)
+    cumulative = np.cumsum(counts.to_numpy(dtype=np.int64))
+    n = cumulative[-1]
+
+    virtual = n * q - q
+    previous = np.floor(virtual)
+    gamma = virtual - previous
+    lo = int(previous)
+    hi = min(lo + 1, n - 1)
+    a = values[np.searchsorted(cumulative, lo, side="right")]
+    b = values[np.searchsorted(cumulative, hi, side="right")]
+
+    # Même interpolation que numpy.percentile(method="linear").
+    diff = b - a
+    if gamma >= 0.5:
+        return b - diff * (1 - gamma)
+    return a + diff * gamma
+
+
+def _iqr_bounds(path, chunksize):
+    """Passe 1 : bornes IQR de chaque colonne numérique (quartiles exacts)."""
+    counts = {col: None for col in NUMERICAL_COLUMNS}
+    for chunk in _read_chunks(path, chunksize):
+        for col in NUMERICAL_COLUMNS:
+            counts[col] = _merge_counts(counts[col], chunk[col].value_counts())
+
+    lower, upper = [], []
+    for col in NUMERICAL_COLUMNS:
+        q1 = quantile_from_counts(counts[col], 0.25)
+        q3 = quantile_from_counts(counts[col], 0.75)
+        iqr = q3 - q1
+        lower.append(q1 - 1.5 * iqr)
+        upper.append(q3 + 1.5 * iqr)
+    return np.array(lower), np.array(upper)
+
+
+def _outlier_mask(chunk, bounds):
+    if bounds is None:
+        return np.ones(len(chunk), dtype=bool)
+    values = chunk[NUMERICAL_COLUMNS].to_numpy()
+    lower, upper = bounds
+    return ((values >= lower) & (values <= upper)).all(axis=1)
+
+
+def _drift_reference(counts, bins=DRIFT_BINS):
+    """
+    Histogrammes de référence du suivi de dérive (voir drift.reference_histograms),
+    calculés sur les tables de comptage au lieu des colonnes complètes.
+    """
+    quantiles = np.linspace(0, 1, bins + 1)[1:-1]
+    edges, histograms = [], []
+    for col in NUMERICAL_COLUMNS:
+        column_edges = np.unique([quantile_from_counts(counts[col], q) for q in quantiles])
+        values = counts[col].index.to_numpy(dtype=np.float64)
+        histogram = np.bincount(np.searchsorted(column_edges, values, side="right"),
+                                weights=counts[col].to_numpy(dtype=np.float64), minlength=len(column_edges) + 1)
+        edges.append(column_edges.tolist())
+        histograms.append(histogram.astype(np.int64).tolist())
+    return {"columns": list(NUMERICAL_COLUMNS), "edges": edges, "counts": histograms}
+
+
+def _fit_statistics(path, chunksize, bounds):
+    """
+    Passe 2 : min/max, classes et nombre de lignes retenues de l'entraînement,
+    histogrammes de référence de toutes ses lignes.
+    """
+    data_min = np.full(len(NUMERICAL_COLUMNS), np.inf)
+    data_max = np.full(len(NUMERICAL_COLUMNS), -np.inf)
+    categories = {col: set() for col in CATEGORICAL_COLUMNS}
+    targets = set()
+    counts = {col: None for col in NUMERICAL_COLUMNS}
+    n_rows = 0
+    for chunk in _read_chunks(path, chunksize):
+        # Histogrammes de référence sur toutes les lignes : le trafic servi n'est pas filtré.
+        for col in NUMERICAL_COLUMNS:
+            counts[col] = _merge_counts(counts[col], chunk[col].value_counts())
+        chunk = chunk[_outlier_mask(chunk, bounds)]
+        if chunk.empty:
+            continue
+        values = chunk[NUMERICAL_COLUMNS].to_numpy()
+        data_min = np.fmin(data_min, np.nanmin(values, axis=0))
+        data_max = np.fmax(data_max, np.nanmax(values, axis=0))
+        for col in CATEGORICAL_COLUMNS:
+            categories[col].update(chunk[col].unique())
+        targets.update(chunk[TARGET_COLUMN].unique())
+        n_rows += len(chunk)
+
+    encodings = {col: sorted(values) for col, values in categories.items()}
+    preprocessing = FittedPreprocessing.from_statistics(data_min, data_max, encodings, sorted(targets),
+                                                        _drift_reference(counts))
+    return preprocessing, n_rows
+
+
+def _count_rows(path, chunksize):
+    return sum(len(chunk) for chunk in pd.read_csv(path, usecols=[TARGET_COLUMN], chunksize=chunksize))
+
+
+def _write_split(path, chunksize, preprocessing, bounds, n_rows, output_dir, prefix):
+    """Dernière passe : transforme chaque bloc et l'écrit dans des .npy mappés en mémoire."""
+    X_path = os.path.join(output_dir, f"X_{prefix}.npy")
+    y_path = os.path.join(output_dir, f"y_{prefix}.npy")
+    X_out = np.lib.format.open_memmap(X_path, mode="w+", dtype=np.float64, shape=(n_rows, len(FEATURE_COLUMNS)))
+    y_out = np.lib.format.open_memmap(y_path, mode="w+", dtype=np.int64, shape=(n_rows,))
+
+    position = 0
+    for chunk in _read_chunks(path, chunksize):
+        chunk = chunk[_outlier_mask(chunk, bounds)]
+        X, y = preprocessing.transform_frame(chunk)
+        X_out[position:position + len(chunk)] = X.to_numpy()
+        y_out[position:position + len(chunk)] = y.to_numpy()
+        position += len(chunk)
+
+    X_out.flush()
+    y_out.flush()
+    del X_out, y_out
+    return np.load(X_path, mmap_mode="r"), np.load(y_path, mmap_mode="r")
+
+
+def prepare_data_streaming(train_path, test_path, output_dir, chunksize=100_000, outliers=None):
+    """
+    Variante hors-mémoire de prepare_data pour des fichiers trop volumineux.
+
+    Les CSV sont lus par blocs avec des types fixes, en plusieurs passes sur
+    l'entraînement : quartiles exacts par tables de comptage fusionnables (avec
+    outliers="iqr"), puis min/max, classes et histogrammes de référence, puis
+    écriture. Le test est lu deux fois (comptage des lignes, écriture). À
+    l'écriture, chaque bloc est supprimé/encodé, filtré par un seul masque
+    booléen combiné et normalisé avant d'être écrit dans des fichiers .npy.
+
+    La mémoire utilisée dépend de `chunksize` et du nombre de valeurs
+    distinctes de chaque colonne numérique (tables de comptage, quelques
+    milliers pour ces colonnes : comptes entiers et montants au centime), pas
+    du nombre de lignes. Une colonne à valeurs continues ferait croître ces
+    tables avec les données.
+
+    Parameters:
+    train_path (str): Chemin du fichier CSV d'entraînement.
+    test_path (str): Chemin du fichier CSV de test.
+    output_dir (str): Répertoire des fichiers X_train.npy, y_train.npy, X_test.npy, y_test.npy.
+    chunksize (int): Nombre de lignes lues à la fois.
+    outliers (str): None (aucun filtrage, comme model_pipeline1.prepare_data) ou
+        "iqr" (équivalent à remove_outliers(method="iqr_mask") sur l'entraînement).
+
+    Returns:
+    tuple: (X_train, X_test, y_train, y_test, preprocessing), tableaux mappés en lecture seule
+    """
+    if outliers not in (None, "iqr"):
+        raise ValueError(f"Méthode de suppression des outliers inconnue : {outliers}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    bounds = _iqr_bounds(train_path, chunksize) if outliers == "iqr" else None
+    preprocessing, n_train = _fit_statistics(train_path, chunksize, bounds)
+    n_test = _count_rows(test_path, chunksize)
+
+    X_train, y_train = _write_split(train_path, chunksize, preprocessing, bounds, n_train, output_dir, "train")
+    X_test, y_test = _write_split(test_path, chunksize, preprocessing, None, n_test, output_dir, "test")
+    return X_train, X_test, y_train, y_test, preprocessing
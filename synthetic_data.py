@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+# Schéma des fichiers churn-bigml-*.csv
+CSV_COLUMNS = ['State', 'Account length', 'Area code', 'International plan',
+               'Voice mail plan', 'Number vmail messages', 'Total day minutes',
+               'Total day calls', 'Total day charge', 'Total eve minutes',
+               'Total eve calls', 'Total eve charge', 'Total night minutes',
+               'Total night calls', 'Total night charge', 'Total intl minutes',
+               'Total intl calls', 'Total intl charge', 'Customer service calls',
+               'Churn']
+
+STATES = ['AK', 'AL', 'AR', 'AZ', 'CA', 'CO', 'CT', 'DC', 'DE', 'FL', 'GA', 'HI',
+          'IA', 'ID', 'IL', 'IN', 'KS', 'KY', 'LA', 'MA', 'MD', 'ME', 'MI', 'MN',
+          'MO', 'MS', 'MT', 'NC', 'ND', 'NE', 'NH', 'NJ', 'NM', 'NV', 'NY', 'OH',
+          'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VA', 'VT', 'WA',
+          'WI', 'WV', 'WY']
+
+
+def make_churn_frame(n_rows, seed=0):
+    """
+    Génère une table d'abonnés synthétique au schéma churn-bigml.
+
+    Les distributions (durées, nombre d'appels, tarifs par minute, taux de churn
+    d'environ 15 %) imitent celles des fichiers d'origine.
+
+    Parameters:
+    n_rows (int): Nombre de lignes à générer.
+    seed (int): Graine du générateur aléatoire.
+
+    Returns:
+    pd.DataFrame: Table au format des fichiers CSV d'origine.
+    """
+    rng = np.random.default_rng(seed)
+    intl_plan = rng.random(n_rows) < 0.10
+    vmail_plan = rng.random(n_rows) < 0.27
+
+    def minutes(mean, std):
+        return np.round(np.clip(rng.normal(mean, std, n_rows), 0, None), 1)
+
+    def calls(mean, std):
+        return np.clip(np.round(rng.normal(mean, std, n_rows)), 0, None).astype(np.int64)
+
+    day, eve, night, intl = minutes(180, 54), minutes(200, 50), minutes(200, 50), minutes(10, 2.8)
+    service_calls = rng.poisson(1.56, n_rows)
+
+    score = -2.4 + 0.025 * (day - 180) + 2.2 * intl_plan - 1.0 * vmail_plan + 2.0 * (service_calls >= 4)
+    churn = rng.random(n_rows) < 1.0 / (1.0 + np.exp(-score))
+
+    return pd.DataFrame({
+        'State': rng.choice(STATES, n_rows),
+        'Account length': np.clip(np.round(rng.normal(101, 40, n_rows)), 1, None).astype(np.int64),
+        'Area code': rng.choice([408, 415, 510], n_rows),
+        'International plan': np.where(intl_plan, 'Yes', 'No'),
+        'Voice mail plan': np.where(vmail_plan, 'Yes', 'No'),
+        'Number vmail messages': np.where(vmail_plan, rng.integers(4, 52, n_rows), 0),
+        'Total day minutes': day,
+        'Total day calls': calls(100, 20),
+        'Total day charge': np.round(day * 0.17, 2),
+        'Total eve minutes': eve,
+        'Total eve calls': calls(100, 20),
+        'Total eve charge': np.round(eve * 0.085, 2),
+        'Total night minutes': night,
+        'Total night calls': calls(100, 20),
+        'Total night charge': np.round(night * 0.045, 2),
+        'Total intl minutes': intl,
+        'Total intl calls': rng.poisson(4.5, n_rows),
+        'Total intl charge': np.round(intl * 0.27, 2),
+        'Customer service calls': service_calls,
+        'Churn': churn,
+    }, columns=CSV_COLUMNS)
+
+
+def write_churn_csv(path, n_rows, seed=0, chunksize=100_000):
+    """
+    Écrit une table synthétique dans un fichier CSV, par blocs pour borner la mémoire.
+
+    Parameters:
+    path (str): Fichier CSV de sortie.
+    n_rows (int): Nombre total de lignes.
+    seed (int): Graine du générateur aléatoire (chaque bloc en dérive une).
+    chunksize (int): Nombre de lignes générées à la fois.
+    """
+    written = 0
+    block = 0
+    while written < n_rows or block == 0:
+        n = min(chunksize, n_rows - written)
+        make_churn_frame(n, seed=seed * 1_000_003 + block).to_csv(
+            path, mode='w' if block == 0 else 'a', header=block == 0, index=False
+        )
+        written += n
+        block += 1
+    return path
@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from model_pipeline1 import FEATURE_COLUMNS
+
+
+class TestPredictBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.X = rng.random((200, len(FEATURE_COLUMNS)))
+        y = (cls.X[:, 0] > 0.5).astype(int)
+        cls.estimator = RandomForestClassifier(n_estimators=10, random_state=0).fit(cls.X, y)
+
+    def setUp(self):
+        self._saved = (app_module.model, app_module.model_loaded, app_module.MAX_BATCH_SIZE)
+        app_module.model = self.estimator
+        app_module.model_loaded = True
+        self.client = TestClient(app_module.app)
+
+    def tearDown(self):
+        app_module.model, app_module.model_loaded, app_module.MAX_BATCH_SIZE = self._saved
+
+    def test_rows_match_vectorized_predict(self):
+        rows = self.X[:25]
+        response = self.client.post("/predict/batch", json={"rows": rows.tolist()})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["predictions"], self.estimator.predict(rows).tolist())
+        np.testing.assert_allclose(body["probabilities"], self.estimator.predict_proba(rows)[:, 1])
+
+    def test_columns_equivalent_to_rows(self):
+        rows = self.X[:10]
+        columns = {name: rows[:, i].tolist() for i, name in enumerate(FEATURE_COLUMNS)}
+        by_rows = self.client.post("/predict/batch", json={"rows": rows.tolist()}).json()
+        by_columns = self.client.post("/predict/batch", json={"columns": columns}).json()
+        self.assertEqual(by_rows, by_columns)
+
+    def test_rejects_ragged_and_wrong_width(self):
+        ragged = {"rows": [[0.1] * len(FEATURE_COLUMNS), [0.1]]}
+        self.assertEqual(self.client.post("/predict/batch", json=ragged).status_code, 400)
+        narrow = {"rows": [[0.1, 0.2]]}
+        self.assertEqual(self.client.post("/predict/batch", json=narrow).status_code, 400)
+
+    def test_rejects_non_numeric_values(self):
+        row = [0.1] * len(FEATURE_COLUMNS)
+        for bad in ({"a": 1}, [1, 2], None):
+            body = {"rows": [row, [bad] + row[1:]]}
+            self.assertEqual(self.client.post("/predict/batch", json=body).status_code, 400)
+        columns = {name: [0.1] for name in FEATURE_COLUMNS}
+        columns[FEATURE_COLUMNS[0]] = [{"a": 1}]
+        self.assertEqual(self.client.post("/predict/batch", json={"columns": columns}).status_code, 400)
+
+    def test_max_batch_size(self):
+        app_module.MAX_BATCH_SIZE = 5
+        response = self.client.post("/predict/batch", json={"rows": self.X[:6].tolist()})
+        self.assertEqual(response.status_code, 413)
+        # Vérifié sur la liste reçue, avant de convertir ses valeurs.
+        response = self.client.post("/predict/batch", json={"rows": [["x"]] * 6})
+        self.assertEqual(response.status_code, 413)
+        columns = {name: self.X[:6, i].tolist() for i, name in enumerate(FEATURE_COLUMNS)}
+        self.assertEqual(self.client.post("/predict/batch", json={"columns": columns}).status_code, 413)
+
+    def test_single_prediction_without_churn_class(self):
+        estimator = RandomForestClassifier(n_estimators=2, random_state=0).fit(self.X[:10], np.zeros(10, dtype=int))
+        app_module.model = estimator
+        response = self.client.post("/predict", json={"features": self.X[0].tolist()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"prediction": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks import suite
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def test_run_writes_every_stage(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, "bench.json")
+            suite.run([2000], output, n_single=5, n_requests=5)
+            with open(output) as f:
+                report = json.load(f)
+        stages = {entry["stage"] for entry in report["results"]}
+        self.assertEqual(stages, {
+            "prepare_data", "remove_outliers[zscore]", "remove_outliers[iqr]", "remove_outliers[iqr_mask]",
+            "train_model", "evaluate_model", "save_model", "load_model",
+            "predict_single", "predict_batch", "api_predict",
+        })
+        self.assertTrue(all(entry["size"] == 2000 and entry["seconds"] > 0 for entry in report["results"]))
+        self.assertIn("sklearn", report["meta"])
+
+    def test_compare_flags_regressions(self):
+        baseline = {"results": [
+            {"size": 1000, "stage": "train_model", "rows": 1000, "seconds": 1.0, "peak_mb": 10.0},
+            {"size": 1000, "stage": "predict_batch", "rows": 250, "seconds": 0.001, "peak_mb": 1.0},
+        ]}
+        current = {"results": [
+            {"size": 1000, "stage": "train_model", "rows": 1000, "seconds": 1.1, "peak_mb": 20.0},
+            # Trop court pour être comparé en temps.
+            {"size": 1000, "stage": "predict_batch", "rows": 250, "seconds": 0.003, "peak_mb": 1.0},
+            {"size": 5000, "stage": "train_model", "rows": 5000, "seconds": 9.0, "peak_mb": 50.0},
+        ]}
+        regressions = suite.compare(baseline, current, tolerance=0.2, memory_tolerance=0.2)
+        self.assertEqual([(r["stage"], r["metric"]) for r in regressions], [("train_model", "peak_mb")])
+        self.assertEqual(suite.compare(baseline, baseline), [])
+
+    def test_compare_command_exit_code(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = []
+            for name, seconds in (("base.json", 1.0), ("slow.json", 2.0)):
+                path = os.path.join(tmpdir, name)
+                with open(path, "w") as f:
+                    json.dump({"results": [{"size": 1, "stage": "s", "rows": 1, "seconds": seconds,
+                                            "peak_mb": None}]}, f)
+                paths.append(path)
+            self.assertEqual(suite.main(["compare", paths[0], paths[0]]), 0)
+            self.assertEqual(suite.main(["compare", paths[0], paths[1]]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
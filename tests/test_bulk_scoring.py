@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from bulk_scoring import score_file
+from model_pipeline1 import prepare_data, save_model, train_model
+from preprocessing import FEATURE_COLUMNS
+from serving import load_serving_model
+from synthetic_data import make_churn_frame, write_churn_csv
+
+
+class TestBulkScoring(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        train = write_churn_csv(os.path.join(cls.tmpdir, "train.csv"), 2000, seed=0)
+        X_train, _, y_train, _, preprocessing = prepare_data(train, train, return_preprocessing=True)
+        cls.model_path = os.path.join(cls.tmpdir, "churn_model.pkl")
+        save_model(train_model(X_train, y_train, n_estimators=10, random_state=0), cls.model_path, preprocessing)
+
+        cls.frame = make_churn_frame(5000, seed=1)
+        cls.input_path = os.path.join(cls.tmpdir, "extract.csv")
+        cls.frame.to_csv(cls.input_path, index=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def expected(self):
+        model = load_serving_model(self.model_path)
+        raw = model.preprocessing.encode_frame(self.frame)[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        return model.predict(raw), model.predict_proba(raw)[:, 1]
+
+    def test_parallel_scoring_keeps_input_order(self):
+        output = os.path.join(self.tmpdir, "scores.csv")
+        chunks = []
+        stats = score_file(self.model_path, self.input_path, output, chunksize=700, n_workers=2,
+                           id_column="State", on_chunk=chunks.append)
+        self.assertEqual((stats["rows"], stats["chunks"]), (5000, 8))
+        self.assertEqual([chunk["chunk"] for chunk in chunks], list(range(8)))
+        self.assertEqual(sum(chunk["rows"] for chunk in chunks), 5000)
+        self.assertGreater(stats["rows_per_second"], 0)
+
+        scores = pd.read_csv(output, keep_default_na=False)
+        predictions, probabilities = self.expected()
+        self.assertEqual(list(scores.columns), ["State", "row", "prediction", "churn_probability"])
+        self.assertEqual(scores["row"].tolist(), list(range(5000)))
+        self.assertEqual(scores["State"].tolist(), self.frame["State"].tolist())
+        np.testing.assert_array_equal(scores["prediction"], predictions)
+        np.testing.assert_allclose(scores["churn_probability"], probabilities)
+
+    def test_model_without_preprocessing_is_rejected(self):
+        legacy_path = os.path.join(self.tmpdir, "legacy.pkl")
+        joblib.dump(joblib.load(self.model_path), legacy_path)
+        with self.assertRaises(ValueError):
+            score_file(legacy_path, self.input_path, os.path.join(self.tmpdir, "legacy.csv"), n_workers=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
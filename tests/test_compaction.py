@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from compaction import compact_model
+from fast_forest import FlatForest
+from model_artifact import load_artifact, save_artifact
+from model_pipeline1 import prepare_data
+from synthetic_data import write_churn_csv
+
+
+def truncated_proba(model, X, max_depth):
+    """Référence : probabilités du nœud de chaque chemin situé à `max_depth` (ou de la feuille, si moins profonde)."""
+    proba = np.zeros((len(X), len(model.classes_)))
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        paths = estimator.decision_path(X.astype(np.float32))
+        for i in range(len(X)):
+            path = paths.indices[paths.indptr[i]:paths.indptr[i + 1]]
+            node = path[min(max_depth, len(path) - 1)]
+            proba[i] += tree.value[node, 0] / tree.value[node, 0].sum()
+    return proba / len(model.estimators_)
+
+
+class TestCompaction(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        train_path = write_churn_csv(os.path.join(cls.tmpdir, "train.csv"), 3000, seed=1)
+        test_path = write_churn_csv(os.path.join(cls.tmpdir, "test.csv"), 1000, seed=2)
+        X_train, X_test, y_train, cls.y_test, cls.preprocessing = prepare_data(
+            train_path, test_path, return_preprocessing=True)
+        cls.X_test = X_test.to_numpy()
+        cls.model = RandomForestClassifier(n_estimators=30, random_state=0).fit(X_train.to_numpy(), y_train)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_depth_and_tree_truncation(self):
+        full = FlatForest.from_sklearn(self.model)
+        deep = FlatForest.from_sklearn(self.model, max_depth=1000)
+        np.testing.assert_array_equal(deep.predict_proba(self.X_test), full.predict_proba(self.X_test))
+
+        shallow = FlatForest.from_sklearn(self.model, n_estimators=10, max_depth=4)
+        self.assertEqual((shallow.n_estimators, shallow.max_depth), (10, 4))
+        self.assertLessEqual(len(shallow.feature), 10 * (2 ** 5 - 1))
+        small = RandomForestClassifier()
+        small.estimators_, small.classes_ = self.model.estimators_[:10], self.model.classes_
+        np.testing.assert_allclose(shallow.predict_proba(self.X_test[:200]),
+                                   truncated_proba(small, self.X_test[:200], 4), rtol=1e-12)
+
+    def test_compact_dtypes_keep_the_same_leaves(self):
+        flat = FlatForest.from_sklearn(self.model, max_depth=10)
+        compact = flat.compact()
+        self.assertEqual((compact.threshold.dtype, compact.value.dtype, compact.feature.dtype, compact.left.dtype),
+                         (np.float32, np.float32, np.int16, np.int16))
+        self.assertLessEqual(compact.nbytes, flat.nbytes / 2)
+        np.testing.assert_array_equal(compact.apply(self.X_test), flat.apply(self.X_test))
+        np.testing.assert_allclose(compact.predict_proba(self.X_test), flat.predict_proba(self.X_test), atol=1e-6)
+
+        directory = os.path.join(self.tmpdir, "compact_artifact")
+        save_artifact(compact, directory, self.preprocessing)
+        loaded = load_artifact(directory).estimator
+        self.assertEqual(loaded.left.dtype, np.int16)
+        np.testing.assert_array_equal(loaded.predict_proba(self.X_test), compact.predict_proba(self.X_test))
+
+    def test_smallest_candidate_within_tolerance_is_chosen(self):
+        result = compact_model(self.model, self.X_test, self.y_test, self.preprocessing,
+                               tree_counts=(5, 15), depths=(4, 8, None), f1_tolerance=0.05,
+                               recall_tolerance=0.05, latency_rows=20)
+        self.assertEqual(len(result.candidates), 9)
+        self.assertTrue(result.best["within_tolerance"])
+        eligible = [c["artifact_bytes"] for c in result.candidates if c["within_tolerance"]]
+        self.assertEqual(result.best["artifact_bytes"], min(eligible))
+        self.assertLess(result.best["artifact_bytes"], result.baseline["artifact_bytes"])
+        self.assertGreater(result.baseline["pickle_bytes"], 0)
+        self.assertEqual(result.forest.n_estimators, result.best["n_estimators"])
+        for key in ("load_ms", "latency_us", "batch_latency_us", "delta_f1", "delta_recall"):
+            self.assertIn(key, result.best)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import DatasetCache, cached_prepare_data, dataset_key
+from model_pipeline1 import PREPARE_DATA_CONFIG, prepare_data
+from synthetic_data import write_churn_csv
+
+
+class CountingPrepare:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return prepare_data(*args, **kwargs)
+
+
+class TestDatasetCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.train = os.path.join(self.tmpdir, "train.csv")
+        self.test = os.path.join(self.tmpdir, "test.csv")
+        write_churn_csv(self.train, 500, seed=0)
+        write_churn_csv(self.test, 100, seed=1)
+        self.cache = DatasetCache(os.path.join(self.tmpdir, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_hit_returns_identical_memory_mapped_data(self):
+        prepare = CountingPrepare()
+        cold = cached_prepare_data(prepare, self.train, self.test, PREPARE_DATA_CONFIG, self.cache)
+        warm = cached_prepare_data(prepare, self.train, self.test, PREPARE_DATA_CONFIG, self.cache)
+        self.assertEqual((cold[-1], warm[-1], prepare.calls), ("miss", "hit", 1))
+        for expected, actual in zip(cold[:4], warm[:4]):
+            np.testing.assert_array_equal(np.asarray(expected), np.asarray(actual))
+        pd.testing.assert_index_equal(cold[0].columns, warm[0].columns)
+        self.assertEqual(cold[4].to_dict(), warm[4].to_dict())
+        self.assertIsInstance(np.load(os.path.join(self.cache.directory, os.listdir(self.cache.directory)[0],
+                                                   "X_train.npy"), mmap_mode="r"), np.memmap)
+
+    def test_key_depends_on_content_and_config(self):
+        key = dataset_key((self.train, self.test), PREPARE_DATA_CONFIG)
+        self.assertNotEqual(key, dataset_key((self.train, self.test), {"pipeline": "other"}))
+        copy = os.path.join(self.tmpdir, "copy.csv")
+        shutil.copy(self.train, copy)
+        self.assertEqual(key, dataset_key((copy, self.test), PREPARE_DATA_CONFIG))
+        with open(copy, "a") as f:
+            f.write("\n")
+        self.assertNotEqual(key, dataset_key((copy, self.test), PREPARE_DATA_CONFIG))
+
+    def test_changed_prepare_data_source_misses(self):
+        def prepare_v1(*args, **kwargs):
+            return prepare_data(*args, **kwargs)
+
+        def prepare_v2(*args, **kwargs):
+            # Même configuration, corps différent : l'entrée de v1 ne doit pas servir.
+            return prepare_data(*args, **kwargs)
+
+        statuses = [cached_prepare_data(prepare, self.train, self.test, PREPARE_DATA_CONFIG, self.cache)[-1]
+                    for prepare in (prepare_v1, prepare_v2, prepare_v1)]
+        self.assertEqual(statuses, ["miss", "miss", "hit"])
+
+    def test_size_bounded_eviction(self):
+        result = prepare_data(self.train, self.test, return_preprocessing=True)
+        self.cache.put("a", *result)
+        entry_size = self.cache.entries()[0][1]
+        self.cache.max_bytes = int(entry_size * 2.5)
+        self.cache.put("b", *result)
+        os.utime(os.path.join(self.cache.directory, "a"), (0, 0))
+        os.utime(os.path.join(self.cache.directory, "b"), (1, 1))
+        self.cache.put("c", *result)
+        self.assertEqual(sorted(key for key, _, _ in self.cache.entries()), ["b", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import threading
+import unittest
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from drift import DriftMonitor, ks_statistic, population_stability_index, reference_histograms
+from preprocessing import FEATURE_COLUMNS, NUMERICAL_COLUMNS, FittedPreprocessing
+from serving import ServingModel
+from synthetic_data import make_churn_frame
+
+
+def served_rows(n_rows, seed, preprocessing):
+    """Lignes telles qu'envoyées à l'API : features brutes encodées, dans l'ordre de FEATURE_COLUMNS."""
+    return preprocessing.encode_frame(make_churn_frame(n_rows, seed=seed))[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+
+class TestDriftStatistics(unittest.TestCase):
+    def test_same_distribution_is_stable_and_shift_is_detected(self):
+        values = make_churn_frame(5000, seed=0)[NUMERICAL_COLUMNS].to_numpy(dtype=np.float64)
+        reference = reference_histograms(values)
+        expected = np.array(reference["counts"][0], dtype=np.float64)
+        same = np.bincount(np.searchsorted(reference["edges"][0], values[:2500, 0], side="right"),
+                           minlength=len(expected))
+        shifted = np.bincount(np.searchsorted(reference["edges"][0], values[:2500, 0] + 40, side="right"),
+                              minlength=len(expected))
+
+        self.assertEqual(len(reference["counts"]), len(NUMERICAL_COLUMNS))
+        self.assertLess(population_stability_index(expected, same), 0.02)
+        self.assertGreater(population_stability_index(expected, shifted), 0.5)
+        self.assertLess(ks_statistic(expected, same), 0.05)
+        self.assertGreater(ks_statistic(expected, shifted), 0.3)
+
+    def test_reference_is_saved_with_the_preprocessing(self):
+        preprocessing = FittedPreprocessing.fit(make_churn_frame(1000, seed=0))
+        restored = FittedPreprocessing.from_dict(preprocessing.to_dict())
+        self.assertEqual(restored.drift_reference, preprocessing.drift_reference)
+        legacy = preprocessing.to_dict()
+        del legacy["drift_reference"]
+        self.assertIsNone(FittedPreprocessing.from_dict(legacy).drift_reference)
+
+
+class TestDriftMonitor(unittest.TestCase):
+    def setUp(self):
+        self.preprocessing = FittedPreprocessing.fit(make_churn_frame(5000, seed=0))
+        self.signals = []
+        self.monitor = DriftMonitor(self.preprocessing.drift_reference, min_rows=500, on_drift=self.signals.append)
+
+    def tearDown(self):
+        self.monitor.close()
+
+    def test_signal_is_raised_once_then_rearmed_by_reset(self):
+        for row in served_rows(1000, 1, self.preprocessing):
+            self.monitor.observe(row.reshape(1, -1))
+        self.monitor.flush(5)
+        report = self.monitor.report()
+        self.assertEqual((report["rows"], report["drift"], self.signals), (1000, False, []))
+
+        shifted = served_rows(1000, 2, self.preprocessing)
+        shifted[:, FEATURE_COLUMNS.index("Customer service calls")] += 3
+        self.monitor.observe(shifted)
+        self.monitor.observe(shifted)
+        self.monitor.flush(5)
+        report = self.monitor.report()
+        self.assertTrue(report["drift"])
+        self.assertTrue(report["features"]["Customer service calls"]["drifted"])
+        self.assertFalse(report["features"]["Total day calls"]["drifted"])
+        self.assertEqual(len(self.signals), 1)
+
+        self.monitor.reset()
+        self.assertEqual((self.monitor.report()["rows"], self.monitor.signalled), (0, False))
+        self.monitor.observe(shifted)
+        self.monitor.flush(5)
+        self.assertEqual(len(self.signals), 2)
+
+    def test_memory_is_bounded_by_features_and_bins(self):
+        monitor = DriftMonitor(self.preprocessing.drift_reference, half_life_rows=1000)
+        try:
+            X = served_rows(2000, 3, self.preprocessing)
+            shape = monitor._counts.shape
+            for _ in range(20):
+                self.assertTrue(monitor.observe(X))
+                monitor.flush(5)
+            self.assertFalse(monitor.observe(np.zeros((1, 3))))
+            self.assertEqual(monitor._counts.shape, shape)
+            self.assertEqual(monitor.dropped, 0)
+            self.assertLessEqual(shape[1], 10)
+            self.assertEqual(monitor.rows, 40000)
+            # Décroissance : l'effectif pondéré reste de l'ordre de la demi-vie et du dernier lot.
+            self.assertLess(monitor._counts[0].sum(), 3000)
+        finally:
+            monitor.close()
+
+    def test_pending_rows_are_bounded(self):
+        monitor = DriftMonitor(self.preprocessing.drift_reference, max_pending_rows=500)
+        try:
+            X = served_rows(2000, 4, self.preprocessing)
+            # Lot trop grand : sous-échantillonné, seule la copie de 500 lignes attend.
+            self.assertTrue(monitor.observe(X))
+            self.assertLessEqual(monitor._pending_rows, 500)
+            monitor.flush(5)
+            self.assertEqual((monitor.rows, monitor.dropped, monitor._pending_rows), (500, 1500, 0))
+        finally:
+            monitor.close()
+
+
+class TestDriftEndpoint(unittest.TestCase):
+    def setUp(self):
+        frame = make_churn_frame(3000, seed=0)
+        self.preprocessing = FittedPreprocessing.fit(frame)
+        X, y = self.preprocessing.transform_frame(frame)
+        estimator = RandomForestClassifier(n_estimators=5, random_state=0).fit(X.to_numpy(), y)
+        self._saved = (app_module.model, app_module.model_loaded, app_module.drift_monitor,
+                       app_module.DRIFT_OPTIONS, app_module.DRIFT_RETRAIN_MODE, app_module.retrain_manager.submit)
+        app_module.drift_monitor = None
+        app_module.DRIFT_OPTIONS = dict(app_module.DRIFT_OPTIONS, min_rows=200)
+        self.submitted = threading.Event()
+        app_module.DRIFT_RETRAIN_MODE = "incremental"
+        app_module.retrain_manager.submit = lambda *args: self.submitted.set()
+        app_module._install_model(ServingModel(estimator, self.preprocessing))
+
+    def tearDown(self):
+        app_module.drift_monitor.close()
+        (app_module.model, app_module.model_loaded, app_module.drift_monitor,
+         app_module.DRIFT_OPTIONS, app_module.DRIFT_RETRAIN_MODE, app_module.retrain_manager.submit) = self._saved
+
+    def test_batch_traffic_updates_the_report_and_signals_retrain(self):
+        rows = served_rows(300, 1, self.preprocessing)
+        rows[:, FEATURE_COLUMNS.index("Total day charge")] *= 2
+        with TestClient(app_module.app) as client:
+            self.assertEqual(client.post("/predict/batch", json={"rows": rows.tolist()}).status_code, 200)
+            app_module.drift_monitor.flush(5)
+            report = client.get("/drift").json()
+            self.assertTrue(report["enabled"])
+            self.assertEqual(report["rows"], 300)
+            self.assertTrue(report["features"]["Total day charge"]["drifted"])
+            self.assertTrue(report["retrain_signal"])
+            self.assertTrue(self.submitted.wait(5))
+            self.assertIn('churn_drift_detected 1', client.get("/metrics").text)
+
+
+if __name__ == "__main__":
+    unittest.main()
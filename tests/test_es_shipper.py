@@ -0,0 +1,208 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from es_shipper import ElasticsearchShipper
+
+ES_HEADERS = {"X-Elastic-Product": "Elasticsearch", "Content-Type": "application/json"}
+
+
+class StubElasticsearch(ThreadingHTTPServer):
+    """Serveur HTTP local qui imite l'API bulk d'Elasticsearch et garde les documents reçus."""
+
+    def __init__(self):
+        self.documents = []
+        self.bulk_requests = 0
+        self.reject = {}  # valeur de "i" -> statut du refus
+        super().__init__(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, body):
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        for name, value in ES_HEADERS.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._reply({"version": {"number": "9.0.0"}, "tagline": "You Know, for Search"})
+
+    def do_POST(self):
+        lines = self.rfile.read(int(self.headers["Content-Length"])).decode().splitlines()
+        operations = [json.loads(line) for line in lines if line.strip()]
+        items, errors = [], False
+        for action, document in zip(operations[::2], operations[1::2]):
+            status = self.server.reject.get(document.get("i"))
+            if status:
+                items.append({"index": {"_index": action["index"]["_index"], "status": status,
+                                        "error": {"type": "mapper_parsing_exception"}}})
+                errors = True
+            else:
+                self.server.documents.append((action["index"]["_index"], document))
+                items.append({"index": {"_index": action["index"]["_index"], "status": 201}})
+        self.server.bulk_requests += 1
+        self._reply({"took": 1, "errors": errors, "items": items})
+
+    do_PUT = do_POST
+
+
+class TestElasticsearchShipper(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.spool = os.path.join(self.tmpdir, "spool.jsonl")
+        self.server = StubElasticsearch()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def shipper(self, hosts=None, **kwargs):
+        kwargs.setdefault("flush_interval", 60)
+        return ElasticsearchShipper(hosts or self.server.url, spool_path=self.spool, request_timeout=2, **kwargs)
+
+    def test_creating_the_shipper_does_not_connect(self):
+        shipper = self.shipper()
+        self.assertIsNone(shipper._client)
+        self.assertIsNone(shipper._thread)
+        self.assertEqual(self.server.bulk_requests, 0)
+
+    def test_ships_in_bulk_by_size(self):
+        shipper = self.shipper(batch_size=50)
+        for i in range(120):
+            self.assertTrue(shipper.ship({"i": i}))
+        deadline = time.monotonic() + 5
+        while shipper.sent < 100 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(shipper.sent, 100)
+        self.assertEqual(self.server.bulk_requests, 2)
+        shipper.close()
+        self.assertEqual([doc["i"] for _, doc in self.server.documents], list(range(120)))
+        self.assertEqual({index for index, _ in self.server.documents}, {"mlflow-metrics"})
+
+    def test_flushes_by_interval(self):
+        shipper = self.shipper(flush_interval=0.1)
+        shipper.ship({"i": 0}, index="other")
+        deadline = time.monotonic() + 5
+        while shipper.sent < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.documents, [("other", {"i": 0})])
+        shipper.close()
+
+    def test_ship_does_not_wait_for_a_down_cluster(self):
+        shipper = self.shipper(hosts="http://127.0.0.1:9", batch_size=10)
+        start = time.perf_counter()
+        for i in range(1000):
+            shipper.ship({"i": i})
+        self.assertLess(time.perf_counter() - start, 1.0)
+        shipper.close()
+        self.assertEqual(shipper.sent, 0)
+        self.assertEqual(shipper.pending_spool(), 1000)
+
+    def test_failed_batches_are_spooled_then_replayed(self):
+        down = self.shipper(hosts="http://127.0.0.1:9")
+        for i in range(30):
+            down.ship({"i": i})
+        down.close()
+        self.assertEqual(down.failed_requests, 1)
+        self.assertEqual(down.pending_spool(), 30)
+
+        # Nouveau run : le spool part avant les nouveaux documents.
+        up = self.shipper()
+        up.ship({"i": 30})
+        up.close()
+        self.assertEqual(up.replayed, 30)
+        self.assertEqual([doc["i"] for _, doc in self.server.documents], list(range(31)))
+        self.assertEqual(up.pending_spool(), 0)
+
+    def test_interrupted_replay_is_resumed(self):
+        # `.replaying` laissé par un run interrompu, plus un spool plus récent.
+        with open(self.spool + ".replaying", "w") as f:
+            for i in range(3):
+                f.write(json.dumps({"_index": "mlflow-metrics", "doc": {"i": i}}) + "\n")
+            f.write('{"_index": "mlflow-me')
+        with open(self.spool, "w") as f:
+            f.write(json.dumps({"_index": "mlflow-metrics", "doc": {"i": 3}}) + "\n")
+        shipper = self.shipper()
+        self.assertEqual(shipper.pending_spool(), 5)
+        self.assertEqual(shipper.replay(), 4)
+        self.assertEqual([doc["i"] for _, doc in self.server.documents], [0, 1, 2, 3])
+        self.assertFalse(os.path.exists(self.spool + ".replaying"))
+        self.assertEqual(shipper.pending_spool(), 0)
+
+    def test_close_timeout_spools_the_buffer(self):
+        shipper = self.shipper(batch_size=5)
+        release = threading.Event()
+        original = shipper._write
+        shipper._write = lambda batch: (release.wait(), original(batch))
+        for i in range(12):
+            shipper.ship({"i": i})
+        self.assertFalse(shipper.close(timeout=0.2))
+        # Le lot bloqué reste au thread ; le reste du tampon est en spool.
+        self.assertEqual(shipper.pending_spool(), 7)
+        release.set()
+        shipper._thread.join(5)
+        self.assertEqual(shipper.sent + shipper.pending_spool(), 12)
+
+    def test_rejected_documents_are_spooled(self):
+        self.server.reject = {1: 429, 3: 503}
+        shipper = self.shipper()
+        for i in range(5):
+            shipper.ship({"i": i})
+        shipper.close()
+        self.assertEqual(shipper.sent, 3)
+        with open(self.spool) as f:
+            self.assertEqual([json.loads(line)["doc"]["i"] for line in f], [1, 3])
+
+    def test_permanent_failures_are_dead_lettered(self):
+        self.server.reject = {1: 400}
+        shipper = self.shipper()
+        for i in range(3):
+            shipper.ship({"i": i})
+        shipper.ship({"i": 3, "tags": {"a"}})  # un set n'est pas sérialisable en JSON
+        shipper.close()
+        self.assertEqual((shipper.sent, shipper.dead_lettered, shipper.failed_requests), (2, 2, 0))
+        self.assertEqual(shipper.pending_spool(), 0)
+        with open(shipper.dead_letter_path) as f:
+            dead = [json.loads(line) for line in f]
+        self.assertEqual(sorted(entry["doc"]["i"] for entry in dead), [1, 3])
+        # Rien n'est rejoué : les refus définitifs ne repassent pas par le spool.
+        self.assertEqual(shipper.replay(), 0)
+
+    def test_full_buffer_spills_to_spool(self):
+        shipper = self.shipper(max_buffer=5, batch_size=1000)
+        release = threading.Event()
+        original = shipper._write
+        shipper._write = lambda batch: (release.wait(), original(batch))
+        shipper.ship({"i": 0})
+        shipper.flush(timeout=0.2)  # le thread reste bloqué sur le premier lot
+        accepted = [shipper.ship({"i": i}) for i in range(1, 20)]
+        self.assertIn(False, accepted)
+        self.assertGreater(shipper.pending_spool(), 0)
+        release.set()
+        shipper.close()
+        # Rien n'est perdu : livré ou en spool.
+        self.assertEqual(shipper.sent + shipper.pending_spool(), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
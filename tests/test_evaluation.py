@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+from sklearn import metrics as sk_metrics
+from sklearn.ensemble import RandomForestClassifier
+
+from evaluation import evaluation_report, plot_report
+from model_pipeline1 import evaluate_model
+from preprocessing import FittedPreprocessing
+from synthetic_data import make_churn_frame
+
+
+class TestEvaluation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        preprocessing = FittedPreprocessing.fit(make_churn_frame(3000, seed=0))
+        X_train, y_train = preprocessing.transform_frame(make_churn_frame(3000, seed=0))
+        cls.X_test, cls.y_test = preprocessing.transform_frame(make_churn_frame(2000, seed=1))
+        cls.model = RandomForestClassifier(n_estimators=40, random_state=0).fit(X_train, y_train)
+        cls.scores = cls.model.predict_proba(cls.X_test)[:, 1]
+        cls.report = evaluation_report(cls.model, cls.X_test, cls.y_test, n_bootstrap=300, n_workers=1)
+
+    def test_single_pass_metrics_match_scikit_learn(self):
+        y_pred = self.model.predict(self.X_test)
+        expected = (sk_metrics.accuracy_score(self.y_test, y_pred), sk_metrics.precision_score(self.y_test, y_pred),
+                    sk_metrics.recall_score(self.y_test, y_pred), sk_metrics.f1_score(self.y_test, y_pred))
+        self.assertEqual(evaluate_model(self.model, self.X_test, self.y_test), expected)
+        self.assertEqual(tuple(self.report["metrics"][name] for name in ("accuracy", "precision", "recall", "f1_score")),
+                         expected)
+        self.assertAlmostEqual(self.report["metrics"]["roc_auc"], sk_metrics.roc_auc_score(self.y_test, self.scores),
+                               places=3)
+        self.assertAlmostEqual(self.report["metrics"]["average_precision"],
+                               sk_metrics.average_precision_score(self.y_test, self.scores), places=3)
+
+        # Aucun churn prédit ni réel : zero_division=0, comme scikit-learn.
+        no_churn = np.zeros(len(self.y_test), dtype=int)
+        self.assertEqual(evaluate_model(self.model, self.X_test[self.y_test.to_numpy() == 0],
+                                        no_churn[:int((self.y_test == 0).sum())])[1:], (0.0, 0.0, 0.0))
+
+    def test_threshold_sweep_operating_points(self):
+        y = self.y_test.to_numpy()
+        f1_at = lambda threshold: sk_metrics.f1_score(y, self.scores >= threshold - 1e-12)
+        best = self.report["best_f1"]
+        self.assertAlmostEqual(best["f1_score"], f1_at(best["threshold"]), places=12)
+        for threshold in np.unique(np.round(self.scores, 3)):
+            self.assertLessEqual(f1_at(threshold), best["f1_score"] + 1e-12)
+
+        point = self.report["recall_targets"]["0.8"]
+        self.assertGreaterEqual(point["recall"], 0.8)
+        self.assertAlmostEqual(point["flagged_rate"], np.mean(self.scores >= point["threshold"] - 1e-12))
+        self.assertLess(sk_metrics.recall_score(y, self.scores >= point["threshold"] + 0.001 - 1e-12), 0.8)
+        self.assertEqual(len(self.report["curves"]["threshold"]), len(self.report["curves"]["precision"]))
+
+    def test_bootstrap_is_seeded_and_independent_of_workers(self):
+        parallel = evaluation_report(self.model, self.X_test, self.y_test, n_bootstrap=300, n_workers=2)
+        self.assertEqual(parallel["intervals"], self.report["intervals"])
+        other_seed = evaluation_report(self.model, self.X_test, self.y_test, n_bootstrap=300, seed=1, n_workers=1)
+        self.assertNotEqual(other_seed["intervals"], self.report["intervals"])
+        for name, (low, high) in self.report["intervals"].items():
+            self.assertLess(low, self.report["metrics"][name])
+            self.assertGreater(high, self.report["metrics"][name])
+        # Largeur proche de l'écart-type binomial attendu pour l'accuracy (± 1,96 σ).
+        accuracy = self.report["metrics"]["accuracy"]
+        width = self.report["intervals"]["accuracy"][1] - self.report["intervals"]["accuracy"][0]
+        self.assertAlmostEqual(width, 2 * 1.96 * np.sqrt(accuracy * (1 - accuracy) / len(self.y_test)), delta=0.01)
+
+    def test_plots(self):
+        figures = plot_report(self.report)
+        self.assertEqual(sorted(figures), ["precision_recall.png", "roc.png", "threshold_metrics.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from fast_forest import FlatForest
+from model_pipeline1 import prepare_data, save_model
+from serving import load_serving_model
+from synthetic_data import write_churn_csv
+
+
+class TestFlatForest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        train_path = write_churn_csv(os.path.join(cls.tmpdir, "train.csv"), 3000, seed=1)
+        test_path = write_churn_csv(os.path.join(cls.tmpdir, "test.csv"), 2000, seed=2)
+        X_train, X_test, y_train, _, cls.preprocessing = prepare_data(train_path, test_path, return_preprocessing=True)
+        cls.X_test = X_test.to_numpy()
+        cls.model = RandomForestClassifier(n_estimators=50, random_state=0).fit(X_train.to_numpy(), y_train)
+        cls.flat = FlatForest.from_sklearn(cls.model)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_bit_identical_to_sklearn_on_test_split(self):
+        np.testing.assert_array_equal(self.flat.predict_proba(self.X_test), self.model.predict_proba(self.X_test))
+        np.testing.assert_array_equal(self.flat.predict(self.X_test), self.model.predict(self.X_test))
+
+    def test_single_rows_and_chunked_batches(self):
+        for row in self.X_test[:20]:
+            np.testing.assert_array_equal(self.flat.predict_proba(row[np.newaxis]),
+                                          self.model.predict_proba(row[np.newaxis]))
+        np.testing.assert_array_equal(self.flat.predict_proba(self.X_test, chunk_size=64),
+                                      self.model.predict_proba(self.X_test))
+
+    def test_save_and_load(self):
+        path = os.path.join(self.tmpdir, "forest.npz")
+        self.flat.save(path)
+        loaded = FlatForest.load(path)
+        np.testing.assert_array_equal(loaded.predict_proba(self.X_test), self.model.predict_proba(self.X_test))
+
+    def test_serving_backend(self):
+        model_path = os.path.join(self.tmpdir, "churn_model.pkl")
+        save_model(self.model, model_path, self.preprocessing)
+        raw = (self.X_test[:100] - self.preprocessing.offset) / self.preprocessing.scale
+        flat = load_serving_model(model_path, backend="flat")
+        reference = load_serving_model(model_path)
+        self.assertIsInstance(flat.estimator, FlatForest)
+        np.testing.assert_array_equal(flat.predict_proba(raw), reference.predict_proba(raw))
+
+    def test_rejects_wrong_width(self):
+        with self.assertRaises(ValueError):
+            self.flat.predict_proba(np.zeros((1, 3)))
+
+
+if __name__ == "__main__":
+    unittest.main()
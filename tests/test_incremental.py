@@ -0,0 +1,176 @@
+import copy
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import app as app_module
+from incremental import fetch_labeled_rows, grow_forest, load_state, rescale_forest, update_preprocessing
+from model_pipeline1 import load_model, load_preprocessing, prepare_data, save_model, train_model
+from prediction_log import (INSERT_COLUMNS, PREDICTIONS_TABLE, SQLitePool, ensure_schema, record_labels,
+                            record_labels_csv)
+from preprocessing import FEATURE_COLUMNS, NUMERICAL_COLUMNS, TARGET_COLUMN
+from retraining import RetrainManager, install_version, run_incremental_training
+from serving import ServingModel
+from synthetic_data import make_churn_frame, write_churn_csv
+
+
+def log_labelled_predictions(pool, preprocessing, frame):
+    """Journalise des prédictions puis enregistre leur label, comme le ferait le suivi du churn observé."""
+    data = preprocessing.encode_frame(frame)
+    X = data[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    rows = [tuple(x) + (0, 0.5, time.time()) for x in X]
+    with pool.connection() as conn:
+        pool.insert_many(conn, PREDICTIONS_TABLE, INSERT_COLUMNS, rows)
+        ids = [row[0] for row in conn.execute(f"SELECT id FROM {PREDICTIONS_TABLE} WHERE label IS NULL ORDER BY id")]
+    record_labels(pool, zip(ids, data[TARGET_COLUMN].tolist()))
+    return X
+
+
+def install(tmp_model, tmp_preprocessing, tmp_state, model_path):
+    install_version(model_path, tmp_model, tmp_preprocessing, tmp_state)
+
+
+class TestIncrementalTraining(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        train = write_churn_csv(os.path.join(self.tmpdir, "train.csv"), 3000, seed=0)
+        X_train, _, y_train, _, self.preprocessing = prepare_data(train, train, return_preprocessing=True)
+        self.model_path = os.path.join(self.tmpdir, "churn_model.pkl")
+        save_model(train_model(X_train, y_train, n_estimators=10, random_state=0), self.model_path, self.preprocessing)
+        self.db_path = os.path.join(self.tmpdir, "predictions.db")
+        self.database_url = f"sqlite:///{self.db_path}"
+        self.pool = SQLitePool(self.db_path)
+        ensure_schema(self.pool)
+
+    def tearDown(self):
+        self.pool.closeall()
+        shutil.rmtree(self.tmpdir)
+
+    def test_watermark_reads_only_new_rows(self):
+        log_labelled_predictions(self.pool, self.preprocessing, make_churn_frame(500, seed=1))
+        # Prédiction encore sans label : ignorée.
+        with self.pool.connection() as conn:
+            self.pool.insert_many(conn, PREDICTIONS_TABLE, INSERT_COLUMNS, [(1.0,) * len(FEATURE_COLUMNS) + (0, 0.5, 0.0)])
+
+        tmp_model, tmp_preprocessing, metrics, tmp_state = run_incremental_training(
+            self.model_path, self.database_url, n_new_trees=5, min_rows=100)
+        install(tmp_model, tmp_preprocessing, tmp_state, self.model_path)
+        self.assertEqual((metrics["rows"], metrics["n_estimators"], metrics["retired_trees"]), (500, 15, 0))
+        self.assertIn("f1_score", metrics)
+        self.assertEqual(load_model(self.model_path).n_estimators, 15)
+
+        with self.assertRaises(ValueError):
+            run_incremental_training(self.model_path, self.database_url, min_rows=1)
+
+        log_labelled_predictions(self.pool, self.preprocessing, make_churn_frame(300, seed=2))
+        tmp_model, tmp_preprocessing, metrics, tmp_state = run_incremental_training(
+            self.model_path, self.database_url, n_new_trees=5, max_estimators=18, min_rows=100)
+        install(tmp_model, tmp_preprocessing, tmp_state, self.model_path)
+        self.assertEqual((metrics["rows"], metrics["n_estimators"], metrics["retired_trees"]), (300, 18, 2))
+        state = load_state(self.model_path)
+        self.assertEqual((state["runs"], state["rows"]), (2, 800))
+        X, _, watermark = fetch_labeled_rows(self.pool, state["watermark"])
+        self.assertEqual((len(X), watermark), (0, state["watermark"]))
+
+    def test_labels_are_recorded_from_csv(self):
+        with self.pool.connection() as conn:
+            self.pool.insert_many(conn, PREDICTIONS_TABLE, INSERT_COLUMNS,
+                                  [(1.0,) * len(FEATURE_COLUMNS) + (0, 0.5, 0.0)] * 3)
+        labels_path = os.path.join(self.tmpdir, "labels.csv")
+        with open(labels_path, "w") as f:
+            f.write("id,label\n1,True\n3,0\n")
+        self.assertEqual(record_labels_csv(self.pool, labels_path, chunksize=1), 2)
+        _, y, watermark = fetch_labeled_rows(self.pool)
+        self.assertEqual((y.tolist(), watermark[1]), ([1, 0], 3))
+
+        with open(labels_path, "w") as f:
+            f.write("id,label\n2,maybe\n")
+        with self.assertRaises(ValueError):
+            record_labels_csv(self.pool, labels_path)
+
+    def test_preprocessing_statistics_grow_with_the_delta(self):
+        frame = make_churn_frame(200, seed=3)
+        frame["Account length"] = frame["Account length"] * 10
+        X_raw = self.preprocessing.encode_frame(frame)[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        updated = update_preprocessing(self.preprocessing, X_raw)
+        column = NUMERICAL_COLUMNS.index("Account length")
+        self.assertEqual(updated.data_max[column], max(self.preprocessing.data_max[column], X_raw[:, 0].max()))
+        self.assertGreater(updated.data_max[column], self.preprocessing.data_max[column])
+        self.assertEqual(updated.encodings, self.preprocessing.encodings)
+
+    def test_rescaled_trees_keep_their_decisions(self):
+        model = load_model(self.model_path)
+        frame = make_churn_frame(1000, seed=4)
+        X_raw = self.preprocessing.encode_frame(frame)[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        wider = X_raw.copy()
+        wider[:, 0] *= 5
+        wider[:, 5] -= 100
+        updated = update_preprocessing(self.preprocessing, wider)
+        rescaled = copy.deepcopy(model)
+        rescale_forest(rescaled, self.preprocessing, updated)
+
+        before = ServingModel(model, self.preprocessing).predict_proba(X_raw)
+        after = ServingModel(rescaled, updated).predict_proba(X_raw)
+        # Seules les valeurs à moins d'un ulp float32 d'un seuil peuvent changer de côté.
+        identical = np.all(np.isclose(after, before), axis=1)
+        self.assertGreaterEqual(identical.mean(), 0.99)
+
+    def test_grow_requires_every_class(self):
+        model = load_model(self.model_path)
+        X = np.zeros((10, len(FEATURE_COLUMNS)))
+        with self.assertRaises(ValueError):
+            grow_forest(model, X, np.zeros(10, dtype=np.int64), 5)
+
+
+class TestIncrementalRetrainEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        train = write_churn_csv(os.path.join(self.tmpdir, "train.csv"), 2000, seed=0)
+        X_train, _, y_train, _, preprocessing = prepare_data(train, train, return_preprocessing=True)
+        self.model_path = os.path.join(self.tmpdir, "churn_model.pkl")
+        save_model(train_model(X_train, y_train, n_estimators=10, random_state=0), self.model_path, preprocessing)
+        db_path = os.path.join(self.tmpdir, "predictions.db")
+        pool = SQLitePool(db_path)
+        ensure_schema(pool)
+        log_labelled_predictions(pool, preprocessing, make_churn_frame(400, seed=1))
+        pool.closeall()
+
+        self._saved = (app_module.model, app_module.model_loaded, app_module.retrain_manager)
+        app_module.model, app_module.model_loaded = ServingModel(load_model(self.model_path), preprocessing), True
+        app_module.retrain_manager = RetrainManager(
+            self.model_path, app_module._install_model, database_url=f"sqlite:///{db_path}",
+            incremental_options={"n_new_trees": 4, "min_rows": 100})
+
+    def tearDown(self):
+        app_module.model, app_module.model_loaded, app_module.retrain_manager = self._saved
+        shutil.rmtree(self.tmpdir)
+
+    def test_incremental_retrain_installs_model_and_watermark(self):
+        with TestClient(app_module.app) as client:
+            self.assertEqual(client.post("/retrain?mode=unknown").status_code, 400)
+            response = client.post("/retrain?mode=incremental")
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["job_id"]
+            deadline = time.monotonic() + 120
+            while time.monotonic() < deadline:
+                status = client.get(f"/retrain/{job_id}").json()
+                if status["status"] in ("succeeded", "failed"):
+                    break
+                time.sleep(0.05)
+
+        self.assertEqual(status["status"], "succeeded", status["error"])
+        self.assertEqual((status["mode"], status["metrics"]["rows"]), ("incremental", 400))
+        self.assertEqual(app_module.model.estimator.n_estimators, 14)
+        self.assertEqual(load_state(self.model_path)["rows"], 400)
+        self.assertEqual(load_preprocessing(self.model_path).to_dict(), app_module.model.preprocessing.to_dict())
+        self.assertEqual([name for name in os.listdir(self.tmpdir) if name.endswith(".tmp")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
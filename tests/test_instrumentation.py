@@ -0,0 +1,127 @@
+import importlib
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import joblib
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from instrumentation import HistogramValue, Registry
+from preprocessing import FEATURE_COLUMNS
+
+
+class TestRegistry(unittest.TestCase):
+    def test_histogram_prometheus_text(self):
+        registry = Registry()
+        histogram = registry.histogram("latency_seconds", "Latence.", [0.1, 1.0], ("stage",))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, stage="predict")
+        text = registry.render()
+        self.assertIn("# TYPE latency_seconds histogram", text)
+        self.assertIn('latency_seconds_bucket{stage="predict",le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{stage="predict",le="1.0"} 3', text)
+        self.assertIn('latency_seconds_bucket{stage="predict",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count{stage="predict"} 4', text)
+        self.assertIn('latency_seconds_sum{stage="predict"} 2.65', text)
+
+    def test_counter_gauge_and_snapshot(self):
+        registry = Registry()
+        counter = registry.counter("requests", "Requêtes.", ("status",))
+        counter.inc(status=200)
+        counter.inc(2, status=200)
+        gauge = registry.gauge("in_flight", "En cours.")
+        with gauge.track_inprogress():
+            self.assertEqual(gauge.value(), 1)
+        self.assertEqual(gauge.value(), 0)
+        self.assertIs(registry.counter("requests", "Requêtes.", ("status",)), counter)
+        with self.assertRaises(ValueError):
+            counter.inc(endpoint="/predict")
+
+        registry.histogram("train_seconds", "Durée.", [1.0]).observe(0.5)
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot["requests_200"], 3)
+        self.assertEqual(snapshot["in_flight"], 0)
+        self.assertEqual((snapshot["train_seconds_count"], snapshot["train_seconds_mean"]), (1, 0.5))
+        self.assertIn('requests_total{status="200"} 3', registry.render())
+
+    def test_histogram_value_buckets(self):
+        histogram = HistogramValue([1, 2])
+        for value in (1, 1.5, 3):
+            histogram.observe(value)
+        self.assertEqual(histogram.as_dict()["buckets"], {"1": 1, "2": 1, "+Inf": 1})
+
+    def test_render_while_observing_new_labels(self):
+        registry = Registry()
+        histogram = registry.histogram("latency_seconds", "Latence.", [0.1], ("worker",))
+        counter = registry.counter("requests", "Requêtes.", ("worker",))
+
+        def observe(worker):
+            for i in range(5000):
+                histogram.observe(0.05, worker=f"{worker}-{i}")
+                counter.inc(worker=f"{worker}-{i}")
+
+        threads = [threading.Thread(target=observe, args=(n,)) for n in range(2)]
+        for thread in threads:
+            thread.start()
+        # Le rendu ne doit ni lever ni bloquer pendant que des labels sont ajoutés.
+        while any(thread.is_alive() for thread in threads):
+            registry.render()
+            registry.snapshot()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(counter.snapshot()), 10000)
+
+
+class TestMetricsEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.X = rng.random((100, len(FEATURE_COLUMNS)))
+        cls.estimator = RandomForestClassifier(n_estimators=5, random_state=0).fit(cls.X, cls.X[:, 0] > 0.5)
+
+    def test_fastapi_metrics(self):
+        saved = (app_module.model, app_module.model_loaded)
+        app_module.model, app_module.model_loaded = self.estimator, True
+        try:
+            client = TestClient(app_module.app)
+            client.post("/predict", json={"features": self.X[0].tolist()})
+            client.post("/predict/batch", json={"rows": self.X[:10].tolist()})
+            text = client.get("/metrics").text
+        finally:
+            app_module.model, app_module.model_loaded = saved
+        self.assertIn('churn_stage_seconds_count{app="fastapi",endpoint="/predict",stage="request"}', text)
+        self.assertIn('churn_stage_seconds_count{app="fastapi",endpoint="/predict/batch",stage="predict"}', text)
+        self.assertIn('churn_requests_total{app="fastapi",endpoint="/predict/batch",status="200"}', text)
+        self.assertIn('churn_requests_in_flight{app="fastapi",endpoint="/predict"} 0', text)
+
+    def test_flask_metrics(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            model_path = os.path.join(tmpdir, "churn_model.pkl")
+            joblib.dump(self.estimator, model_path)
+            env = {"MODEL_PATH": model_path, "DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'p.db')}"}
+            with mock.patch.dict(os.environ, env):
+                import app_flask
+                app_flask = importlib.reload(app_flask)
+            client = app_flask.app.test_client()
+            client.post("/predict", data={field: "1" for field in app_flask.FORM_FIELDS.values()})
+            app_flask.prediction_log.flush()
+            text = client.get("/metrics").get_data(as_text=True)
+            app_flask.prediction_log.close()
+            app_flask.pool.closeall()
+        finally:
+            shutil.rmtree(tmpdir)
+        for stage in ("request", "parse_form", "predict", "log_enqueue"):
+            self.assertIn(f'churn_stage_seconds_count{{app="flask",endpoint="/predict",stage="{stage}"}}', text)
+        self.assertIn('churn_stage_seconds_count{app="prediction_log",endpoint="background",stage="bulk_insert"}', text)
+        self.assertIn('churn_prediction_log_rows{outcome="written"}', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
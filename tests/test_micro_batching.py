@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from micro_batching import MicroBatcher
+from model_registry import ModelRegistry
+from serving import ServingModel
+
+
+class TestMicroBatcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.X = rng.random((300, 13))
+        y = (cls.X[:, 1] > 0.5).astype(int)
+        cls.estimator = RandomForestClassifier(n_estimators=10, random_state=0).fit(cls.X, y)
+
+    def test_each_caller_gets_its_own_row(self):
+        batcher = MicroBatcher(self.estimator.predict_proba, max_batch_size=16, max_wait_ms=5)
+
+        async def scenario():
+            results = await asyncio.gather(*(batcher.submit(row) for row in self.X[:100]))
+            await batcher.stop()
+            return np.vstack(results)
+
+        np.testing.assert_array_equal(asyncio.run(scenario()), self.estimator.predict_proba(self.X[:100]))
+        stats = batcher.stats()
+        self.assertEqual(sum(stats["batch_size"]["buckets"].values()), stats["batch_size"]["count"])
+        self.assertLess(stats["batch_size"]["count"], 100)
+        self.assertEqual(stats["batch_size"]["buckets"]["+Inf"], 0)
+        self.assertEqual(stats["queue_wait_ms"]["count"], 100)
+
+    def test_max_batch_size_is_respected(self):
+        sizes = []
+
+        def predict_proba(X):
+            sizes.append(len(X))
+            return self.estimator.predict_proba(X)
+
+        batcher = MicroBatcher(predict_proba, max_batch_size=8, max_wait_ms=50)
+
+        async def scenario():
+            await asyncio.gather(*(batcher.submit(row) for row in self.X[:40]))
+            await batcher.stop()
+
+        asyncio.run(scenario())
+        self.assertEqual(sum(sizes), 40)
+        self.assertLessEqual(max(sizes), 8)
+
+    def test_errors_propagate_to_every_caller(self):
+        def failing(X):
+            raise RuntimeError("boom")
+
+        batcher = MicroBatcher(failing, max_batch_size=4, max_wait_ms=1)
+
+        async def scenario():
+            results = await asyncio.gather(*(batcher.submit(row) for row in self.X[:4]), return_exceptions=True)
+            await batcher.stop()
+            return results
+
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in asyncio.run(scenario())))
+
+    def test_batch_model_is_resolved_once(self):
+        saved = (app_module.model, app_module.model_registry)
+        app_module.model_registry = ModelRegistry()
+        app_module.model = ServingModel(self.estimator, version="a")
+        try:
+            rows = app_module._predict_proba(self.X[:3])
+            self.assertTrue(all(current is rows[0][0] for current, _ in rows))
+            np.testing.assert_array_equal(np.vstack([proba for _, proba in rows]),
+                                          self.estimator.predict_proba(self.X[:3]))
+        finally:
+            app_module.model_registry.close()
+            app_module.model, app_module.model_registry = saved
+
+    def test_predict_endpoint_with_micro_batching(self):
+        saved = (app_module.model, app_module.model_loaded, app_module.MICRO_BATCHING, app_module.model_registry)
+        app_module.model_registry = ModelRegistry(on_promote=app_module._serve_model)
+        app_module._install_model(ServingModel(self.estimator, version="micro"))
+        app_module.MICRO_BATCHING = True
+        try:
+            with TestClient(app_module.app) as client:
+                for row in self.X[:5]:
+                    response = client.post("/predict", json={"features": row.tolist()})
+                    self.assertEqual(response.json(), {"prediction": int(self.estimator.predict([row])[0])})
+                stats = client.get("/predict/batching/stats").json()
+                self.assertTrue(stats["enabled"])
+                self.assertEqual(stats["queue_wait_ms"]["count"], 5)
+            # Les lignes micro-batchées sont comptées pour la version qui les a scorées.
+            self.assertEqual(app_module.model_registry.report()["versions"]["micro"]["primary"]["rows"], 5)
+        finally:
+            app_module.model_registry.close()
+            app_module.model, app_module.model_loaded, app_module.MICRO_BATCHING, app_module.model_registry = saved
+            app_module.batcher = None
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from model_artifact import load_artifact, read_manifest, save_artifact
+from preprocessing import FEATURE_COLUMNS, FittedPreprocessing
+from retraining import RetrainManager
+from serving import ServingModel, load_serving_model
+from synthetic_data import make_churn_frame, write_churn_csv
+
+
+class TestModelArtifact(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        train = make_churn_frame(2000, seed=0)
+        cls.preprocessing = FittedPreprocessing.fit(train)
+        X, y = cls.preprocessing.transform_frame(train)
+        cls.estimator = RandomForestClassifier(n_estimators=10, random_state=0).fit(X.to_numpy(), y)
+        raw = cls.preprocessing.encode_frame(make_churn_frame(200, seed=1))
+        cls.raw = raw[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "churn_model.artifact")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_round_trip_memory_mapped(self):
+        manifest = save_artifact(self.estimator, self.path, self.preprocessing)
+        model = load_serving_model(self.path)
+        self.assertEqual(model.version, manifest["version"])
+        self.assertEqual(manifest["feature_columns"], FEATURE_COLUMNS)
+        self.assertIsInstance(model.estimator.threshold.base, np.memmap)
+        expected = ServingModel(self.estimator, self.preprocessing).predict_proba(self.raw)
+        np.testing.assert_array_equal(model.predict_proba(self.raw), expected)
+
+    def test_checksum_and_feature_order(self):
+        save_artifact(self.estimator, self.path, self.preprocessing)
+        load_artifact(self.path, verify=True)
+        with open(os.path.join(self.path, "threshold.npy"), "r+b") as f:
+            f.seek(-8, os.SEEK_END)
+            f.write(b"\x00" * 8)
+        with self.assertRaises(ValueError):
+            load_artifact(self.path, verify=True)
+
+        manifest = read_manifest(self.path)
+        manifest["feature_columns"] = list(reversed(FEATURE_COLUMNS))
+        with open(os.path.join(self.path, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+        with self.assertRaises(ValueError):
+            load_artifact(self.path)
+
+    def test_overwrite_keeps_mapped_model_valid(self):
+        save_artifact(self.estimator, self.path, self.preprocessing)
+        old = load_artifact(self.path)
+        before = old.predict_proba(self.raw)
+        other = RandomForestClassifier(n_estimators=3, random_state=1).fit(
+            self.preprocessing.transform_array(self.raw), self.raw[:, 0] > self.raw[:, 0].mean())
+        save_artifact(other, self.path, self.preprocessing)
+        np.testing.assert_array_equal(old.predict_proba(self.raw), before)
+        self.assertEqual(load_artifact(self.path).estimator.n_estimators, 3)
+        self.assertTrue(os.path.islink(self.path))
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), [".churn_model.artifact.versions", "churn_model.artifact"])
+
+    def test_version_covers_preprocessing(self):
+        version = save_artifact(self.estimator, self.path, self.preprocessing)["version"]
+        self.assertEqual(save_artifact(self.estimator, self.path, self.preprocessing)["version"], version)
+        self.assertNotEqual(save_artifact(self.estimator, self.path)["version"], version)
+
+    def test_retrain_rewrites_artifact(self):
+        save_artifact(self.estimator, self.path, self.preprocessing)
+        train = write_churn_csv(os.path.join(self.tmpdir, "train.csv"), 2000, seed=3)
+        test = write_churn_csv(os.path.join(self.tmpdir, "test.csv"), 500, seed=4)
+        installed = []
+        manager = RetrainManager(self.path, installed.append)
+
+        async def run():
+            job = manager.submit(train, test)
+            await manager.wait()
+            return job
+
+        try:
+            job = asyncio.run(run())
+        finally:
+            manager.shutdown()
+        self.assertEqual(job.status, "succeeded", job.error)
+        self.assertEqual(installed[0].version, read_manifest(self.path)["version"])
+        self.assertEqual(installed[0].estimator.n_estimators, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
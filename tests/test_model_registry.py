@@ -0,0 +1,202 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import joblib
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from model_registry import ModelRegistry, model_key, within_directory
+from preprocessing import FEATURE_COLUMNS
+from serving import ServingModel
+
+
+def serving_model(estimator, version):
+    return ServingModel(estimator, version=version)
+
+
+class TestModelRegistry(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.X = rng.random((300, len(FEATURE_COLUMNS)))
+        y = (cls.X[:, 0] > 0.5).astype(int)
+        cls.estimator_a = RandomForestClassifier(n_estimators=10, random_state=0).fit(cls.X, y)
+        cls.estimator_b = RandomForestClassifier(n_estimators=10, random_state=1).fit(cls.X, 1 - y)
+
+    def setUp(self):
+        self.served = []
+        self.registry = ModelRegistry(shadow_fraction=1.0, on_promote=self.served.append, seed=0)
+        self.a = serving_model(self.estimator_a, "a")
+        self.b = serving_model(self.estimator_b, "b")
+
+    def tearDown(self):
+        self.registry.close()
+
+    def test_promote_and_rollback_swap_loaded_models(self):
+        self.assertEqual(self.registry.add(self.a), "a")
+        self.assertEqual(self.registry.add(self.b), "b")
+        self.assertEqual(self.registry.primary_version, "a")
+        self.assertEqual([version for version, _ in self.registry.candidates()], ["b"])
+
+        self.registry.promote("b")
+        self.assertIs(self.registry.primary, self.b)
+        self.assertEqual(self.registry.history, ["a"])
+        self.assertEqual(self.registry.rollback(), "a")
+        # Les mêmes objets sont réinstallés : aucun rechargement.
+        self.assertEqual([model for model in self.served], [self.a, self.b, self.a])
+        self.assertEqual(self.registry.history, [])
+        with self.assertRaises(ValueError):
+            self.registry.rollback()
+        with self.assertRaises(KeyError):
+            self.registry.promote("unknown")
+
+    def test_shadow_agreement(self):
+        self.registry.add(self.a)
+        self.registry.add(serving_model(self.estimator_a, "a-copy"))
+        self.registry.add(self.b)
+        predictions = self.a.predict(self.X)
+        churn = self.a.predict_proba(self.X)[:, 1]
+        self.assertTrue(self.registry.shadow(self.X, predictions, churn))
+        self.assertTrue(self.registry.flush(timeout=10))
+
+        versions = self.registry.report()["versions"]
+        self.assertEqual(versions["a"]["role"], "primary")
+        self.assertEqual(versions["a-copy"]["shadow"]["agreement"], 1.0)
+        self.assertEqual(versions["a-copy"]["shadow"]["mean_abs_probability_diff"], 0.0)
+        self.assertLess(versions["b"]["shadow"]["agreement"], 0.5)
+        self.assertEqual(versions["b"]["shadow"]["rows"], len(self.X))
+
+        registry = ModelRegistry(shadow_fraction=0.0)
+        registry.add(self.a)
+        registry.add(self.b)
+        self.assertFalse(registry.shadow(self.X, predictions))
+        registry.close()
+
+    def test_versions_are_deduplicated_and_evicted(self):
+        registry = ModelRegistry(max_versions=2)
+        registry.add(self.a)
+        self.assertEqual(registry.add(serving_model(self.estimator_a, "a")), "a")
+        self.assertIs(registry.primary, self.a)
+        registry.add(self.b)
+        registry.add(serving_model(self.estimator_b, "c"))
+        self.assertEqual(registry.versions(), ["a", "c"])
+
+        with self.assertRaises(ValueError):
+            registry.remove("a")
+        registry.remove("c")
+        with self.assertRaises(KeyError):
+            registry.remove("c")
+        # Une requête servie par "c" qui se termine après son déchargement.
+        registry.record("c", 0.01, 1)
+        self.assertNotIn("c", registry._stats)
+        registry.close()
+
+    def test_concurrent_promotes_install_in_primary_order(self):
+        installed = []
+
+        def slow_install(model):
+            time.sleep(0.05 if model is self.b else 0)
+            installed.append(model_key(model))
+
+        registry = ModelRegistry(on_promote=slow_install)
+        registry.add(self.a)
+        registry.add(self.b)
+        threads = [threading.Thread(target=registry.promote, args=(version,)) for version in ("b", "a")]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(installed[-1], registry.primary_version)
+        registry.close()
+
+    def test_concurrent_primary_adds_never_promote_an_evicted_version(self):
+        registry = ModelRegistry(max_versions=2)
+        models = [serving_model(self.estimator_a, f"v{i}") for i in range(20)]
+        errors = []
+
+        def add(model):
+            try:
+                registry.add(model, primary=True)
+            except KeyError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=add, args=(model,)) for model in models]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertIn(registry.primary_version, registry.versions())
+        self.assertLessEqual(len(registry.versions()), 2)
+        registry.close()
+
+    def test_within_directory(self):
+        directory = tempfile.mkdtemp()
+        try:
+            self.assertTrue(within_directory(os.path.join(directory, "model.pkl"), directory))
+            self.assertFalse(within_directory(os.path.join(directory, "..", "model.pkl"), directory))
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestModelsEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.X = rng.random((100, len(FEATURE_COLUMNS)))
+        cls.y = (cls.X[:, 0] > 0.5).astype(int)
+
+    def setUp(self):
+        self._saved = (app_module.model, app_module.model_loaded, app_module.model_registry,
+                       app_module.MODEL_REGISTRY_DIR, app_module.prediction_cache)
+        self.directory = tempfile.mkdtemp()
+        app_module.MODEL_REGISTRY_DIR = self.directory
+        app_module.prediction_cache = None
+        app_module.model_registry = ModelRegistry(shadow_fraction=1.0, on_promote=app_module._serve_model, seed=0)
+        self.primary = serving_model(RandomForestClassifier(n_estimators=5, random_state=0).fit(self.X, self.y),
+                                     "primary")
+        app_module._install_model(self.primary)
+        self.client = TestClient(app_module.app)
+
+    def tearDown(self):
+        app_module.model_registry.close()
+        (app_module.model, app_module.model_loaded, app_module.model_registry,
+         app_module.MODEL_REGISTRY_DIR, app_module.prediction_cache) = self._saved
+        shutil.rmtree(self.directory)
+
+    def test_load_shadow_promote_and_rollback(self):
+        path = os.path.join(self.directory, "candidate.pkl")
+        joblib.dump(RandomForestClassifier(n_estimators=5, random_state=1).fit(self.X, self.y), path)
+        self.assertEqual(self.client.post("/models", params={"path": "/etc/passwd"}).status_code, 403)
+        self.assertEqual(self.client.post("/models", params={"path": os.path.join(self.directory, "missing.pkl")})
+                         .status_code, 404)
+        response = self.client.post("/models", params={"path": path})
+        self.assertEqual(response.status_code, 201)
+        candidate = response.json()["version"]
+        self.assertEqual(response.json()["primary"], "primary")
+
+        self.client.post("/predict/batch", json={"rows": self.X[:20].tolist()}).raise_for_status()
+        app_module.model_registry.flush(timeout=10)
+        report = self.client.get("/models").json()
+        self.assertEqual(report["versions"]["primary"]["primary"]["rows"], 20)
+        self.assertEqual(report["versions"][candidate]["shadow"]["rows"], 20)
+
+        self.assertEqual(self.client.post(f"/models/{candidate}/promote").json()["primary"], candidate)
+        self.assertEqual(app_module._model_version(app_module.model), candidate)
+        self.assertEqual(self.client.delete(f"/models/{candidate}").status_code, 409)
+        self.assertEqual(self.client.post("/models/rollback").json(), {"primary": "primary"})
+        self.assertIs(app_module.model, self.primary)
+        self.assertEqual(self.client.post("/models/rollback").status_code, 409)
+        self.assertEqual(self.client.delete(f"/models/{candidate}").status_code, 200)
+        self.assertEqual(self.client.post(f"/models/{candidate}/promote").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from model_registry import model_key
+from prediction_cache import PredictionCache, SQLiteCacheBackend, cache_key
+from preprocessing import FEATURE_COLUMNS
+from serving import ServingModel
+
+
+class CountingModel(ServingModel):
+    """Modèle servi qui compte les appels à predict_proba."""
+
+    calls = 0
+
+    def predict_proba(self, X):
+        CountingModel.calls += 1
+        return super().predict_proba(X)
+
+
+class TestPredictionCache(unittest.TestCase):
+    def test_canonical_key(self):
+        self.assertEqual(cache_key([1, 2], "v1"), cache_key(np.array([[1.0, 2.0]]), "v1"))
+        self.assertEqual(cache_key([-0.0, 1.0], "v1"), cache_key([0.0, 1.0], "v1"))
+        self.assertNotEqual(cache_key([1, 2], "v1"), cache_key([1, 2], "v2"))
+
+    def test_lru_eviction(self):
+        cache = PredictionCache(max_size=2)
+        cache.put([1.0], "v", 1)
+        cache.put([2.0], "v", 0)
+        self.assertEqual(cache.get([1.0], "v"), 1)
+        cache.put([3.0], "v", 1)
+        self.assertIsNone(cache.get([2.0], "v"))
+        self.assertEqual(cache.get([1.0], "v"), 1)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"], stats["size"]), (2, 1, 1, 2))
+
+    def test_ttl_and_invalidate(self):
+        cache = PredictionCache(max_size=10, ttl=0.05)
+        cache.put([1.0], "v", 1)
+        self.assertEqual(cache.get([1.0], "v"), 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get([1.0], "v"))
+        cache.put([1.0], "v", 1)
+        cache.invalidate()
+        self.assertIsNone(cache.get([1.0], "v"))
+
+    def test_sqlite_backend_purges_every_n_writes(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            backend = SQLiteCacheBackend(os.path.join(tmpdir, "cache.db"), max_size=5, purge_every=4)
+            for i in range(7):
+                backend.set(f"k{i}", {"prediction": 1, "probability": 0.5})
+            count = lambda: backend._conn().execute("SELECT COUNT(*) FROM prediction_cache").fetchone()[0]
+            self.assertEqual(count(), 7)
+            backend.set("k7", {"prediction": 0, "probability": 0.1})
+            self.assertEqual(count(), 5)
+            self.assertIsNone(backend.get("k0"))
+            self.assertEqual(backend.get("k7"), {"prediction": 0, "probability": 0.1})
+            plan = " ".join(row[-1] for row in backend._conn().execute(
+                "EXPLAIN QUERY PLAN SELECT key FROM prediction_cache ORDER BY accessed_at"))
+            self.assertIn("prediction_cache_accessed_at", plan)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_shared_backend(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "cache.db")
+            worker_a = PredictionCache(max_size=10, backend=SQLiteCacheBackend(path))
+            worker_b = PredictionCache(max_size=10, backend=SQLiteCacheBackend(path))
+            worker_a.put([1.0, 2.0], "v", [1, 0.8])
+            changes = worker_b.backend._conn().total_changes
+            self.assertEqual(worker_b.get([1.0, 2.0], "v"), [1, 0.8])
+            self.assertEqual(worker_b.stats()["shared_hits"], 1)
+            # Une lecture n'écrit pas dans le fichier partagé.
+            self.assertEqual(worker_b.backend._conn().total_changes, changes)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestAppPredictionCache(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.X = rng.random((100, len(FEATURE_COLUMNS)))
+        estimator = RandomForestClassifier(n_estimators=5, random_state=0).fit(self.X, self.X[:, 0] > 0.5)
+        self._saved = (app_module.model, app_module.model_loaded, app_module.prediction_cache)
+        app_module.model = CountingModel(estimator, version="v1")
+        app_module.model_loaded = True
+        app_module.prediction_cache = PredictionCache(max_size=100)
+        CountingModel.calls = 0
+        self.client = TestClient(app_module.app)
+
+    def tearDown(self):
+        app_module.model, app_module.model_loaded, app_module.prediction_cache = self._saved
+
+    def test_repeated_request_served_from_cache(self):
+        payload = {"features": self.X[0].tolist()}
+        first = self.client.post("/predict", json=payload).json()
+        second = self.client.post("/predict", json=payload).json()
+        self.assertEqual(first, second)
+        self.assertEqual(CountingModel.calls, 1)
+        stats = self.client.get("/cache/stats").json()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        # Même forme de valeur que l'app Flask, pour un backend partagé entre les deux.
+        cached = app_module.prediction_cache.get(np.array([self.X[0]]), "v1")
+        self.assertEqual(set(cached), {"prediction", "probability"})
+        self.assertEqual(cached["prediction"], first["prediction"])
+
+    def test_install_model_invalidates(self):
+        payload = {"features": self.X[0].tolist()}
+        self.client.post("/predict", json=payload)
+        app_module._install_model(CountingModel(app_module.model.estimator, version="v2"))
+        self.client.post("/predict", json=payload)
+        self.assertEqual(CountingModel.calls, 2)
+        self.assertEqual(app_module.prediction_cache.stats()["invalidations"], 1)
+
+    def test_shared_backend_from_event_loop(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            backend = SQLiteCacheBackend(os.path.join(tmpdir, "cache.db"))
+            app_module.prediction_cache = PredictionCache(max_size=100, backend=backend)
+            payload = {"features": self.X[0].tolist()}
+            first = self.client.post("/predict", json=payload).json()
+            app_module.prediction_cache = PredictionCache(max_size=100, backend=backend)
+            self.assertEqual(self.client.post("/predict", json=payload).json(), first)
+            self.assertEqual(CountingModel.calls, 1)
+            self.assertEqual(app_module.prediction_cache.stats()["shared_hits"], 1)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_version_without_artifact_is_stable(self):
+        estimator = app_module.model.estimator
+        copy = pickle.loads(pickle.dumps(estimator))
+        self.assertEqual(model_key(estimator), model_key(copy))
+        self.assertEqual(model_key(ServingModel(estimator)), model_key(ServingModel(copy)))
+        self.assertEqual(model_key(app_module.model), "v1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import importlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from prediction_log import FEATURE_DB_COLUMNS, PredictionLogWriter, SQLitePool, ensure_schema
+from preprocessing import FEATURE_COLUMNS
+
+
+class SlowPool(SQLitePool):
+    """Pool SQLite dont chaque insertion attend un signal (simule une base lente)."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.release = threading.Event()
+        self.batch_sizes = []
+
+    def insert_many(self, conn, table, columns, rows):
+        self.release.wait()
+        self.batch_sizes.append(len(rows))
+        super().insert_many(conn, table, columns, rows)
+
+
+class TestPredictionLogWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, "predictions.db")
+        self.pool = SQLitePool(self.db_path)
+        ensure_schema(self.pool)
+
+    def tearDown(self):
+        self.pool.closeall()
+        shutil.rmtree(self.tmpdir)
+
+    def count_rows(self):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def test_flushes_by_size_in_bulk(self):
+        writer = PredictionLogWriter(self.pool, batch_size=100, flush_interval=60)
+        for i in range(250):
+            writer.log([float(i)] * len(FEATURE_COLUMNS), i % 2, 0.5)
+        deadline = time.monotonic() + 5
+        while writer.written < 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(writer.written, 200)
+        self.assertEqual(writer.batches, 2)
+        writer.close()
+        self.assertEqual(self.count_rows(), 250)
+
+    def test_flushes_by_time(self):
+        writer = PredictionLogWriter(self.pool, batch_size=1000, flush_interval=0.05)
+        writer.log([1.0] * len(FEATURE_COLUMNS), 1, 0.9)
+        deadline = time.monotonic() + 5
+        while writer.written < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.count_rows(), 1)
+        writer.close()
+
+    def test_typed_columns(self):
+        writer = PredictionLogWriter(self.pool)
+        features = [float(i) for i in range(len(FEATURE_COLUMNS))]
+        writer.log(features, 1, 0.75)
+        writer.close()
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(f"SELECT {', '.join(FEATURE_DB_COLUMNS)}, prediction, probability FROM predictions").fetchone()
+        self.assertEqual(list(row), features + [1, 0.75])
+
+    def test_backpressure_and_bounded_buffer(self):
+        pool = SlowPool(self.db_path)
+        writer = PredictionLogWriter(pool, max_buffer=10, batch_size=5, flush_interval=0.01, put_timeout=0.01)
+        results = [writer.log([0.0] * len(FEATURE_COLUMNS), 0) for _ in range(40)]
+        self.assertLessEqual(writer.stats()["pending"], 10)
+        self.assertGreater(writer.dropped, 0)
+        self.assertEqual(results.count(False), writer.dropped)
+        pool.release.set()
+        writer.close()
+        self.assertEqual(self.count_rows(), results.count(True))
+        self.assertLessEqual(max(pool.batch_sizes), 5)
+
+    def test_upgrades_legacy_table(self):
+        legacy_path = os.path.join(self.tmpdir, "legacy.db")
+        with sqlite3.connect(legacy_path) as conn:
+            conn.execute("CREATE TABLE predictions (id INTEGER PRIMARY KEY, features TEXT, prediction INT)")
+        pool = SQLitePool(legacy_path)
+        ensure_schema(pool)
+        writer = PredictionLogWriter(pool)
+        writer.log([0.0] * len(FEATURE_COLUMNS), 1)
+        writer.close()
+        self.assertEqual(writer.written, 1)
+
+
+class TestFlaskPredictionLogging(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        model_path = os.path.join(self.tmpdir, "churn_model.pkl")
+        rng = np.random.default_rng(0)
+        X = rng.random((100, len(FEATURE_COLUMNS)))
+        joblib.dump(RandomForestClassifier(n_estimators=5, random_state=0).fit(X, X[:, 0] > 0.5), model_path)
+        self.db_path = os.path.join(self.tmpdir, "predictions.db")
+        env = {"MODEL_PATH": model_path, "DATABASE_URL": f"sqlite:///{self.db_path}"}
+        with mock.patch.dict(os.environ, env):
+            import app_flask
+            self.app_flask = importlib.reload(app_flask)
+
+    def tearDown(self):
+        if self.app_flask.prediction_log is not None:
+            self.app_flask.prediction_log.close()
+            self.app_flask.pool.closeall()
+        shutil.rmtree(self.tmpdir)
+
+    def test_predict_is_logged(self):
+        form = {field: "1" for field in self.app_flask.FORM_FIELDS.values()}
+        client = self.app_flask.app.test_client()
+        for _ in range(3):
+            self.assertEqual(client.post("/predict", data=form).status_code, 200)
+        self.app_flask.prediction_log.flush()
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute("SELECT account_length, prediction FROM predictions").fetchall()
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0][0], 1.0)
+
+    def test_unreachable_database_does_not_fail_predictions(self):
+        form = {field: "1" for field in self.app_flask.FORM_FIELDS.values()}
+        client = self.app_flask.app.test_client()
+        self.app_flask.DATABASE_URL = f"sqlite:///{os.path.join(self.tmpdir, 'missing', 'predictions.db')}"
+        for _ in range(3):
+            self.assertEqual(client.post("/predict", data=form).status_code, 200)
+        self.assertIsNone(self.app_flask.prediction_log)
+        self.assertEqual(self.app_flask.log_unavailable_dropped, 3)
+        self.assertIn('churn_prediction_log_rows{outcome="dropped"} 3', client.get("/metrics").get_data(as_text=True))
+        # Une seule tentative pendant le délai d'attente, puis reconnexion.
+        self.assertEqual(self.app_flask.log_retry_delay, 2 * self.app_flask.LOG_RETRY_INITIAL)
+
+        self.app_flask.DATABASE_URL = f"sqlite:///{self.db_path}"
+        self.app_flask.log_retry_at = 0.0
+        self.assertEqual(client.post("/predict", data=form).status_code, 200)
+        self.app_flask.prediction_log.flush()
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
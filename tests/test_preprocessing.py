@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import MinMaxScaler
+
+from model_pipeline1 import prepare_data, save_model, load_preprocessing
+from preprocessing import FEATURE_COLUMNS, NUMERICAL_COLUMNS, FittedPreprocessing
+from serving import load_serving_model
+from synthetic_data import make_churn_frame, write_churn_csv
+
+
+class TestFittedPreprocessing(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.train_path = write_churn_csv(os.path.join(self.tmpdir, "train.csv"), 1000, seed=1)
+        self.test_path = write_churn_csv(os.path.join(self.tmpdir, "test.csv"), 300, seed=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_fit_on_training_split_only(self):
+        X_train, X_test, _, _, preprocessing = prepare_data(self.train_path, self.test_path, return_preprocessing=True)
+        train = pd.read_csv(self.train_path)
+        expected = MinMaxScaler().fit(train[NUMERICAL_COLUMNS]).transform(train[NUMERICAL_COLUMNS])
+        np.testing.assert_array_equal(X_train[NUMERICAL_COLUMNS].to_numpy(), expected)
+
+        # Ajouter des données à scorer ne modifie pas la transformation apprise.
+        bigger_test = os.path.join(self.tmpdir, "bigger_test.csv")
+        pd.concat([pd.read_csv(self.test_path), make_churn_frame(500, seed=3)]).to_csv(bigger_test, index=False)
+        _, X_bigger, _, _ = prepare_data(self.train_path, bigger_test)
+        np.testing.assert_array_equal(X_bigger.to_numpy()[:len(X_test)], X_test.to_numpy())
+
+    def test_array_transform_matches_frame_transform(self):
+        train = pd.read_csv(self.train_path)
+        preprocessing = FittedPreprocessing.fit(train)
+        X, _ = preprocessing.transform_frame(train)
+        raw = preprocessing.encode_frame(train)[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        np.testing.assert_array_equal(preprocessing.transform_array(raw), X.to_numpy())
+        np.testing.assert_array_equal(preprocessing.transform_array(raw[:1]), X.to_numpy()[:1])
+
+    def test_round_trip_and_serving(self):
+        X_train, _, y_train, _, preprocessing = prepare_data(self.train_path, self.test_path, return_preprocessing=True)
+        estimator = RandomForestClassifier(n_estimators=5, random_state=0).fit(X_train.to_numpy(), y_train)
+        model_path = os.path.join(self.tmpdir, "churn_model.pkl")
+        save_model(estimator, model_path, preprocessing)
+
+        reloaded = load_preprocessing(model_path)
+        self.assertEqual(reloaded.to_dict(), preprocessing.to_dict())
+
+        serving = load_serving_model(model_path)
+        train = pd.read_csv(self.train_path)
+        raw = preprocessing.encode_frame(train)[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        np.testing.assert_array_equal(serving.predict_proba(raw), estimator.predict_proba(X_train.to_numpy()))
+
+    def test_unknown_category_is_rejected(self):
+        train = pd.read_csv(self.train_path)
+        preprocessing = FittedPreprocessing.fit(train)
+        train.loc[0, "International plan"] = "Maybe"
+        with self.assertRaises(ValueError):
+            preprocessing.transform_frame(train)
+
+    def test_outliers_of_model_pipeline(self):
+        from drift import reference_histograms
+        from model_pipeline import prepare_data as prepare_filtered
+
+        X_train, X_test, _, _, preprocessing = prepare_filtered(self.train_path, self.test_path,
+                                                                return_preprocessing=True)
+        train = pd.read_csv(self.train_path)
+        self.assertLess(len(X_train), len(train))
+        self.assertEqual(len(X_test), 300)
+        # Les références de dérive couvrent tout l'entraînement, outliers compris.
+        self.assertEqual(preprocessing.drift_reference,
+                         reference_histograms(train[NUMERICAL_COLUMNS].to_numpy(dtype=np.float64)))
+
+        _, X_filtered, _, _ = prepare_filtered(self.train_path, self.test_path, filter_test_outliers=True)
+        self.assertLess(len(X_filtered), len(X_test))
+        self.assertTrue(X_filtered.index.isin(X_test.index).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import joblib
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from model_artifact import KEEP_VERSIONS, versions_directory
+from model_pipeline1 import FEATURE_COLUMNS
+from preprocessing import preprocessing_path
+from retraining import RetrainManager, install_version
+from synthetic_data import write_churn_csv
+
+
+class TestBackgroundRetrain(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.train_path = write_churn_csv(os.path.join(self.tmpdir, "train.csv"), 20000, seed=1)
+        self.test_path = write_churn_csv(os.path.join(self.tmpdir, "test.csv"), 2000, seed=2)
+        self.model_path = os.path.join(self.tmpdir, "churn_model.pkl")
+
+        rng = np.random.default_rng(0)
+        X = rng.random((100, len(FEATURE_COLUMNS)))
+        self.old_model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, X[:, 0] > 0.5)
+        joblib.dump(self.old_model, self.model_path)
+
+        self._saved = (app_module.model, app_module.model_loaded, app_module.retrain_manager,
+                       app_module.TRAIN_PATH, app_module.TEST_PATH)
+        app_module.model, app_module.model_loaded = self.old_model, True
+        app_module.retrain_manager = RetrainManager(self.model_path, app_module._install_model)
+        app_module.TRAIN_PATH, app_module.TEST_PATH = self.train_path, self.test_path
+
+    def tearDown(self):
+        (app_module.model, app_module.model_loaded, app_module.retrain_manager,
+         app_module.TRAIN_PATH, app_module.TEST_PATH) = self._saved
+        shutil.rmtree(self.tmpdir)
+
+    def test_predict_latency_during_retrain(self):
+        features = [0.5] * len(FEATURE_COLUMNS)
+        latencies = []
+        served_by_old_model = 0
+        with TestClient(app_module.app) as client:
+            response = client.post("/retrain")
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["job_id"]
+            self.assertEqual(client.post("/retrain").status_code, 409)
+
+            deadline = time.monotonic() + 120
+            while time.monotonic() < deadline:
+                status = client.get(f"/retrain/{job_id}").json()
+                if status["status"] in ("succeeded", "failed"):
+                    break
+                if app_module.model is self.old_model:
+                    served_by_old_model += 1
+                start = time.perf_counter()
+                self.assertEqual(client.post("/predict", json={"features": features}).status_code, 200)
+                latencies.append(time.perf_counter() - start)
+
+        self.assertEqual(status["status"], "succeeded", status["error"])
+        self.assertEqual(status["progress"], 1.0)
+        self.assertIn("f1_score", status["metrics"])
+        self.assertGreater(served_by_old_model, 0)
+        # La boucle d'événements n'est jamais bloquée par l'entraînement.
+        self.assertLess(np.percentile(latencies, 99), 0.5)
+
+        self.assertIsNot(app_module.model, self.old_model)
+        self.assertEqual(joblib.load(self.model_path).n_estimators, app_module.model.estimator.n_estimators)
+        # Modèle et prétraitement publiés ensemble dans un répertoire de version.
+        self.assertTrue(os.path.islink(self.model_path))
+        self.assertEqual(os.path.dirname(preprocessing_path(self.model_path)),
+                         os.path.dirname(os.path.realpath(self.model_path)))
+        self.assertTrue(os.path.exists(preprocessing_path(self.model_path)))
+        leftovers = [name for name in os.listdir(self.tmpdir) if name.endswith(".tmp")]
+        self.assertEqual(leftovers, [])
+
+    def test_failed_retrain_keeps_old_model(self):
+        app_module.TRAIN_PATH = os.path.join(self.tmpdir, "missing.csv")
+        with TestClient(app_module.app) as client:
+            job_id = client.post("/retrain").json()["job_id"]
+            deadline = time.monotonic() + 60
+            while time.monotonic() < deadline:
+                status = client.get(f"/retrain/{job_id}").json()
+                if status["status"] in ("succeeded", "failed"):
+                    break
+                time.sleep(0.05)
+            self.assertEqual(client.get("/retrain/unknown").status_code, 404)
+
+        self.assertEqual(status["status"], "failed")
+        self.assertIs(app_module.model, self.old_model)
+
+
+class TestInstallVersion(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.model_path = os.path.join(self.tmpdir, "churn_model.pkl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_files_are_swapped_together(self):
+        with open(self.model_path, "w") as f:
+            f.write("legacy")
+        for i in range(KEEP_VERSIONS + 2):
+            install_version(self.model_path, self.write(".model.tmp", f"model {i}"),
+                            self.write(".preprocessing.tmp", f"preprocessing {i}"))
+            with open(self.model_path) as f:
+                self.assertEqual(f.read(), f"model {i}")
+            with open(preprocessing_path(self.model_path)) as f:
+                self.assertEqual(f.read(), f"preprocessing {i}")
+        self.assertEqual(len(os.listdir(versions_directory(self.model_path))), KEEP_VERSIONS)
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), [".churn_model.pkl.versions", "churn_model.pkl"])
+
+        with self.assertRaises(FileNotFoundError):
+            install_version(self.model_path, self.write(".model.tmp", "broken"), "missing.tmp")
+        with open(self.model_path) as f:
+            self.assertEqual(f.read(), f"model {KEEP_VERSIONS + 1}")
+        self.assertEqual(len(os.listdir(versions_directory(self.model_path))), KEEP_VERSIONS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import joblib
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from preprocessing import FEATURE_COLUMNS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budget d'import de chaque point d'entrée : modules lourds interdits et durée
+# maximale (large, pour rester stable sur une machine chargée).
+IMPORT_BUDGETS = {
+    "main1": ({"mlflow", "elasticsearch", "sklearn", "pandas", "joblib"}, 1.0),
+    "app": ({"mlflow", "elasticsearch", "sklearn", "pandas", "joblib"}, 3.0),
+    "app_flask": ({"mlflow", "elasticsearch", "sklearn", "pandas", "joblib", "psycopg2"}, 3.0),
+}
+
+_MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": sorted({{name.split(".")[0] for name in sys.modules}})}}))
+"""
+
+
+def measure_import(module):
+    """Importe `module` dans un interpréteur neuf ; retourne (secondes, modules de premier niveau chargés)."""
+    env = dict(os.environ, FAST_START="1", MODEL_PATH=os.path.join(ROOT, "missing_model.pkl"))
+    output = subprocess.run(
+        [sys.executable, "-c", _MEASURE.format(module=module)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result["seconds"], set(result["modules"])
+
+
+class TestImportBudget(unittest.TestCase):
+    def test_entry_points_defer_heavy_imports(self):
+        for module, (forbidden, max_seconds) in IMPORT_BUDGETS.items():
+            with self.subTest(module=module):
+                seconds, modules = measure_import(module)
+                self.assertEqual(modules & forbidden, set())
+                self.assertLess(seconds, max_seconds)
+
+    def test_main1_help_does_not_load_mlflow(self):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "main1.py", "--help"], cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("--train_path", result.stdout)
+        self.assertLess(time.perf_counter() - start, IMPORT_BUDGETS["main1"][1] + 1.0)
+
+
+class TestFastStartReadiness(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.model_path = os.path.join(self.tmpdir, "churn_model.pkl")
+        rng = np.random.default_rng(0)
+        X = rng.random((100, len(FEATURE_COLUMNS)))
+        joblib.dump(RandomForestClassifier(n_estimators=5, random_state=0).fit(X, X[:, 0] > 0.5), self.model_path)
+        self._saved = (app_module.model, app_module.model_loaded, app_module.startup_error,
+                       app_module.FAST_START, app_module.MODEL_PATH)
+        app_module.model, app_module.model_loaded, app_module.startup_error = None, False, None
+        app_module.FAST_START, app_module.MODEL_PATH = True, self.model_path
+
+    def tearDown(self):
+        (app_module.model, app_module.model_loaded, app_module.startup_error,
+         app_module.FAST_START, app_module.MODEL_PATH) = self._saved
+        shutil.rmtree(self.tmpdir)
+
+    def test_live_before_ready_then_ready_after_warm_up(self):
+        release = threading.Event()
+        real_warm_up = app_module.warm_up
+        warmed = []
+
+        def slow_warm_up(model):
+            release.wait(5)
+            warmed.append(model)
+            return real_warm_up(model)
+
+        with mock.patch.object(app_module, "warm_up", slow_warm_up):
+            with TestClient(app_module.app) as client:
+                self.assertEqual(client.get("/healthcheck/live").status_code, 200)
+                ready = client.get("/healthcheck/ready")
+                self.assertEqual((ready.status_code, ready.json()["status"]), (503, "loading"))
+                self.assertFalse(client.get("/healthcheck").json()["ready"])
+                response = client.post("/predict", json={"features": [0.5] * len(FEATURE_COLUMNS)})
+                self.assertEqual(response.status_code, 503)
+
+                release.set()
+                deadline = time.monotonic() + 5
+                while client.get("/healthcheck/ready").status_code != 200 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(len(warmed), 1)
+                self.assertTrue(client.get("/healthcheck").json()["ready"])
+                response = client.post("/predict", json={"features": [0.5] * len(FEATURE_COLUMNS)})
+                self.assertEqual(response.status_code, 200)
+
+    def test_load_failure_is_reported_by_readiness(self):
+        app_module.MODEL_PATH = os.path.join(self.tmpdir, "missing.pkl")
+        with TestClient(app_module.app) as client:
+            deadline = time.monotonic() + 5
+            while app_module.startup_error is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            ready = client.get("/healthcheck/ready")
+            self.assertEqual((ready.status_code, ready.json()["status"]), (503, "error"))
+            self.assertEqual(client.get("/healthcheck/live").status_code, 200)
+
+
+class TestFlaskLazyStartup(unittest.TestCase):
+    def test_database_is_connected_on_first_prediction(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            model_path = os.path.join(tmpdir, "churn_model.pkl")
+            rng = np.random.default_rng(0)
+            X = rng.random((100, len(FEATURE_COLUMNS)))
+            joblib.dump(RandomForestClassifier(n_estimators=5, random_state=0).fit(X, X[:, 0] > 0.5), model_path)
+            env = {"MODEL_PATH": model_path, "DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'p.db')}"}
+            with mock.patch.dict(os.environ, env):
+                import app_flask
+                app_flask = importlib.reload(app_flask)
+            self.assertIsNone(app_flask.pool)
+            client = app_flask.app.test_client()
+            self.assertEqual(client.get("/healthcheck/ready").status_code, 200)
+            self.assertEqual(client.post("/predict", data={field: "1" for field in app_flask.FORM_FIELDS.values()})
+                             .status_code, 200)
+            self.assertIsNotNone(app_flask.pool)
+            app_flask.prediction_log.close()
+            app_flask.pool.closeall()
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from model_pipeline import drop_columns, remove_outliers
+from model_pipeline1 import prepare_data
+from preprocessing import COLUMNS_TO_DROP, NUMERICAL_COLUMNS, FittedPreprocessing
+from streaming_data import prepare_data_streaming, quantile_from_counts
+from synthetic_data import write_churn_csv
+
+BUNDLED_TRAIN, BUNDLED_TEST = "churn-bigml-80.csv", "churn-bigml-20.csv"
+
+
+class TestStreamingPrepareData(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.train_path = write_churn_csv(os.path.join(self.tmpdir, "train.csv"), 3000, seed=1)
+        self.test_path = write_churn_csv(os.path.join(self.tmpdir, "test.csv"), 700, seed=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_quantiles_match_pandas(self):
+        rng = np.random.default_rng(0)
+        for n in (1, 2, 7, 1000):
+            values = pd.Series(np.round(rng.normal(50, 20, n), 1))
+            for q in (0.25, 0.5, 0.75):
+                self.assertEqual(quantile_from_counts(values.value_counts(), q), values.quantile(q))
+
+    def assert_same_split(self, streamed, expected):
+        X, y = streamed
+        X_ref, y_ref = expected
+        np.testing.assert_array_equal(np.asarray(X), X_ref.to_numpy())
+        np.testing.assert_array_equal(np.asarray(y), y_ref.to_numpy())
+
+    def test_matches_in_memory_without_outliers(self):
+        X_train, X_test, y_train, y_test = prepare_data(self.train_path, self.test_path)
+        out = prepare_data_streaming(self.train_path, self.test_path, os.path.join(self.tmpdir, "out"), chunksize=257)
+        self.assertIsInstance(out[0], np.memmap)
+        self.assert_same_split((out[0], out[2]), (X_train, y_train))
+        self.assert_same_split((out[1], out[3]), (X_test, y_test))
+
+    def test_matches_in_memory_with_combined_iqr_mask(self):
+        raw = drop_columns(pd.read_csv(self.train_path), COLUMNS_TO_DROP)
+        train = remove_outliers(raw, NUMERICAL_COLUMNS, method="iqr_mask")
+        # Références de dérive calculées avant la suppression des outliers.
+        preprocessing = FittedPreprocessing.fit(train, drift_data=raw)
+        expected = preprocessing.transform_frame(train)
+
+        out = prepare_data_streaming(self.train_path, self.test_path, os.path.join(self.tmpdir, "out"),
+                                     chunksize=311, outliers="iqr")
+        self.assertLess(len(out[0]), 3000)
+        streamed, fitted = out[4].to_dict(), preprocessing.to_dict()
+        # Quantiles recalculés depuis les tables de comptage : bornes égales au dernier ulp près.
+        streamed_reference, fitted_reference = streamed.pop("drift_reference"), fitted.pop("drift_reference")
+        self.assertEqual(streamed, fitted)
+        self.assertEqual(streamed_reference["counts"], fitted_reference["counts"])
+        for streamed_edges, fitted_edges in zip(streamed_reference["edges"], fitted_reference["edges"]):
+            np.testing.assert_allclose(streamed_edges, fitted_edges, rtol=1e-12)
+        self.assert_same_split((out[0], out[2]), expected)
+
+    @unittest.skipUnless(os.path.exists(BUNDLED_TRAIN) and os.path.exists(BUNDLED_TEST), "CSV churn-bigml absents")
+    def test_matches_in_memory_on_bundled_files(self):
+        X_train, X_test, y_train, y_test = prepare_data(BUNDLED_TRAIN, BUNDLED_TEST)
+        out = prepare_data_streaming(BUNDLED_TRAIN, BUNDLED_TEST, os.path.join(self.tmpdir, "out"), chunksize=500)
+        self.assert_same_split((out[0], out[2]), (X_train, y_train))
+        self.assert_same_split((out[1], out[3]), (X_test, y_test))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from tuning import share_arrays, successive_halving
+
+GRID = {"n_estimators": [5, 10], "max_depth": [2, None], "min_samples_leaf": [1, 5]}
+
+
+class TestSuccessiveHalving(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.X = rng.random((600, 5))
+        cls.y = (cls.X[:, 0] + 0.3 * cls.X[:, 1] > 0.7).astype(int)
+
+    def test_halving_keeps_best_candidates(self):
+        result = successive_halving(self.X, self.y, GRID, n_splits=3, eta=2, n_workers=2)
+        rungs = [[t for t in result.trials if t["rung"] == r] for r in range(3)]
+        self.assertEqual([len(r) for r in rungs], [8, 4, 2])
+        self.assertEqual(rungs[-1][0]["n_samples"], len(self.y))
+        self.assertLess(rungs[0][0]["n_samples"], rungs[1][0]["n_samples"])
+        # Les survivants d'un palier sont les meilleurs du palier précédent.
+        best_first = sorted(rungs[0], key=lambda t: (-t["mean_f1"], t["candidate"]))[:4]
+        self.assertEqual({t["candidate"] for t in best_first}, {t["candidate"] for t in rungs[1]})
+        self.assertIn(result.best_params, [t["params"] for t in rungs[-1]])
+        self.assertEqual(len(rungs[0][0]["scores"]), 3)
+
+    def test_result_independent_of_worker_count(self):
+        one = successive_halving(self.X, self.y, GRID, eta=2, n_workers=1)
+        three = successive_halving(self.X, self.y, GRID, eta=2, n_workers=3)
+        self.assertEqual(one.best_params, three.best_params)
+        self.assertEqual([t["mean_f1"] for t in one.trials], [t["mean_f1"] for t in three.trials])
+
+    def test_shared_arrays_are_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            X_path, y_path, order_path = share_arrays(self.X, self.y, tmpdir)
+            X = np.load(X_path, mmap_mode="r")
+            self.assertIsInstance(X, np.memmap)
+            np.testing.assert_array_equal(X, self.X)
+            self.assertEqual(sorted(np.load(order_path)), list(range(len(self.y))))
+            self.assertTrue(os.path.exists(y_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
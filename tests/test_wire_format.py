@@ -0,0 +1,147 @@
+import io
+import unittest
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app as app_module
+from preprocessing import FEATURE_COLUMNS
+from wire_format import (ARROW_MEDIA_TYPE, FEATURE_ORDER_HEADER, NPY_MEDIA_TYPE, decode_arrow, decode_npy,
+                         response_media_type)
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+requires_arrow = unittest.skipIf(pa is None, "pyarrow absent")
+
+
+def npy_body(X):
+    buffer = io.BytesIO()
+    np.save(buffer, X)
+    return buffer.getvalue()
+
+
+def arrow_body(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def list_table(X, order=None):
+    values = pa.array(X.ravel())
+    column = pa.FixedSizeListArray.from_arrays(values, X.shape[1])
+    metadata = {b"feature_order": ",".join(order).encode()} if order else None
+    return pa.table({"features": column}, metadata=metadata)
+
+
+class TestDecoding(unittest.TestCase):
+    def setUp(self):
+        self.X = np.random.default_rng(0).random((50, len(FEATURE_COLUMNS)))
+
+    def test_npy_is_a_view_on_the_body(self):
+        for dtype in (np.float32, np.float64):
+            body = npy_body(self.X.astype(dtype))
+            X = decode_npy(body)
+            self.assertEqual(X.dtype, dtype)
+            np.testing.assert_array_equal(X, self.X.astype(dtype))
+            self.assertFalse(X.flags.writeable)
+            self.assertFalse(X.flags.owndata)
+        np.testing.assert_array_equal(decode_npy(npy_body(np.asfortranarray(self.X))), self.X)
+
+    def test_npy_rejects_other_types_and_truncated_bodies(self):
+        with self.assertRaises(ValueError):
+            decode_npy(npy_body(self.X.astype(">f8")))
+        with self.assertRaises(ValueError):
+            decode_npy(npy_body(self.X.astype(np.int64)))
+        with self.assertRaises(ValueError):
+            decode_npy(npy_body(self.X)[:-8])
+        with self.assertRaises(ValueError):
+            decode_npy(b"not a npy body")
+
+    def test_declared_feature_order(self):
+        order = FEATURE_COLUMNS[::-1]
+        np.testing.assert_array_equal(decode_npy(npy_body(self.X[:, ::-1]), ",".join(order)), self.X)
+        with self.assertRaises(ValueError):
+            decode_npy(npy_body(self.X), ",".join(FEATURE_COLUMNS[:-1] + ["unknown"]))
+
+    @requires_arrow
+    def test_arrow_lists_are_zero_copy_and_columns_are_accepted(self):
+        X = decode_arrow(arrow_body(list_table(self.X.astype(np.float32))))
+        self.assertEqual(X.dtype, np.float32)
+        self.assertFalse(X.flags.owndata)
+        np.testing.assert_array_equal(X, self.X.astype(np.float32))
+        order = FEATURE_COLUMNS[::-1]
+        np.testing.assert_array_equal(decode_arrow(arrow_body(list_table(self.X[:, ::-1], order))), self.X)
+
+        columns = pa.table({name: self.X[:, i] for i, name in reversed(list(enumerate(FEATURE_COLUMNS)))})
+        np.testing.assert_array_equal(decode_arrow(arrow_body(columns)), self.X)
+        with self.assertRaises(ValueError):
+            decode_arrow(arrow_body(columns.drop_columns([FEATURE_COLUMNS[0]])))
+
+    def test_response_format_negotiation(self):
+        self.assertEqual(response_media_type(NPY_MEDIA_TYPE), NPY_MEDIA_TYPE)
+        self.assertEqual(response_media_type("application/json", "*/*"), "application/json")
+        self.assertEqual(response_media_type(None), "application/json")
+        self.assertEqual(response_media_type(NPY_MEDIA_TYPE, "application/json"), "application/json")
+        self.assertEqual(response_media_type("application/json", f"{ARROW_MEDIA_TYPE}; q=1"), ARROW_MEDIA_TYPE)
+
+
+class TestBinaryPredictBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.X = rng.random((200, len(FEATURE_COLUMNS)))
+        y = (cls.X[:, 0] > 0.5).astype(int)
+        cls.estimator = RandomForestClassifier(n_estimators=10, random_state=0).fit(cls.X, y)
+
+    def setUp(self):
+        self._saved = (app_module.model, app_module.model_loaded)
+        app_module.model = self.estimator
+        app_module.model_loaded = True
+        self.client = TestClient(app_module.app)
+        self.expected = self.client.post("/predict/batch", json={"rows": self.X[:40].tolist()}).json()
+
+    def tearDown(self):
+        app_module.model, app_module.model_loaded = self._saved
+
+    def test_npy_request_and_response(self):
+        response = self.client.post("/predict/batch", content=npy_body(self.X[:40]),
+                                    headers={"Content-Type": NPY_MEDIA_TYPE})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], NPY_MEDIA_TYPE)
+        result = np.load(io.BytesIO(response.content), allow_pickle=False)
+        self.assertEqual(result["prediction"].tolist(), self.expected["predictions"])
+        np.testing.assert_allclose(result["probability"], self.expected["probabilities"])
+
+    @requires_arrow
+    def test_arrow_request_with_feature_order_and_json_response(self):
+        order = FEATURE_COLUMNS[::-1]
+        response = self.client.post("/predict/batch", content=arrow_body(list_table(self.X[:40, ::-1])),
+                                    headers={"Content-Type": ARROW_MEDIA_TYPE, FEATURE_ORDER_HEADER: ",".join(order),
+                                             "Accept": "application/json"})
+        self.assertEqual(response.json(), self.expected)
+
+        response = self.client.post("/predict/batch", content=arrow_body(list_table(self.X[:40])),
+                                    headers={"Content-Type": ARROW_MEDIA_TYPE})
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.column("prediction").to_pylist(), self.expected["predictions"])
+
+    def test_invalid_binary_bodies(self):
+        narrow = npy_body(self.X[:5, :3])
+        self.assertEqual(self.client.post("/predict/batch", content=narrow,
+                                          headers={"Content-Type": NPY_MEDIA_TYPE}).status_code, 400)
+        broken = npy_body(np.full((2, len(FEATURE_COLUMNS)), np.nan))
+        self.assertEqual(self.client.post("/predict/batch", content=broken,
+                                          headers={"Content-Type": NPY_MEDIA_TYPE}).status_code, 400)
+        self.assertEqual(self.client.post("/predict/batch", content=b"\x00" * 16,
+                                          headers={"Content-Type": NPY_MEDIA_TYPE}).status_code, 400)
+        if pa is not None:
+            self.assertEqual(self.client.post("/predict/batch", content=b"\x00" * 16,
+                                              headers={"Content-Type": ARROW_MEDIA_TYPE}).status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+
+# Grille de recherche par défaut des hyperparamètres de la forêt
+DEFAULT_PARAM_GRID = {
+    "n_estimators": [100, 200],
+    "max_depth": [None, 8, 16],
+    "min_samples_leaf": [1, 3],
+    "max_features": ["sqrt", 0.5],
+}
+
+# Données d'entraînement mappées en mémoire, ouvertes une fois par processus du pool
+_shared = {}
+
+
+def share_arrays(X, y, directory, seed=0):
+    """
+    Écrit X, y et une permutation des lignes dans des fichiers .npy lus par les
+    workers en mode mmap : les données ne sont jamais sérialisées vers les
+    processus, qui partagent les mêmes pages du cache disque.
+
+    Returns:
+    tuple: Chemins (X, y, permutation)
+    """
+    X = np.ascontiguousarray(np.asarray(X, dtype=np.float64))
+    y = np.asarray(y).astype(np.int64)
+    paths = tuple(os.path.join(directory, name) for name in ("X.npy", "y.npy", "order.npy"))
+    np.save(paths[0], X)
+    np.save(paths[1], y)
+    np.save(paths[2], np.random.default_rng(seed).permutation(len(y)))
+    return paths
+
+
+def _init_worker(X_path, y_path, order_path):
+    _shared["X"] = np.load(X_path, mmap_mode="r")
+    _shared["y"] = np.load(y_path, mmap_mode="r")
+    _shared["order"] = np.load(order_path, mmap_mode="r")
+
+
+def _evaluate_fold(params, n_samples, fold, n_splits, seed):
+    """Entraîne un candidat sur un pli d'un sous-échantillon et retourne (F1, durée)."""
+    rows = np.sort(_shared["order"][:n_samples])
+    X, y = _shared["X"][rows], _shared["y"][rows]
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    train_idx, valid_idx = list(splitter.split(X, y))[fold]
+
+    start = time.perf_counter()
+    model = RandomForestClassifier(random_state=seed, n_jobs=1, **params)
+    model.fit(X[train_idx], y[train_idx])
+    score = f1_score(y[valid_idx], model.predict(X[valid_idx]), zero_division=0)
+    return float(score), time.perf_counter() - start
+
+
+class TuningResult:
+    """
+    Résultat d'une recherche : meilleurs paramètres et détail de chaque essai.
+
+    Chaque essai (`trials`) est un dict : candidate, rung, n_samples, params,
+    scores (F1 par pli), mean_f1, std_f1, fit_time.
+    """
+
+    def __init__(self, best_params, best_score, trials, elapsed):
+        self.best_params = best_params
+        self.best_score = best_score
+        self.trials = trials
+        self.elapsed = elapsed
+
+
+def successive_halving(X, y, param_grid=None, n_splits=3, eta=3, min_samples=None,
+                       n_workers=None, seed=0, work_dir=None):
+    """
+    Recherche d'hyperparamètres par validation croisée et successive halving.
+
+    Au premier palier, tous les candidats sont évalués sur un petit
+    sous-échantillon ; seul le meilleur tiers (1/eta) passe au palier suivant,
+    évalué sur eta fois plus de lignes, jusqu'au dernier palier sur toutes les
+    données. Les couples (candidat, pli) d'un palier s'exécutent en parallèle
+    sur un pool de processus qui lit les données mappées en mémoire.
+
+    Parameters:
+    X (array-like): Features d'entraînement prétraitées.
+    y (array-like): Labels d'entraînement.
+    param_grid (dict): Grille de paramètres de RandomForestClassifier (DEFAULT_PARAM_GRID par défaut).
+    n_splits (int): Nombre de plis de validation croisée.
+    eta (int): Facteur de réduction des candidats entre deux paliers.
+    min_samples (int): Taille du sous-échantillon du premier palier (minimum).
+    n_workers (int): Nombre de processus (os.cpu_count() par défaut).
+    seed (int): Graine des sous-échantillons, des plis et des forêts.
+    work_dir (str): Répertoire des fichiers partagés (temporaire par défaut).
+
+    Returns:
+    TuningResult: Meilleurs paramètres (score F1 moyen du dernier palier) et essais.
+    """
+    if eta < 2:
+        raise ValueError("eta doit être supérieur ou égal à 2.")
+    candidates = list(ParameterGrid(param_grid or DEFAULT_PARAM_GRID))
+    n_total = len(y)
+    n_rungs = max(1, math.ceil(math.log(len(candidates), eta)))
+    if min_samples is None:
+        min_samples = 50 * n_splits
+    n_workers = n_workers or os.cpu_count()
+
+    own_dir = work_dir is None
+    work_dir = tempfile.mkdtemp(prefix="tuning-") if own_dir else work_dir
+    start = time.perf_counter()
+    trials = []
+    try:
+        paths = share_arrays(X, y, work_dir, seed)
+        alive = list(range(len(candidates)))
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=paths) as pool:
+            for rung in range(n_rungs):
+                n_samples = min(n_total, max(min_samples, n_total // eta ** (n_rungs - 1 - rung)))
+                futures = {
+                    (index, fold): pool.submit(_evaluate_fold, candidates[index], n_samples, fold, n_splits, seed)
+                    for index in alive
+                    for fold in range(n_splits)
+                }
+                rung_trials = []
+                for index in alive:
+                    results = [futures[index, fold].result() for fold in range(n_splits)]
+                    scores = [score for score, _ in results]
+                    rung_trials.append({
+                        "candidate": index,
+                        "rung": rung,
+                        "n_samples": n_samples,
+                        "params": candidates[index],
+                        "scores": scores,
+                        "mean_f1": float(np.mean(scores)),
+                        "std_f1": float(np.std(scores)),
+                        "fit_time": float(sum(duration for _, duration in results)),
+                    })
+                trials.extend(rung_trials)
+
+                # Classement stable : à score égal, l'ordre de la grille départage.
+                ranked = sorted(rung_trials, key=lambda trial: (-trial["mean_f1"], trial["candidate"]))
+                alive = [trial["candidate"] for trial in ranked[:max(1, math.ceil(len(ranked) / eta))]]
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    best = ranked[0]
+    return TuningResult(best["params"], best["mean_f1"], trials, time.perf_counter() - start)
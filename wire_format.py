@@ -0,0 +1,178 @@
+import io
+
+import numpy as np
+
+from preprocessing import FEATURE_COLUMNS
+
+# Formats acceptés par /predict/batch en plus de JSON (format par défaut)
+JSON_MEDIA_TYPE = "application/json"
+NPY_MEDIA_TYPE = "application/x-npy"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+BINARY_MEDIA_TYPES = (NPY_MEDIA_TYPE, ARROW_MEDIA_TYPE)
+
+# En-tête (ou métadonnée du schéma Arrow) déclarant l'ordre des colonnes, séparées par des virgules
+FEATURE_ORDER_HEADER = "X-Feature-Order"
+FEATURE_ORDER_METADATA = b"feature_order"
+
+# Types acceptés : float32/float64 petit-boutiste, lus sans conversion
+_DTYPES = (np.dtype("<f4"), np.dtype("<f8"))
+_RESPONSE_DTYPE = np.dtype([("prediction", "<i8"), ("probability", "<f8")])
+
+
+def media_type(header):
+    """Type MIME d'un en-tête Content-Type ou Accept, sans paramètres ni casse."""
+    return (header or "").split(";")[0].strip().lower()
+
+
+def response_media_type(content_type, accept=None):
+    """
+    Format de la réponse : celui demandé par `Accept` s'il est supporté, sinon
+    celui de la requête (JSON par défaut).
+    """
+    supported = (JSON_MEDIA_TYPE,) + BINARY_MEDIA_TYPES
+    for candidate in (accept or "").split(","):
+        if media_type(candidate) in supported:
+            return media_type(candidate)
+    content_type = media_type(content_type)
+    return content_type if content_type in BINARY_MEDIA_TYPES else JSON_MEDIA_TYPE
+
+
+def _parse_order(order):
+    if order is None:
+        return None
+    if isinstance(order, bytes):
+        order = order.decode("utf-8")
+    return [name.strip() for name in order.split(",")]
+
+
+def _reorder(X, order):
+    """Remet les colonnes dans l'ordre de FEATURE_COLUMNS (sans copie si elles y sont déjà)."""
+    if order is None or order == FEATURE_COLUMNS:
+        return X
+    if sorted(order) != sorted(FEATURE_COLUMNS):
+        missing = [name for name in FEATURE_COLUMNS if name not in order]
+        unknown = [name for name in order if name not in FEATURE_COLUMNS]
+        raise ValueError(f"Ordre des features invalide (manquantes : {missing}, inconnues : {unknown}).")
+    return X[:, [order.index(name) for name in FEATURE_COLUMNS]]
+
+
+def _check_matrix(X):
+    if X.ndim != 2 or X.shape[0] == 0:
+        raise ValueError("Le lot doit être une matrice non vide (n_lignes, n_features).")
+    if not np.isfinite(X).all():
+        raise ValueError("Le lot contient des valeurs non finies.")
+    return X
+
+
+def decode_npy(body, order=None):
+    """
+    Lit un corps .npy (float32/float64 petit-boutiste, forme déclarée dans
+    l'en-tête du fichier) comme une vue en lecture seule sur `body`.
+    """
+    stream = io.BytesIO(body)
+    try:
+        version = np.lib.format.read_magic(stream)
+        read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                       else np.lib.format.read_array_header_2_0)
+        shape, fortran_order, dtype = read_header(stream)
+    except ValueError as e:
+        raise ValueError(f"Corps .npy invalide : {e}") from None
+    if dtype not in _DTYPES:
+        raise ValueError(f"Type {dtype.str} non supporté : float32 ou float64 petit-boutiste attendu.")
+    count = int(np.prod(shape))
+    if len(body) - stream.tell() != count * dtype.itemsize:
+        raise ValueError(f"Le corps .npy ne contient pas {count} valeurs {dtype.str}.")
+    X = np.frombuffer(body, dtype=dtype, count=count, offset=stream.tell())
+    # Ordre Fortran : la transposée d'une vue C est aussi une vue.
+    X = X.reshape(shape[::-1]).T if fortran_order else X.reshape(shape)
+    return _check_matrix(_reorder(X, _parse_order(order)))
+
+
+def decode_arrow(body, order=None):
+    """
+    Lit un flux Arrow IPC, sous l'une de ces deux formes :
+
+    - une seule colonne `fixed_size_list<float>` (une liste par ligne) : les
+      valeurs forment déjà la matrice ligne par ligne, lue sans copie ;
+    - une colonne float32/float64 par feature, nommée comme dans
+      FEATURE_COLUMNS : les colonnes sont assemblées en une copie.
+
+    L'ordre des features d'une colonne de listes est celui de `order`, ou de
+    la métadonnée `feature_order` du schéma.
+    """
+    import pyarrow as pa
+
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"Flux Arrow invalide : {e}") from None
+    if table.num_rows == 0:
+        raise ValueError("Le lot doit être une matrice non vide (n_lignes, n_features).")
+
+    if table.num_columns == 1 and pa.types.is_fixed_size_list(table.schema.field(0).type):
+        column = table.column(0)
+        if column.null_count:
+            raise ValueError("Le lot contient des lignes nulles.")
+        values = [chunk.flatten() for chunk in column.chunks]
+        values = values[0] if len(values) == 1 else pa.concat_arrays(values)
+        if values.type not in (pa.float32(), pa.float64()):
+            raise ValueError(f"Type {values.type} non supporté : float32 ou float64 attendu.")
+        X = values.to_numpy(zero_copy_only=True).reshape(table.num_rows, column.type.list_size)
+        metadata = table.schema.metadata or {}
+        return _check_matrix(_reorder(X, _parse_order(order or metadata.get(FEATURE_ORDER_METADATA))))
+
+    missing = [name for name in FEATURE_COLUMNS if name not in table.column_names]
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {missing}")
+    columns = [table.column(name) for name in FEATURE_COLUMNS]
+    if any(column.null_count for column in columns):
+        raise ValueError("Le lot contient des valeurs nulles.")
+    if any(column.type not in (pa.float32(), pa.float64()) for column in columns):
+        raise ValueError("Les colonnes doivent être de type float32 ou float64.")
+    return _check_matrix(np.column_stack([column.to_numpy() for column in columns]))
+
+
+def decode_features(body, content_type, order=None):
+    """
+    Décode un corps binaire (.npy ou Arrow IPC) en matrice (n_lignes, n_features)
+    dans l'ordre de FEATURE_COLUMNS.
+
+    Parameters:
+    body (bytes): Corps de la requête.
+    content_type (str): NPY_MEDIA_TYPE ou ARROW_MEDIA_TYPE.
+    order (str): Ordre des colonnes envoyées, séparées par des virgules (optionnel).
+
+    Returns:
+    np.ndarray: Matrice float32 ou float64, en lecture seule si elle n'a pas été copiée.
+    """
+    if content_type == NPY_MEDIA_TYPE:
+        return decode_npy(body, order)
+    if content_type == ARROW_MEDIA_TYPE:
+        return decode_arrow(body, order)
+    raise ValueError(f"Format {content_type} non supporté.")
+
+
+def encode_predictions(predictions, probabilities, content_type):
+    """
+    Encode les prédictions et les probabilités de churn dans le format binaire
+    demandé : tableau .npy structuré (`prediction`, `probability`) ou flux
+    Arrow IPC à deux colonnes.
+    """
+    if content_type == NPY_MEDIA_TYPE:
+        result = np.empty(len(predictions), dtype=_RESPONSE_DTYPE)
+        result["prediction"] = predictions
+        result["probability"] = probabilities
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, result, allow_pickle=False)
+        return buffer.getvalue()
+    if content_type == ARROW_MEDIA_TYPE:
+        import pyarrow as pa
+
+        batch = pa.record_batch([pa.array(np.asarray(predictions, dtype=np.int64)),
+                                 pa.array(np.asarray(probabilities, dtype=np.float64))],
+                                names=["prediction", "probability"])
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+    raise ValueError(f"Format {content_type} non supporté.")